@@ -13,10 +13,161 @@ import requests
 from datetime import datetime
 from typing import Dict, Any, List, Optional
 import threading
+import atexit
 import glob
+import sys
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from editor_analysis import (SOURCE_LANGUAGES, SYMBOL_INDEX_EXTENSIONS, DIAGNOSTICS_LANGUAGES,
+                             hash_content, index_file, check_item)
 
 logger = logging.getLogger(__name__)
 
+# Symbol index settings
+SYMBOL_INDEX_POOL_THRESHOLD = 32  # Below this many files a process pool costs more than it saves
+
+# Batch diagnostics settings
+DIAGNOSTICS_POOL_THRESHOLD = 8  # Below this many uncached items checks run inline
+DIAGNOSTICS_CACHE_SIZE = 2048
+
+
+class SymbolIndex:
+    """Per-file symbol shards with name lookups for definitions and call sites"""
+
+    def __init__(self, max_workers: int = None):
+        self.max_workers = max_workers
+        self.shards = {}  # file path -> shard
+        self.definitions_by_name = {}  # symbol name -> set of file paths
+        self.calls_by_name = {}  # symbol name -> set of file paths
+        self.lock = threading.RLock()
+
+    def build(self, file_paths: List[str]) -> int:
+        """Index files, using a process pool for large first scans"""
+        candidates = [p for p in file_paths if os.path.splitext(p)[1].lower() in SYMBOL_INDEX_EXTENSIONS]
+        with self.lock:
+            stale = [p for p in candidates if self._needs_reindex(p)]
+        if not stale:
+            return 0
+
+        shards = []
+        if len(stale) >= SYMBOL_INDEX_POOL_THRESHOLD:
+            try:
+                with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+                    shards = list(pool.map(index_file, stale, chunksize=16))
+            except Exception as e:
+                logger.warning(f"Process pool indexing failed, falling back to serial: {e}")
+                shards = []
+        if not shards:
+            shards = [index_file(p) for p in stale]
+
+        indexed = 0
+        with self.lock:
+            for shard in shards:
+                if shard:
+                    self._store_shard(shard)
+                    indexed += 1
+        logger.info(f"🔎 Symbol index updated: {indexed} files ({len(self.shards)} total)")
+        return indexed
+
+    def update_file(self, file_path: str) -> bool:
+        """Incrementally re-index a single file if its content changed"""
+        if not os.path.exists(file_path):
+            self.remove_file(file_path)
+            return True
+        with self.lock:
+            if not self._needs_reindex(file_path):
+                return False
+        shard = index_file(file_path)
+        if not shard:
+            return False
+        with self.lock:
+            current = self.shards.get(file_path)
+            if current and current["hash"] == shard["hash"]:
+                current["mtime"] = shard["mtime"]
+                return False
+            self._store_shard(shard)
+        return True
+
+    def remove_file(self, file_path: str):
+        """Drop a file's shard from the index"""
+        with self.lock:
+            shard = self.shards.pop(file_path, None)
+            if shard:
+                self._unlink_names(shard)
+
+    def find_definitions(self, name: str) -> List[Dict[str, Any]]:
+        """Find definitions whose name or qualified name matches
+        
+        A qualified name ("ClassA.method") only matches definitions whose
+        qualified name is, or ends with, that name.
+        """
+        short_name = name.rsplit(".", 1)[-1]
+        qualified = "." in name
+        results = []
+        with self.lock:
+            for path in self.definitions_by_name.get(short_name, ()):
+                for definition in self.shards[path]["definitions"]:
+                    if qualified:
+                        matches = definition["qualname"] == name or definition["qualname"].endswith("." + name)
+                    else:
+                        matches = definition["name"] == name
+                    if matches:
+                        results.append(dict(definition, path=path))
+        return results
+
+    def find_usages(self, name: str) -> List[Dict[str, Any]]:
+        """Find call sites of a symbol"""
+        short_name = name.rsplit(".", 1)[-1]
+        results = []
+        with self.lock:
+            for path in self.calls_by_name.get(short_name, ()):
+                for call in self.shards[path]["calls"]:
+                    if call["name"] == short_name:
+                        results.append(dict(call, path=path))
+        return results
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get index statistics"""
+        with self.lock:
+            return {
+                "files": len(self.shards),
+                "definitions": sum(len(s["definitions"]) for s in self.shards.values()),
+                "calls": sum(len(s["calls"]) for s in self.shards.values()),
+                "imports": sum(len(s["imports"]) for s in self.shards.values())
+            }
+
+    def _needs_reindex(self, file_path: str) -> bool:
+        shard = self.shards.get(file_path)
+        if not shard:
+            return True
+        try:
+            return os.path.getmtime(file_path) != shard["mtime"]
+        except OSError:
+            return True
+
+    def _store_shard(self, shard: Dict[str, Any]):
+        previous = self.shards.get(shard["path"])
+        if previous:
+            self._unlink_names(previous)
+        self.shards[shard["path"]] = shard
+        for definition in shard["definitions"]:
+            self.definitions_by_name.setdefault(definition["name"], set()).add(shard["path"])
+        for call in shard["calls"]:
+            self.calls_by_name.setdefault(call["name"], set()).add(shard["path"])
+
+    def _unlink_names(self, shard: Dict[str, Any]):
+        for table, entries in ((self.definitions_by_name, shard["definitions"]), (self.calls_by_name, shard["calls"])):
+            for entry in entries:
+                paths = table.get(entry["name"])
+                if paths:
+                    paths.discard(shard["path"])
+                    if not paths:
+                        del table[entry["name"]]
+
+
 class EditorAgent:
     def __init__(self, config_path: str = "../config.json"):
         self.config = self.load_config(config_path)
@@ -39,7 +190,7 @@ class EditorAgent:
         # Project path detection
         self.project_paths = {}
         self.current_project = None
-        self.supported_extensions = [".py", ".js", ".ts", ".html", ".css", ".json", ".md"]
+        self.supported_extensions = set(SOURCE_LANGUAGES)
         self.ignore_patterns = ["node_modules", "__pycache__", ".git", "venv", ".vscode"]
         
         # Performance monitoring
@@ -52,6 +203,17 @@ class EditorAgent:
         self.monitored_files = {}
         self.temp_memory_files = {}
         
+        # Symbol index for definition/usage lookups
+        self.symbol_index = SymbolIndex()
+        
+        # Batch diagnostics (content hash -> diagnostics)
+        self.diagnostics_cache = OrderedDict()
+        self.diagnostics_lock = threading.Lock()
+        self.diagnostics_pool = None
+        self.diagnostics_pool_lock = threading.Lock()
+        self.diagnostics_closed = False
+        atexit.register(self.shutdown)
+        
         # Task queue
         self.pending_tasks = []
         self.completed_tasks = []
@@ -208,6 +370,138 @@ class EditorAgent:
             logger.error(f"Syntax check error: {e}")
             return False
     
+    def check_syntax_batch(self, items: List[Any], max_workers: int = None) -> Dict[str, Any]:
+        """Syntax-check and lint many files or snippets concurrently
+        
+        Items are file paths or dicts with "code" and optional "language"/"path"/"id".
+        Results are cached by content hash, so unchanged files cost a dict lookup.
+        """
+        start_time = time.time()
+        results = {}
+        pending = {}  # content hash -> (language, code)
+        keys_by_hash = {}
+        
+        for position, item in enumerate(items):
+            if isinstance(item, str):
+                key, path, code, language = item, item, None, None
+            else:
+                path = item.get("path")
+                key = item.get("id") or path or f"snippet_{position}"
+                code = item.get("code")
+                language = item.get("language")
+            
+            if code is None:
+                try:
+                    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                        code = f.read()
+                except Exception as e:
+                    results[key] = {"valid": False, "cached": False, "diagnostics": [
+                        {"line": 1, "column": 1, "severity": "error", "source": "io", "message": str(e)}
+                    ]}
+                    continue
+            
+            if not language:
+                # Snippets without a language get the generic bracket check
+                language = DIAGNOSTICS_LANGUAGES.get(os.path.splitext(path)[1].lower(), "text") if path else "unknown"
+            content_hash = hash_content(f"{language}\0{code}".encode('utf-8', errors='replace'))
+            keys_by_hash.setdefault(content_hash, []).append(key)
+            
+            with self.diagnostics_lock:
+                cached = self.diagnostics_cache.get(content_hash)
+                if cached is not None:
+                    self.diagnostics_cache.move_to_end(content_hash)
+            if cached is not None:
+                results[key] = {"valid": not any(d["severity"] == "error" for d in cached), "cached": True, "diagnostics": cached}
+            else:
+                pending[content_hash] = (language, code)
+        
+        if pending:
+            work = [(content_hash, language, code) for content_hash, (language, code) in pending.items()]
+            if len(work) >= DIAGNOSTICS_POOL_THRESHOLD:
+                checked = None
+                pool = self.get_diagnostics_pool(max_workers)
+                if pool is not None:
+                    try:
+                        checked = list(pool.map(check_item, work, chunksize=4))
+                    except Exception as e:
+                        logger.warning(f"Diagnostics pool failed, checking inline: {e}")
+                        self.discard_diagnostics_pool(pool)
+                if checked is None:
+                    checked = [check_item(w) for w in work]
+            else:
+                checked = [check_item(w) for w in work]
+            
+            with self.diagnostics_lock:
+                for content_hash, diagnostics in checked:
+                    self.diagnostics_cache[content_hash] = diagnostics
+                    while len(self.diagnostics_cache) > DIAGNOSTICS_CACHE_SIZE:
+                        self.diagnostics_cache.popitem(last=False)
+            
+            for content_hash, diagnostics in checked:
+                for key in keys_by_hash[content_hash]:
+                    results[key] = {"valid": not any(d["severity"] == "error" for d in diagnostics), "cached": False, "diagnostics": diagnostics}
+        
+        return {
+            "results": results,
+            "summary": {
+                "checked": len(results),
+                "invalid": sum(1 for r in results.values() if not r["valid"]),
+                "errors": sum(1 for r in results.values() for d in r["diagnostics"] if d["severity"] == "error"),
+                "warnings": sum(1 for r in results.values() for d in r["diagnostics"] if d["severity"] == "warning"),
+                "cache_hits": sum(1 for r in results.values() if r["cached"])
+            },
+            "took_ms": round((time.time() - start_time) * 1000, 2)
+        }
+    
+    def get_diagnostics_pool(self, max_workers: int = None) -> Optional[ProcessPoolExecutor]:
+        """Shared worker pool for batch diagnostics, started on first use (None after shutdown)"""
+        with self.diagnostics_pool_lock:
+            if self.diagnostics_pool is None and not self.diagnostics_closed:
+                self.diagnostics_pool = ProcessPoolExecutor(max_workers=max_workers)
+            return self.diagnostics_pool
+    
+    def discard_diagnostics_pool(self, pool: Optional[ProcessPoolExecutor]):
+        """Drop a broken pool so the next batch starts a fresh one"""
+        with self.diagnostics_pool_lock:
+            if pool is None or pool is not self.diagnostics_pool:
+                return
+            self.diagnostics_pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+    
+    def shutdown(self):
+        """Stop the diagnostics worker processes"""
+        with self.diagnostics_pool_lock:
+            self.diagnostics_closed = True
+            pool, self.diagnostics_pool = self.diagnostics_pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+    
+    def format_diagnostics(self, batch_result: Dict[str, Any], max_per_file: int = 20) -> str:
+        """Format batch diagnostics as compact text for attaching to a prompt"""
+        lines = []
+        for key, result in batch_result.get("results", {}).items():
+            for diagnostic in result["diagnostics"][:max_per_file]:
+                lines.append(f"{key}:{diagnostic['line']}:{diagnostic['column']}: "
+                             f"{diagnostic['severity']} [{diagnostic['source']}] {diagnostic['message']}")
+        return "\n".join(lines)
+    
+    def check_files_from_command(self, command: str) -> str:
+        """Check files from command string"""
+        try:
+            file_paths = command.replace("check_files", "").split()
+            if not file_paths:
+                return "❌ ফাইল পাথ দেওয়া হয়নি"
+            
+            batch_result = self.check_syntax_batch(file_paths)
+            summary = batch_result["summary"]
+            report = self.format_diagnostics(batch_result)
+            return (f"🩺 {summary['checked']}টি ফাইল যাচাই করা হয়েছে ({batch_result['took_ms']}ms)\n"
+                    f"এরর: {summary['errors']}, সতর্কতা: {summary['warnings']}"
+                    + (f"\n{report}" if report else ""))
+        except Exception as e:
+            logger.error(f"Error checking files from command: {e}")
+            return f"❌ ফাইল যাচাই ব্যর্থ: {e}"
+    
     def process_command(self, command: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
         """Process editor command and return response - Main work engine"""
         start_time = time.time()
@@ -246,6 +540,10 @@ class EditorAgent:
                 response = self.add_task_from_command(command)
             elif command.startswith("monitor_file"):
                 response = self.monitor_file_from_command(command)
+            elif command.startswith("check_files"):
+                response = self.check_files_from_command(command)
+            elif command.startswith("find_symbol"):
+                response = self.find_symbol_from_command(command, context)
             else:
                 response = self.handle_general_command(command, memory_context)
             
@@ -462,6 +760,31 @@ exampleFunction();
             logger.error(f"Error monitoring file from command: {e}")
             return f"❌ ফাইল পর্যবেক্ষণ ব্যর্থ: {e}"
     
+    def find_symbol_from_command(self, command: str, context: Dict[str, Any] = None) -> str:
+        """Find symbol definition and callers from command string"""
+        try:
+            symbol_name = command.replace("find_symbol", "").strip()
+            if not symbol_name:
+                return "❌ সিম্বলের নাম দেওয়া হয়নি"
+            
+            file_path = (context or {}).get("file_path") or ((context or {}).get("files") or [None])[0]
+            symbol_context = self.get_symbol_context(symbol_name, file_path)
+            
+            if not symbol_context["definitions"] and not symbol_context["usages"]:
+                return f"❌ সিম্বল পাওয়া যায়নি: {symbol_name}"
+            
+            lines = [f"🔎 সিম্বল: {symbol_name}"]
+            for definition in symbol_context["definitions"]:
+                lines.append(f"📍 সংজ্ঞা: {definition['path']}:{definition['line']} ({definition['kind']})")
+                if definition.get("source"):
+                    lines.append(f"```\n{definition['source']}\n```")
+            for usage in symbol_context["usages"]:
+                lines.append(f"↪ ব্যবহার: {usage['path']}:{usage['line']} ({usage['caller']})")
+            return "\n".join(lines)
+        except Exception as e:
+            logger.error(f"Error finding symbol from command: {e}")
+            return f"❌ সিম্বল খুঁজতে ব্যর্থ: {e}"
+    
     def handle_general_command(self, command: str, context: Dict[str, Any]) -> str:
         """Handle general editor commands"""
         if "help" in command.lower():
@@ -530,6 +853,62 @@ exampleFunction();
                 "context": self.extract_file_context(file_path)
             }
             logger.info(f"ফাইল পর্যবেক্ষণ শুরু হয়েছে: {file_path}")
+        self.symbol_index.update_file(file_path)
+    
+    def refresh_symbol_index(self, project_path: str = None) -> int:
+        """Incrementally re-index changed files of a scanned project (or all projects)"""
+        project_paths = [project_path] if project_path else list(self.project_paths.keys())
+        updated = 0
+        for path in project_paths:
+            files = self.scan_project_files(path)
+            if path in self.project_paths:
+                self.project_paths[path]["files"] = files
+            # Trailing separator, so /ws/app does not claim /ws/app2's files
+            prefix = os.path.join(path, "")
+            known = {p for p in self.symbol_index.shards if p.startswith(prefix)}
+            for removed in known - set(files):
+                self.symbol_index.remove_file(removed)
+                updated += 1
+            updated += self.symbol_index.build(files)
+        return updated
+    
+    def get_symbol_context(self, symbol_name: str, file_path: str = None, max_usages: int = 20) -> Dict[str, Any]:
+        """Get a symbol's definitions (with source) and callers from the symbol index"""
+        if file_path:
+            project_path = self.detect_project_path(file_path)
+            if project_path in self.project_paths:
+                self.refresh_symbol_index(project_path)
+            else:
+                self.get_project_context(file_path)
+        
+        definitions = self.symbol_index.find_definitions(symbol_name)
+        for definition in definitions:
+            definition["source"] = self.read_source_lines(
+                definition["path"], definition["line"], definition.get("end_line", definition["line"])
+            )
+        
+        return {
+            "symbol": symbol_name,
+            "definitions": definitions,
+            "usages": self.symbol_index.find_usages(symbol_name)[:max_usages],
+            "index_stats": self.symbol_index.get_stats()
+        }
+    
+    def read_source_lines(self, file_path: str, start_line: int, end_line: int, max_lines: int = 60) -> str:
+        """Read a line range from a file"""
+        try:
+            end_line = min(end_line, start_line + max_lines - 1)
+            lines = []
+            with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+                for line_number, line in enumerate(f, 1):
+                    if line_number > end_line:
+                        break
+                    if line_number >= start_line:
+                        lines.append(line.rstrip("\n"))
+            return "\n".join(lines)
+        except Exception as e:
+            logger.error(f"Error reading source lines: {e}")
+            return ""
     
     def extract_file_context(self, file_path: str) -> Dict[str, Any]:
         """Extract context from file"""
@@ -623,6 +1002,7 @@ exampleFunction();
                 "files": self.scan_project_files(project_path),
                 "last_scan": datetime.now().isoformat()
             }
+            self.symbol_index.build(self.project_paths[project_path]["files"])
         
         project_context = self.project_paths[project_path].copy()
         
@@ -689,6 +1069,8 @@ exampleFunction();
 কমান্ডসমূহ:
 - verify_code <code> - কোড সিনট্যাক্স এবং লজিক যাচাই করুন
 - suggest_code <requirements> - কোড সাজেশন তৈরি করুন
+- find_symbol <name> - ফাংশনের সংজ্ঞা এবং ব্যবহার খুঁজুন
+- check_files <paths> - একসাথে অনেক ফাইলের সিনট্যাক্স এবং লিন্ট যাচাই করুন
 - run_tasks_on - সব অপেক্ষমান কাজ সম্পাদন করুন
 - help - এই সাহায্য দেখুন
 - status - এজেন্ট স্ট্যাটাস দেখুন
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧩 Editor Agent - Source Analysis
+Symbol extraction, syntax checks and lint for the editor agent
+
+Everything here is a plain function with no import-time side effects:
+these run in ProcessPoolExecutor workers, which (under the spawn start
+method) import this module fresh and must not build an EditorAgent.
+"""
+
+import os
+import re
+import ast
+import json
+import hashlib
+from typing import Dict, Any, List, Optional
+
+# Project files by extension; the project scan, symbol index and diagnostics all derive from this
+SOURCE_LANGUAGES = {".py": "python", ".js": "javascript", ".jsx": "javascript", ".ts": "typescript",
+                    ".tsx": "typescript", ".json": "json", ".html": "html", ".css": "css", ".md": "markdown"}
+
+# Symbol index settings
+SYMBOL_INDEX_EXTENSIONS = {ext: language for ext, language in SOURCE_LANGUAGES.items()
+                           if language in ("python", "javascript", "typescript")}
+SYMBOL_INDEX_MAX_FILE_SIZE = 1024 * 1024  # Skip generated/minified files over 1MB
+
+# Batch diagnostics languages
+DIAGNOSTICS_LANGUAGES = {ext: language for ext, language in SOURCE_LANGUAGES.items()
+                         if language in ("python", "javascript", "typescript", "json")}
+
+_JS_TOKEN_RE = re.compile(
+    r"//[^\n]*|/\*.*?\*/"                      # comments
+    r"|`(?:\\.|[^`\\])*`"                      # template strings
+    r"|'(?:\\.|[^'\\\n])*'|\"(?:\\.|[^\"\\\n])*\""  # quoted strings
+    r"|[A-Za-z_$][\w$]*"                       # identifiers
+    r"|\n|\S",
+    re.S
+)
+_JS_KEYWORDS = {
+    "if", "for", "while", "switch", "catch", "return", "function", "typeof", "new",
+    "delete", "void", "await", "yield", "super", "import", "export", "class", "with",
+    "else", "do", "try", "finally", "throw", "in", "of", "instanceof"
+}
+
+
+def hash_content(content: bytes) -> str:
+    """Content hash used to key symbol shards"""
+    return hashlib.sha1(content).hexdigest()
+
+
+def parse_python_symbols(source: str) -> Dict[str, List[Dict[str, Any]]]:
+    """Extract definitions, imports and call sites from Python source using ast"""
+    symbols = {"definitions": [], "imports": [], "calls": []}
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError) as e:
+        symbols["error"] = str(e)
+        return symbols
+
+    def visit(node, scope: List[tuple]):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                kind = "class" if isinstance(child, ast.ClassDef) else ("method" if scope and scope[-1][0] == "class" else "function")
+                qualname = ".".join([s[1] for s in scope] + [child.name])
+                symbols["definitions"].append({
+                    "name": child.name,
+                    "qualname": qualname,
+                    "kind": kind,
+                    "line": child.lineno,
+                    "end_line": getattr(child, "end_lineno", child.lineno)
+                })
+                visit(child, scope + [("class" if kind == "class" else "function", child.name)])
+                continue
+            if isinstance(child, ast.Import):
+                for alias in child.names:
+                    symbols["imports"].append({"module": alias.name, "name": alias.asname or alias.name, "line": child.lineno})
+            elif isinstance(child, ast.ImportFrom):
+                module = "." * child.level + (child.module or "")
+                for alias in child.names:
+                    symbols["imports"].append({"module": module, "name": alias.asname or alias.name, "line": child.lineno})
+            elif isinstance(child, ast.Call):
+                func = child.func
+                name = func.id if isinstance(func, ast.Name) else func.attr if isinstance(func, ast.Attribute) else None
+                if name:
+                    symbols["calls"].append({
+                        "name": name,
+                        "line": child.lineno,
+                        "caller": ".".join(s[1] for s in scope) or "<module>"
+                    })
+            visit(child, scope)
+
+    visit(tree, [])
+    return symbols
+
+
+def parse_js_symbols(source: str) -> Dict[str, List[Dict[str, Any]]]:
+    """Extract definitions, imports and call sites from JS/TS source with a light tokenizer"""
+    symbols = {"definitions": [], "imports": [], "calls": []}
+    tokens = []
+    line = 1
+    for match in _JS_TOKEN_RE.finditer(source):
+        token = match.group(0)
+        if token == "\n":
+            line += 1
+            continue
+        if token[0] in "'\"`":
+            tokens.append(("str", token[1:-1], line))
+        elif not token.startswith(("//", "/*")):
+            tokens.append(("id" if (token[0].isalpha() or token[0] in "_$") else "op", token, line))
+        line += token.count("\n")
+
+    scope = []  # (name, kind, brace depth at which it was opened)
+    depth = 0
+    pending_scope = None
+    for i, (kind, value, tok_line) in enumerate(tokens):
+        nxt = tokens[i + 1] if i + 1 < len(tokens) else (None, None, None)
+        prev = tokens[i - 1] if i > 0 else (None, None, None)
+        if kind == "op":
+            if value == "{":
+                depth += 1
+                if pending_scope:
+                    scope.append(pending_scope + (depth,))
+                    pending_scope = None
+            elif value == "}":
+                if scope and scope[-1][2] == depth:
+                    scope.pop()
+                depth -= 1
+            continue
+        if kind != "id":
+            continue
+
+        if value in ("function", "class") and nxt[0] == "id":
+            symbols["definitions"].append({
+                "name": nxt[1],
+                "qualname": ".".join([s[0] for s in scope] + [nxt[1]]),
+                "kind": "class" if value == "class" else "function",
+                "line": nxt[2]
+            })
+            pending_scope = (nxt[1], value)
+        elif value in ("const", "let", "var") and nxt[0] == "id" and i + 2 < len(tokens) and tokens[i + 2][1] == "=":
+            after = tokens[i + 3] if i + 3 < len(tokens) else (None, None, None)
+            if after[1] in ("function", "async", "(") or (after[0] == "id" and i + 4 < len(tokens) and tokens[i + 4][1] == "="):
+                symbols["definitions"].append({
+                    "name": nxt[1],
+                    "qualname": ".".join([s[0] for s in scope] + [nxt[1]]),
+                    "kind": "function",
+                    "line": nxt[2]
+                })
+                pending_scope = (nxt[1], "function")
+        elif value == "from" and nxt[0] == "str":
+            symbols["imports"].append({"module": nxt[1], "name": nxt[1], "line": nxt[2]})
+        elif value == "import" and nxt[0] == "str":
+            symbols["imports"].append({"module": nxt[1], "name": nxt[1], "line": nxt[2]})
+        elif value == "require" and nxt[1] == "(" and i + 2 < len(tokens) and tokens[i + 2][0] == "str":
+            symbols["imports"].append({"module": tokens[i + 2][1], "name": tokens[i + 2][1], "line": tok_line})
+        elif nxt[1] == "(" and value not in _JS_KEYWORDS and prev[1] not in ("function", "class"):
+            # Method definitions sit directly in a class body and look like calls
+            in_class_body = bool(scope) and scope[-1][1] == "class" and scope[-1][2] == depth
+            if in_class_body:
+                symbols["definitions"].append({
+                    "name": value,
+                    "qualname": ".".join([s[0] for s in scope] + [value]),
+                    "kind": "method",
+                    "line": tok_line
+                })
+                pending_scope = (value, "method")
+            else:
+                symbols["calls"].append({
+                    "name": value,
+                    "line": tok_line,
+                    "caller": ".".join(s[0] for s in scope) or "<module>"
+                })
+    return symbols
+
+
+def index_file(file_path: str) -> Optional[Dict[str, Any]]:
+    """Build a symbol shard for one file (runs inside worker processes)"""
+    try:
+        stat = os.stat(file_path)
+        if stat.st_size > SYMBOL_INDEX_MAX_FILE_SIZE:
+            return None
+        with open(file_path, 'rb') as f:
+            content = f.read()
+    except OSError:
+        return None
+
+    language = SYMBOL_INDEX_EXTENSIONS.get(os.path.splitext(file_path)[1].lower())
+    if not language:
+        return None
+
+    source = content.decode('utf-8', errors='replace')
+    symbols = parse_python_symbols(source) if language == "python" else parse_js_symbols(source)
+    symbols.update({
+        "path": file_path,
+        "language": language,
+        "hash": hash_content(content),
+        "mtime": stat.st_mtime,
+        "size": stat.st_size
+    })
+    return symbols
+
+
+def lint_python(tree: ast.AST) -> List[Dict[str, Any]]:
+    """Light lint pass: unused imports, bare except, mutable defaults, None comparisons"""
+    diagnostics = []
+    imported = {}
+    used = set()
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                imported.setdefault((alias.asname or alias.name).split(".")[0], node.lineno)
+        elif isinstance(node, ast.ImportFrom):
+            for alias in node.names:
+                if alias.name != "*":
+                    imported.setdefault(alias.asname or alias.name, node.lineno)
+        elif isinstance(node, ast.Name):
+            used.add(node.id)
+        elif isinstance(node, ast.ExceptHandler) and node.type is None:
+            diagnostics.append({"line": node.lineno, "column": node.col_offset + 1, "severity": "warning",
+                                "source": "lint", "message": "Bare 'except:' catches SystemExit and KeyboardInterrupt"})
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            for default in node.args.defaults + [d for d in node.args.kw_defaults if d is not None]:
+                if isinstance(default, (ast.List, ast.Dict, ast.Set)):
+                    diagnostics.append({"line": default.lineno, "column": default.col_offset + 1, "severity": "warning",
+                                        "source": "lint", "message": f"Mutable default argument in '{node.name}'"})
+        elif isinstance(node, ast.Compare):
+            for op, comparator in zip(node.ops, node.comparators):
+                if isinstance(op, (ast.Eq, ast.NotEq)) and isinstance(comparator, ast.Constant) and comparator.value is None:
+                    diagnostics.append({"line": node.lineno, "column": node.col_offset + 1, "severity": "info",
+                                        "source": "lint", "message": "Comparison to None should use 'is' / 'is not'"})
+        elif isinstance(node, ast.Attribute):
+            base = node
+            while isinstance(base, ast.Attribute):
+                base = base.value
+            if isinstance(base, ast.Name):
+                used.add(base.id)
+
+    # Names listed in a module-level __all__ (=, += or annotated) count as used
+    for node in getattr(tree, "body", []):
+        if isinstance(node, ast.Assign):
+            targets = node.targets
+        elif isinstance(node, (ast.AugAssign, ast.AnnAssign)):
+            targets = [node.target]
+        else:
+            continue
+        if node.value is not None and any(isinstance(target, ast.Name) and target.id == "__all__" for target in targets):
+            for element in ast.walk(node.value):
+                if isinstance(element, ast.Constant) and isinstance(element.value, str):
+                    used.add(element.value)
+
+    for name, line in imported.items():
+        if name not in used:
+            diagnostics.append({"line": line, "column": 1, "severity": "warning",
+                                "source": "lint", "message": f"'{name}' imported but unused"})
+    return diagnostics
+
+
+def check_brackets(code: str) -> List[Dict[str, Any]]:
+    """Bracket balance check that skips strings and comments"""
+    pairs = {')': '(', '}': '{', ']': '['}
+    stack = []
+    line = 1
+    for match in _JS_TOKEN_RE.finditer(code):
+        token = match.group(0)
+        if token in ("(", "{", "["):
+            stack.append((token, line))
+        elif token in pairs:
+            if not stack or stack[-1][0] != pairs[token]:
+                return [{"line": line, "column": 1, "severity": "error", "source": "syntax",
+                         "message": f"Unexpected '{token}'"}]
+            stack.pop()
+        line += token.count("\n")
+    if stack:
+        token, opened_line = stack[-1]
+        return [{"line": opened_line, "column": 1, "severity": "error", "source": "syntax",
+                 "message": f"Unclosed '{token}'"}]
+    return []
+
+
+def check_source(language: str, code: str) -> List[Dict[str, Any]]:
+    """Syntax-check and lint one source text (runs inside worker processes)"""
+    if not code.strip():
+        # Empty files (e.g. package __init__.py) are valid
+        return []
+
+    if language == "python":
+        try:
+            tree = ast.parse(code)
+        except SyntaxError as e:
+            return [{"line": e.lineno or 1, "column": e.offset or 1, "severity": "error",
+                     "source": "syntax", "message": e.msg}]
+        except ValueError as e:
+            return [{"line": 1, "column": 1, "severity": "error", "source": "syntax", "message": str(e)}]
+        return lint_python(tree)
+
+    if language == "json":
+        try:
+            json.loads(code)
+            return []
+        except json.JSONDecodeError as e:
+            return [{"line": e.lineno, "column": e.colno, "severity": "error", "source": "syntax", "message": e.msg}]
+
+    if language in ("javascript", "typescript", "unknown"):
+        return check_brackets(code)
+
+    return []
+
+
+def check_item(item: tuple) -> tuple:
+    """Worker entry point: (key, language, code) -> (key, diagnostics)"""
+    key, language, code = item
+    try:
+        return key, check_source(language, code)
+    except Exception as e:
+        return key, [{"line": 1, "column": 1, "severity": "error", "source": "checker", "message": str(e)}]
@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🔍 ZombieCoder Code Search Index
+Trigram inverted index for fast literal and regex search over project files
+"""
+
+import os
+import re
+import json
+import time
+import zlib
+import struct
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Set
+
+try:
+    import re._parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+logger = logging.getLogger(__name__)
+
+INDEX_MAGIC = b"ZCTI1"
+MAX_FILE_SIZE = 1024 * 1024  # Skip files over 1MB
+BINARY_SNIFF_BYTES = 8192
+IGNORE_DIRS = {"node_modules", "__pycache__", ".git", "venv", ".venv", ".vscode", ".next", "dist", "build"}
+COMPACT_RATIO = 0.25  # Compact when this share of documents are deleted
+
+
+def encode_postings(doc_ids: List[int]) -> bytes:
+    """Delta + varint encode a sorted posting list"""
+    out = bytearray()
+    previous = 0
+    for doc_id in doc_ids:
+        delta = doc_id - previous
+        previous = doc_id
+        while delta >= 0x80:
+            out.append((delta & 0x7F) | 0x80)
+            delta >>= 7
+        out.append(delta)
+    return bytes(out)
+
+
+def decode_postings(data: bytes) -> List[int]:
+    """Decode a delta + varint encoded posting list"""
+    doc_ids = []
+    current = 0
+    value = 0
+    shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        current += value
+        doc_ids.append(current)
+        value = 0
+        shift = 0
+    return doc_ids
+
+
+def extract_trigrams(text: str) -> Set[str]:
+    """Get the set of lowercase trigrams in a text"""
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def regex_required_literals(pattern: str) -> List[str]:
+    """Extract literal runs (3+ chars) that every match of a regex must contain"""
+    try:
+        parsed = sre_parse.parse(pattern)
+    except Exception:
+        return []
+    return [literal for literal in _required_literals(parsed) if len(literal) >= 3]
+
+
+def _required_literals(parsed) -> List[str]:
+    literals = []
+    current = []
+    for op, arg in parsed:
+        if op == sre_parse.LITERAL:
+            current.append(chr(arg))
+            continue
+        if current:
+            literals.append("".join(current))
+            current = []
+        # A repeated literal with min >= 1 still guarantees one occurrence
+        if op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and arg[0] >= 1:
+            sub = list(arg[2])
+            if sub and all(sub_op == sre_parse.LITERAL for sub_op, _ in sub):
+                literals.append("".join(chr(c) for _, c in sub))
+        elif op == sre_parse.SUBPATTERN:
+            literals.extend(_required_literals(arg[-1]))
+    if current:
+        literals.append("".join(current))
+    return literals
+
+
+class TrigramIndex:
+    """Trigram inverted index over the files of one project"""
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self.docs = {}  # doc id -> {"path", "mtime", "size"}
+        self.path_to_doc = {}  # relative path -> doc id
+        self.skipped = {}  # relative path -> [mtime, size] of binary, oversized or unreadable files
+        self.postings = {}  # trigram -> list of doc ids, or encoded bytes until first use
+        self.deleted = set()
+        self.next_id = 0
+        self.last_refresh = 0.0
+        self.dirty = False
+        self.lock = threading.RLock()
+
+    def refresh(self) -> Dict[str, int]:
+        """Walk the project and re-index new, changed and deleted files"""
+        stats = {"added": 0, "updated": 0, "removed": 0}
+        seen = set()
+
+        for current_dir, dirs, files in os.walk(self.root):
+            dirs[:] = [d for d in dirs if d not in IGNORE_DIRS]
+            for file_name in files:
+                full_path = os.path.join(current_dir, file_name)
+                rel_path = os.path.relpath(full_path, self.root)
+                seen.add(rel_path)
+                try:
+                    stat = os.stat(full_path)
+                except OSError:
+                    continue
+
+                # Files that could not be indexed are only retried once they change
+                if self.skipped.get(rel_path) == [stat.st_mtime, stat.st_size]:
+                    continue
+
+                doc_id = self.path_to_doc.get(rel_path)
+                if doc_id is not None:
+                    doc = self.docs[doc_id]
+                    if doc["mtime"] == stat.st_mtime and doc["size"] == stat.st_size:
+                        continue
+                    if self.update_file(rel_path):
+                        stats["updated"] += 1
+                elif self.update_file(rel_path):
+                    stats["added"] += 1
+
+        for rel_path in list(self.path_to_doc.keys()):
+            if rel_path not in seen:
+                self.remove_file(rel_path)
+                stats["removed"] += 1
+        with self.lock:
+            for rel_path in [path for path in self.skipped if path not in seen]:
+                del self.skipped[rel_path]
+                self.dirty = True
+
+        self.last_refresh = time.time()
+        return stats
+
+    def update_file(self, rel_path: str) -> bool:
+        """Index (or re-index) a single file given its path relative to the root"""
+        full_path = os.path.join(self.root, rel_path)
+        try:
+            stat = os.stat(full_path)
+        except OSError:
+            stat = None
+        text = self._read_text(full_path) if stat else None
+
+        with self.lock:
+            old_id = self.path_to_doc.pop(rel_path, None)
+            if old_id is not None:
+                self.docs.pop(old_id, None)
+                self.deleted.add(old_id)
+                self.dirty = True
+            if text is None:
+                if stat:
+                    self.skipped[rel_path] = [stat.st_mtime, stat.st_size]
+                    self.dirty = True
+                return False
+
+            self.skipped.pop(rel_path, None)
+            doc_id = self.next_id
+            self.next_id += 1
+            self.docs[doc_id] = {"path": rel_path, "mtime": stat.st_mtime, "size": stat.st_size}
+            self.path_to_doc[rel_path] = doc_id
+            for trigram in extract_trigrams(text):
+                self._posting_list(trigram, create=True).append(doc_id)
+            self.dirty = True
+            return True
+
+    def remove_file(self, rel_path: str):
+        """Remove a file from the index (tombstoned until the next compaction)"""
+        with self.lock:
+            doc_id = self.path_to_doc.pop(rel_path, None)
+            if doc_id is not None:
+                self.docs.pop(doc_id, None)
+                self.deleted.add(doc_id)
+                self.dirty = True
+            if self.skipped.pop(rel_path, None):
+                self.dirty = True
+
+    def candidates(self, literals: List[str]) -> Optional[List[int]]:
+        """Intersect posting lists for the trigrams of required literals (None = all docs)"""
+        trigrams = set()
+        for literal in literals:
+            trigrams |= extract_trigrams(literal)
+        if not trigrams:
+            return None
+
+        with self.lock:
+            lists = [self._posting_list(trigram) for trigram in trigrams]
+            if any(not posting for posting in lists):
+                return []
+            lists.sort(key=len)
+            result = set(lists[0])
+            for posting in lists[1:]:
+                result.intersection_update(posting)
+                if not result:
+                    break
+            return sorted(doc_id for doc_id in result if doc_id not in self.deleted)
+
+    def search(self, query: str, regex: bool = False, case_sensitive: bool = False,
+               max_results: int = 100) -> Dict[str, Any]:
+        """Search the project for a literal or regex query"""
+        start_time = time.time()
+        flags = 0 if case_sensitive else re.IGNORECASE
+        if regex:
+            matcher = re.compile(query, flags | re.MULTILINE)
+            literals = regex_required_literals(query)
+        else:
+            matcher = re.compile(re.escape(query), flags)
+            literals = [query]
+
+        doc_ids = self.candidates(literals)
+        with self.lock:
+            if doc_ids is None:
+                doc_ids = sorted(self.docs.keys())
+            docs = [(doc_id, self.docs[doc_id]["path"]) for doc_id in doc_ids if doc_id in self.docs]
+
+        results = []
+        files_matched = 0
+        for doc_id, rel_path in docs:
+            text = self._read_text(os.path.join(self.root, rel_path))
+            if not text:
+                continue
+            file_matched = False
+            for match in matcher.finditer(text):
+                line_start = text.rfind("\n", 0, match.start()) + 1
+                line_end = text.find("\n", match.start())
+                if line_end == -1:
+                    line_end = len(text)
+                results.append({
+                    "path": rel_path,
+                    "line": text.count("\n", 0, match.start()) + 1,
+                    "column": match.start() - line_start + 1,
+                    "text": text[line_start:line_end][:300]
+                })
+                file_matched = True
+                if len(results) >= max_results:
+                    break
+            files_matched += int(file_matched)
+            if len(results) >= max_results:
+                break
+
+        return {
+            "query": query,
+            "regex": regex,
+            "results": results,
+            "count": len(results),
+            "truncated": len(results) >= max_results,
+            "candidates": len(docs),
+            "files_matched": files_matched,
+            "indexed_files": len(self.docs),
+            "took_ms": round((time.time() - start_time) * 1000, 2)
+        }
+
+    def compact(self):
+        """Drop tombstoned documents and renumber doc ids densely"""
+        with self.lock:
+            remap = {old_id: new_id for new_id, old_id in enumerate(sorted(self.docs.keys()))}
+            postings = {}
+            for trigram in list(self.postings.keys()):
+                doc_ids = [remap[doc_id] for doc_id in self._posting_list(trigram) if doc_id in remap]
+                if doc_ids:
+                    postings[trigram] = doc_ids
+            self.postings = postings
+            self.docs = {remap[doc_id]: doc for doc_id, doc in self.docs.items()}
+            self.path_to_doc = {doc["path"]: doc_id for doc_id, doc in self.docs.items()}
+            self.deleted = set()
+            self.next_id = len(self.docs)
+            self.dirty = True
+
+    def save(self, index_file: Path):
+        """Persist the index with delta/varint posting lists, zlib compressed"""
+        with self.lock:
+            if self.deleted and len(self.deleted) > COMPACT_RATIO * max(1, self.next_id):
+                self.compact()
+
+            blob = bytearray()
+            offsets = {}
+            for trigram, posting in self.postings.items():
+                encoded = posting if isinstance(posting, bytes) else encode_postings(posting)
+                offsets[trigram] = [len(blob), len(encoded)]
+                blob.extend(encoded)
+
+            header = json.dumps({
+                "root": self.root,
+                "next_id": self.next_id,
+                "deleted": sorted(self.deleted),
+                "docs": {str(doc_id): [doc["path"], doc["mtime"], doc["size"]] for doc_id, doc in self.docs.items()},
+                "skipped": self.skipped,
+                "postings": offsets
+            }, ensure_ascii=False).encode("utf-8")
+
+            payload = zlib.compress(struct.pack(">I", len(header)) + header + bytes(blob), 6)
+            index_file.parent.mkdir(parents=True, exist_ok=True)
+            temp_file = index_file.with_suffix(".tmp")
+            with open(temp_file, "wb") as f:
+                f.write(INDEX_MAGIC + payload)
+            os.replace(temp_file, index_file)
+            self.dirty = False
+
+    @classmethod
+    def load(cls, index_file: Path) -> Optional["TrigramIndex"]:
+        """Load a persisted index; posting lists stay encoded until first use"""
+        if not index_file.exists():
+            return None
+        try:
+            with open(index_file, "rb") as f:
+                data = f.read()
+            if not data.startswith(INDEX_MAGIC):
+                return None
+            payload = zlib.decompress(data[len(INDEX_MAGIC):])
+            header_length = struct.unpack(">I", payload[:4])[0]
+            header = json.loads(payload[4:4 + header_length].decode("utf-8"))
+            blob = payload[4 + header_length:]
+        except Exception as e:
+            logger.warning(f"Search index load failed ({index_file}): {e}")
+            return None
+
+        index = cls(header["root"])
+        index.next_id = header["next_id"]
+        index.deleted = set(header["deleted"])
+        for doc_id, (path, mtime, size) in header["docs"].items():
+            index.docs[int(doc_id)] = {"path": path, "mtime": mtime, "size": size}
+            index.path_to_doc[path] = int(doc_id)
+        index.skipped = header.get("skipped", {})
+        index.postings = {trigram: blob[offset:offset + length] for trigram, (offset, length) in header["postings"].items()}
+        return index
+
+    def _posting_list(self, trigram: str, create: bool = False) -> List[int]:
+        posting = self.postings.get(trigram)
+        if posting is None:
+            if not create:
+                return []
+            posting = self.postings[trigram] = []
+        elif isinstance(posting, bytes):
+            posting = self.postings[trigram] = decode_postings(posting)
+        return posting
+
+    def _read_text(self, full_path: str) -> Optional[str]:
+        try:
+            if os.path.getsize(full_path) > MAX_FILE_SIZE:
+                return None
+            with open(full_path, "rb") as f:
+                content = f.read()
+        except OSError:
+            return None
+        if b"\x00" in content[:BINARY_SNIFF_BYTES]:
+            return None
+        return content.decode("utf-8", errors="replace")
+
+
+class CodeSearchManager:
+    """Manages one persistent trigram index per registered project"""
+
+    def __init__(self, index_dir: str = "data/search_index", refresh_interval: float = 5.0):
+        self.index_dir = Path(index_dir)
+        self.refresh_interval = refresh_interval
+        self.indexes = {}
+        self.lock = threading.Lock()
+
+    def index_file_for(self, project_path: str) -> Path:
+        """Get the on-disk index file for a project"""
+        digest = hashlib.sha1(os.path.abspath(project_path).encode("utf-8")).hexdigest()[:16]
+        return self.index_dir / f"{digest}.idx"
+
+    def get_index(self, project_path: str) -> TrigramIndex:
+        """Get a project's index, loading it from disk or building it on first use"""
+        project_path = os.path.abspath(project_path)
+        with self.lock:
+            index = self.indexes.get(project_path)
+            if index is None:
+                index = TrigramIndex.load(self.index_file_for(project_path)) or TrigramIndex(project_path)
+                self.indexes[project_path] = index
+
+        if time.time() - index.last_refresh >= self.refresh_interval:
+            stats = index.refresh()
+            if index.dirty:
+                logger.info(f"🔍 Search index refreshed for {project_path}: {stats}")
+                self.save_index(project_path)
+        return index
+
+    def search(self, project_path: str, query: str, regex: bool = False,
+               case_sensitive: bool = False, max_results: int = 100) -> Dict[str, Any]:
+        """Search a project"""
+        return self.get_index(project_path).search(query, regex, case_sensitive, max_results)
+
+    def save_index(self, project_path: str):
+        """Persist a project's index if it changed"""
+        index = self.indexes.get(os.path.abspath(project_path))
+        if index and index.dirty:
+            try:
+                index.save(self.index_file_for(project_path))
+            except Exception as e:
+                logger.error(f"Search index save error: {e}")
+
+    def drop_index(self, project_path: str):
+        """Forget a project's index and delete it from disk"""
+        project_path = os.path.abspath(project_path)
+        with self.lock:
+            self.indexes.pop(project_path, None)
+        try:
+            self.index_file_for(project_path).unlink()
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"Search index removal error: {e}")
+
+# Global instance
+code_search_manager = CodeSearchManager()
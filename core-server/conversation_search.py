@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🔎 ZombieCoder Conversation Search
+SQLite FTS5 full-text index over stored conversations (Bengali + English)
+"""
+
+import os
+import re
+import json
+import time
+import base64
+import hashlib
+import sqlite3
+import logging
+import threading
+import unicodedata
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# unicode61 treats Bengali vowel signs and other combining marks as separators,
+# which splits words like "ভালো" into fragments; declare them as token characters
+BENGALI_MARKS = "".join(
+    chr(code) for code in range(0x0980, 0x0A00)
+    if unicodedata.category(chr(code)) in ("Mn", "Mc")
+)
+FTS_TOKENIZER = f"unicode61 remove_diacritics 2 tokenchars '{BENGALI_MARKS}'"
+
+# Query terms are split on whitespace and punctuation only (not \w, which excludes Bengali marks)
+QUERY_TERM_RE = re.compile(r"[^\s.,;:!?'\"()\[\]{}<>*^\-+|/\\।]+")
+
+# The same turn recorded through more than one path (session memory, database)
+# within this many seconds is indexed once
+DUPLICATE_WINDOW_SECONDS = 30
+
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_END = "</mark>"
+
+
+class ConversationSearchIndex:
+    """Full-text index over conversation messages and responses"""
+
+    def __init__(self, db_path: str = "data/conversation_search.db"):
+        self.db_path = db_path
+        self.local = threading.local()
+        self.schema_ready = False
+        self.schema_lock = threading.Lock()
+
+    def get_connection(self) -> sqlite3.Connection:
+        """Get this thread's connection, creating the schema on first use"""
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            connection = sqlite3.connect(self.db_path, timeout=10)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.local.connection = connection
+        if not self.schema_ready:
+            with self.schema_lock:
+                if not self.schema_ready:
+                    self.create_schema(connection)
+        return connection
+
+    def create_schema(self, connection: sqlite3.Connection):
+        """Create the FTS5 table and the recent-turn digests used to skip duplicates"""
+        connection.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS conversation_fts USING fts5(
+                message, response,
+                user_id UNINDEXED, agent UNINDEXED, session_id UNINDEXED,
+                source UNINDEXED, created_at UNINDEXED,
+                tokenize = "{FTS_TOKENIZER}"
+            )
+        """)
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS conversation_digests (
+                digest TEXT PRIMARY KEY,
+                fts_rowid INTEGER NOT NULL,
+                indexed_at REAL NOT NULL
+            )
+        """)
+        connection.execute("CREATE INDEX IF NOT EXISTS idx_digests_indexed_at ON conversation_digests (indexed_at)")
+        connection.commit()
+        self.schema_ready = True
+
+    def add(self, message: str, response: str, user_id: Any = None, agent: Any = None,
+            session_id: str = None, source: str = "database", created_at: str = None) -> Optional[int]:
+        """Index one conversation turn (call after the turn has been stored)
+
+        This is the single entry point for live turns: a turn already indexed
+        within DUPLICATE_WINDOW_SECONDS returns the existing row id instead
+        of being indexed a second time.
+        """
+        digest = hashlib.sha1(f"{message or ''}\0{response or ''}".encode("utf-8")).hexdigest()
+        now = time.time()
+        connection = None
+        try:
+            connection = self.get_connection()
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute("SELECT fts_rowid, indexed_at FROM conversation_digests WHERE digest = ?",
+                                     (digest,)).fetchone()
+            if row and now - row["indexed_at"] < DUPLICATE_WINDOW_SECONDS:
+                connection.rollback()
+                return row["fts_rowid"]
+
+            cursor = connection.execute("""
+                INSERT INTO conversation_fts (message, response, user_id, agent, session_id, source, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (
+                message or "", response or "",
+                None if user_id is None else str(user_id),
+                None if agent is None else str(agent),
+                session_id, source,
+                created_at or datetime.now().isoformat()
+            ))
+            rowid = cursor.lastrowid
+            connection.execute("INSERT OR REPLACE INTO conversation_digests (digest, fts_rowid, indexed_at) VALUES (?, ?, ?)",
+                               (digest, rowid, now))
+            connection.execute("DELETE FROM conversation_digests WHERE indexed_at < ?",
+                               (now - DUPLICATE_WINDOW_SECONDS,))
+            connection.commit()
+            return rowid
+        except Exception as e:
+            logger.error(f"Conversation index error: {e}")
+            if connection is not None and connection.in_transaction:
+                connection.rollback()
+            return None
+
+    def add_many(self, entries: List[Dict[str, Any]], source: str = "database") -> int:
+        """Index many conversation turns in one transaction"""
+        rows = [(
+            entry.get("message") or "", entry.get("response") or "",
+            None if entry.get("user_id") is None else str(entry.get("user_id")),
+            None if entry.get("agent") is None else str(entry.get("agent")),
+            entry.get("session_id"), entry.get("source", source),
+            entry.get("created_at") or entry.get("timestamp") or datetime.now().isoformat()
+        ) for entry in entries]
+        try:
+            connection = self.get_connection()
+            connection.executemany("""
+                INSERT INTO conversation_fts (message, response, user_id, agent, session_id, source, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+            connection.commit()
+            return len(rows)
+        except Exception as e:
+            logger.error(f"Conversation index error: {e}")
+            return 0
+
+    def count(self) -> int:
+        """Number of indexed conversation turns"""
+        return self.get_connection().execute("SELECT COUNT(*) FROM conversation_fts").fetchone()[0]
+
+    def build_match_query(self, query: str) -> str:
+        """Turn free text into an FTS5 query: every term must match, last term as a prefix"""
+        terms = QUERY_TERM_RE.findall(query)
+        if not terms:
+            return ""
+        quoted = ['"' + term.replace('"', '""') + '"' for term in terms]
+        quoted[-1] += "*"
+        return " ".join(quoted)
+
+    def search(self, query: str, user_id: Any = None, agent: str = None, since: str = None,
+               until: str = None, limit: int = 20, cursor: str = None, raw_query: bool = False) -> Dict[str, Any]:
+        """Ranked search with highlighted snippets and keyset pagination
+
+        The cursor is opaque; pass back next_cursor to fetch the following page.
+        """
+        limit = max(1, min(int(limit), 100))
+        match_query = query if raw_query else self.build_match_query(query)
+        if not match_query:
+            return {"query": query, "results": [], "count": 0, "next_cursor": None}
+
+        sql = f"""
+            SELECT * FROM (
+                SELECT rowid, user_id, agent, session_id, source, created_at,
+                       bm25(conversation_fts, 1.0, 0.6) AS score,
+                       snippet(conversation_fts, 0, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}', '…', 16) AS message_snippet,
+                       snippet(conversation_fts, 1, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}', '…', 24) AS response_snippet
+                FROM conversation_fts
+                WHERE conversation_fts MATCH ?
+            ) WHERE 1=1
+        """
+        params = [match_query]
+
+        if user_id is not None:
+            sql += " AND user_id = ?"
+            params.append(str(user_id))
+        if agent:
+            sql += " AND agent = ?"
+            params.append(agent)
+        if since:
+            sql += " AND created_at >= ?"
+            params.append(since)
+        if until:
+            sql += " AND created_at < ?"
+            params.append(until)
+
+        # Keyset pagination on (score, rowid): lower bm25 scores rank higher
+        if cursor:
+            last_score, last_rowid = self.decode_cursor(cursor)
+            sql += " AND (score > ? OR (score = ? AND rowid > ?))"
+            params.extend([last_score, last_score, last_rowid])
+
+        sql += " ORDER BY score, rowid LIMIT ?"
+        params.append(limit + 1)
+
+        try:
+            rows = self.get_connection().execute(sql, params).fetchall()
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Conversation search query error: {e}")
+            return {"query": query, "results": [], "count": 0, "next_cursor": None, "error": str(e)}
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        results = [{
+            "id": row["rowid"],
+            "user_id": row["user_id"],
+            "agent": row["agent"],
+            "session_id": row["session_id"],
+            "source": row["source"],
+            "created_at": row["created_at"],
+            "score": round(-row["score"], 4),
+            "message_snippet": row["message_snippet"],
+            "response_snippet": row["response_snippet"]
+        } for row in rows]
+
+        return {
+            "query": query,
+            "results": results,
+            "count": len(results),
+            "next_cursor": self.encode_cursor(rows[-1]["score"], rows[-1]["rowid"]) if has_more else None
+        }
+
+    def get_conversation(self, conversation_id: int) -> Optional[Dict[str, Any]]:
+        """Get the full text of an indexed conversation turn"""
+        row = self.get_connection().execute("""
+            SELECT rowid, message, response, user_id, agent, session_id, source, created_at
+            FROM conversation_fts WHERE rowid = ?
+        """, (conversation_id,)).fetchone()
+        return dict(row) if row else None
+
+    def encode_cursor(self, score: float, rowid: int) -> str:
+        return base64.urlsafe_b64encode(json.dumps([score, rowid]).encode("utf-8")).decode("ascii")
+
+    def decode_cursor(self, cursor: str) -> tuple:
+        try:
+            score, rowid = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+            return float(score), int(rowid)
+        except Exception:
+            raise ValueError("Invalid cursor")
+
+    def optimize(self):
+        """Merge FTS5 index segments"""
+        connection = self.get_connection()
+        connection.execute("INSERT INTO conversation_fts(conversation_fts) VALUES ('optimize')")
+        connection.commit()
+
+# Global instance
+conversation_search = ConversationSearchIndex()
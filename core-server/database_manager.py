@@ -3,16 +3,586 @@ import mysql.connector
 from mysql.connector import Error
 import sqlite3
 import json
+import time
+import base64
+import uuid
+import queue
+import atexit
+import threading
 from typing import Optional, Dict, Any, List
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
+from conversation_search import conversation_search
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class PooledMySQLConnection:
+    """MySQL connection wrapper whose close() returns it to the pool"""
+    
+    def __init__(self, pool: 'MySQLConnectionPool', connection):
+        self._pool = pool
+        self._connection = connection
+        self._released = False
+    
+    def close(self):
+        if not self._released:
+            self._released = True
+            self._pool.release(self._connection)
+    
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+    
+    def __del__(self):
+        # Callers that bail out on an exception without close() must not leak pool slots
+        try:
+            self.close()
+        except Exception:
+            pass
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class MySQLConnectionPool:
+    """Bounded MySQL connection pool for one database, validated on checkout"""
+    
+    def __init__(self, database: Optional[str], connect, max_size: int = 8,
+                 validate_after: float = 30.0, checkout_timeout: float = 5.0):
+        self.database = database
+        self.connect = connect
+        self.max_size = max_size
+        self.validate_after = validate_after
+        self.checkout_timeout = checkout_timeout
+        self.idle = queue.LifoQueue()  # (connection, returned_at)
+        self.lock = threading.Lock()
+        self.size = 0
+        self.stats = {"created": 0, "reused": 0, "checkouts": 0, "invalidated": 0, "timeouts": 0, "connect_failures": 0}
+    
+    def acquire(self) -> Optional[PooledMySQLConnection]:
+        """Check out a connection: reuse an idle one, open a new one, or wait for a release"""
+        deadline = time.time() + self.checkout_timeout
+        while True:
+            try:
+                connection, returned_at = self.idle.get_nowait()
+            except queue.Empty:
+                with self.lock:
+                    can_create = self.size < self.max_size
+                    if can_create:
+                        self.size += 1
+                if can_create:
+                    connection = self.connect(self.database)
+                    if connection is None:
+                        with self.lock:
+                            self.size -= 1
+                        self.stats["connect_failures"] += 1
+                        return None
+                    self.stats["created"] += 1
+                    self.stats["checkouts"] += 1
+                    return PooledMySQLConnection(self, connection)
+                
+                try:
+                    connection, returned_at = self.idle.get(timeout=max(0.0, deadline - time.time()))
+                except queue.Empty:
+                    self.stats["timeouts"] += 1
+                    logger.warning(f"⚠️ MySQL pool exhausted for {self.database or 'server'}")
+                    return None
+            
+            if time.time() - returned_at < self.validate_after or self.is_alive(connection):
+                self.stats["reused"] += 1
+                self.stats["checkouts"] += 1
+                return PooledMySQLConnection(self, connection)
+            self.discard(connection)
+            self.stats["invalidated"] += 1
+    
+    def release(self, connection):
+        """Return a connection to the pool"""
+        try:
+            if connection.in_transaction:
+                connection.rollback()
+        except Exception:
+            self.discard(connection)
+            return
+        self.idle.put((connection, time.time()))
+    
+    def is_alive(self, connection) -> bool:
+        """Validate an idle connection with a cheap ping"""
+        try:
+            connection.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+    
+    def discard(self, connection):
+        """Close a broken connection and free its slot"""
+        try:
+            connection.close()
+        except Exception:
+            pass
+        with self.lock:
+            self.size -= 1
+    
+    def close_all(self):
+        """Close all idle connections"""
+        while True:
+            try:
+                connection, _ = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            self.discard(connection)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get pool statistics"""
+        return dict(self.stats, size=self.size, idle=self.idle.qsize(), in_use=self.size - self.idle.qsize(), max_size=self.max_size)
+
+
+class ReusableSQLiteConnection(sqlite3.Connection):
+    """Per-thread SQLite connection; close() keeps it open for reuse by the same thread"""
+    
+    def close(self):
+        pass
+    
+    def really_close(self):
+        super().close()
+
+
+class SQLiteReplicator:
+    """Ships rows from the local SQLite store to MySQL in the background
+    
+    Local tables are append-only with autoincrement ids and replication_state
+    keeps a cursor (last shipped id) per table. Batches go out as idempotent
+    upserts keyed by origin_key (node id + local id), and a cursor only moves
+    after MySQL has committed, so a crash in between just re-ships rows that
+    MySQL then ignores. A lease row keeps one active replicator per SQLite
+    file across threads and processes; it is renewed before every batch.
+    
+    A batch that keeps failing is split until the rows MySQL rejects are
+    isolated; those move to replication_dead_letters so the cursor can pass
+    them. Rows are only dead-lettered while an empty batch (a connectivity
+    probe) still succeeds, so an outage never empties the queue.
+    """
+    
+    def __init__(self, get_local, ship_batch, batch_size: int = 500, interval: float = 0.5,
+                 lease_seconds: float = 30.0, retention_days: int = 30, max_attempts: int = 5):
+        self.get_local = get_local
+        self.ship_batch = ship_batch
+        self.batch_size = batch_size
+        self.interval = interval
+        self.lease_seconds = lease_seconds
+        self.retention_days = retention_days
+        self.max_attempts = max_attempts
+        self.failures = {}                  # table -> (first local id of the failing batch, attempts)
+        self.owner = uuid.uuid4().hex
+        self.node_id = None
+        self.last_prune = 0.0
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.stats = {"shipped": 0, "batches": 0, "failed_batches": 0, "dead_lettered": 0, "pruned": 0, "last_shipped_at": None}
+        self.worker = None
+    
+    def start(self):
+        """Start the background replication thread"""
+        self.worker = threading.Thread(target=self.run, name="db-replicator", daemon=True)
+        self.worker.start()
+    
+    def run(self):
+        """Worker loop: ship pending rows, then wait for the next tick"""
+        while not self.stopping.wait(self.interval):
+            try:
+                self.replicate_once()
+            except Exception as e:
+                logger.error(f"❌ Replication error: {e}")
+    
+    def get_node_id(self, connection) -> str:
+        """Stable id of this SQLite store, used to build origin keys"""
+        if self.node_id is None:
+            connection.execute("INSERT OR IGNORE INTO replication_state (name, value) VALUES ('node_id', ?)",
+                               (uuid.uuid4().hex[:16],))
+            connection.commit()
+            self.node_id = connection.execute(
+                "SELECT value FROM replication_state WHERE name = 'node_id'").fetchone()[0]
+        return self.node_id
+    
+    def acquire_lease(self, connection) -> bool:
+        """Take or renew the replication lease"""
+        now = time.time()
+        cursor = connection.execute("""
+            UPDATE replication_lease SET owner = ?, expires_at = ?
+            WHERE id = 1 AND (owner = ? OR expires_at < ?)
+        """, (self.owner, now + self.lease_seconds, self.owner, now))
+        connection.commit()
+        return cursor.rowcount == 1
+    
+    def get_cursor(self, connection, table: str) -> int:
+        row = connection.execute("SELECT value FROM replication_state WHERE name = ?",
+                                 (f"cursor:{table}",)).fetchone()
+        return int(row[0]) if row else 0
+    
+    def set_cursor(self, connection, table: str, last_id: int):
+        connection.execute("INSERT OR REPLACE INTO replication_state (name, value) VALUES (?, ?)",
+                           (f"cursor:{table}", str(last_id)))
+        connection.commit()
+    
+    def replicate_once(self) -> int:
+        """Ship every pending row in batches; returns the number of rows shipped"""
+        connection = self.get_local()
+        if connection is None:
+            return 0
+        
+        shipped = 0
+        with self.lock:
+            node_id = None
+            for table, columns in LOCAL_TABLES.items():
+                while True:
+                    # Renewed per batch so a long drain never outlives the lease
+                    if not self.acquire_lease(connection):
+                        return shipped
+                    node_id = node_id or self.get_node_id(connection)
+                    
+                    last_id = self.get_cursor(connection, table)
+                    rows = connection.execute(
+                        f"SELECT id, {', '.join(columns)} FROM {table} WHERE id > ? ORDER BY id LIMIT ?",
+                        (last_id, self.batch_size)
+                    ).fetchall()
+                    if not rows:
+                        break
+                    
+                    batch = [(f"{node_id}:{row[0]}",) + tuple(row[1:]) for row in rows]
+                    rejected = []
+                    if not self.ship_batch(table, batch):
+                        self.stats["failed_batches"] += 1
+                        first_id, attempts = self.failures.get(table, (None, 0))
+                        attempts = attempts + 1 if first_id == rows[0][0] else 1
+                        self.failures[table] = (rows[0][0], attempts)
+                        if attempts < self.max_attempts:
+                            return shipped
+                        rejected = self.isolate_rejected(connection, table, rows, batch)
+                        if rejected is None:
+                            return shipped
+                    self.failures.pop(table, None)
+                    
+                    self.set_cursor(connection, table, rows[-1][0])
+                    shipped += len(rows) - len(rejected)
+                    self.stats["shipped"] += len(rows) - len(rejected)
+                    self.stats["batches"] += 1
+                    self.stats["last_shipped_at"] = datetime.now().isoformat()
+                    if len(rows) < self.batch_size:
+                        break
+            
+            if self.retention_days and time.time() - self.last_prune > 3600:
+                self.prune(connection)
+        return shipped
+    
+    def ship_or_split(self, table: str, batch: List[tuple]) -> List[tuple]:
+        """Ship a batch, halving failed parts down to single rows; returns the rows that still fail"""
+        if self.ship_batch(table, batch):
+            return []
+        if len(batch) == 1:
+            return batch
+        middle = len(batch) // 2
+        return self.ship_or_split(table, batch[:middle]) + self.ship_or_split(table, batch[middle:])
+    
+    def isolate_rejected(self, connection, table: str, rows, batch: List[tuple]) -> Optional[List[tuple]]:
+        """Ship what MySQL accepts and dead-letter the rest; None if MySQL looks unreachable"""
+        rejected = self.ship_or_split(table, batch)
+        if rejected and not self.ship_batch(table, []):
+            return None
+        
+        local_ids = {origin[0]: row[0] for origin, row in zip(batch, rows)}
+        now = datetime.now().isoformat(sep=' ')
+        connection.executemany("""
+            INSERT INTO replication_dead_letters (table_name, local_id, origin_key, row_data, failed_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, [(table, local_ids[item[0]], item[0], json.dumps(list(item[1:]), default=str), now)
+              for item in rejected])
+        connection.commit()
+        
+        self.stats["dead_lettered"] += len(rejected)
+        for item in rejected:
+            logger.warning(f"⚠️ {table} row {local_ids[item[0]]} rejected by MySQL, moved to replication_dead_letters")
+        return rejected
+    
+    def prune(self, connection):
+        """Delete local rows that have been replicated and are past retention"""
+        self.last_prune = time.time()
+        cutoff = (datetime.now() - timedelta(days=self.retention_days)).isoformat(sep=' ')
+        for table in LOCAL_TABLES:
+            cursor = connection.execute(f"DELETE FROM {table} WHERE id <= ? AND created_at < ?",
+                                        (self.get_cursor(connection, table), cutoff))
+            self.stats["pruned"] += cursor.rowcount
+        connection.commit()
+    
+    def stop(self):
+        """Stop the worker and make a last replication attempt (called on shutdown)"""
+        self.stopping.set()
+        if self.worker:
+            self.worker.join(timeout=self.interval * 4)
+        try:
+            self.replicate_once()
+        except Exception as e:
+            logger.error(f"❌ Replication error: {e}")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get replication statistics, including rows still waiting locally"""
+        pending = {}
+        connection = self.get_local()
+        if connection is not None:
+            for table in LOCAL_TABLES:
+                pending[table] = connection.execute(f"SELECT COUNT(*) FROM {table} WHERE id > ?",
+                                                    (self.get_cursor(connection, table),)).fetchone()[0]
+        return dict(self.stats, pending=pending, node_id=self.node_id)
+
+
+class CatalogCache:
+    """Read-through cache for small, rarely changing tables (agents, providers)
+    
+    Every catalog has a row in catalog_versions that mutations bump. Readers
+    re-check that row at most every check_interval seconds and reload only
+    when it moved, so changes from other processes are picked up without
+    querying the table on every request.
+    """
+    
+    def __init__(self, load, read_version, check_interval: float = 2.0):
+        self.load = load                    # name -> rows, or None on failure
+        self.read_version = read_version    # name -> version, or None if unavailable
+        self.check_interval = check_interval
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "loads": 0, "version_checks": 0, "invalidations": 0}
+    
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        """Get a catalog entry ({version, rows, by_id}), loading it if stale"""
+        entry = self.entries.get(name)
+        if entry and time.time() - entry["checked_at"] < self.check_interval:
+            self.stats["hits"] += 1
+            return entry
+        
+        with self.lock:
+            entry = self.entries.get(name)
+            if entry and time.time() - entry["checked_at"] < self.check_interval:
+                self.stats["hits"] += 1
+                return entry
+            
+            version = self.read_version(name)
+            self.stats["version_checks"] += 1
+            if entry and version is not None and version == entry["version"]:
+                entry["checked_at"] = time.time()
+                self.stats["hits"] += 1
+                return entry
+            
+            rows = self.load(name)
+            if rows is None:
+                # Database unavailable: keep serving the last good copy
+                if entry:
+                    entry["checked_at"] = time.time()
+                return entry
+            
+            entry = {
+                "version": version,
+                "rows": rows,
+                "by_id": {row["id"]: row for row in rows},
+                "checked_at": time.time()
+            }
+            self.entries[name] = entry
+            self.stats["loads"] += 1
+            return entry
+    
+    def invalidate(self, name: str = None):
+        """Drop one catalog (or all) so the next read reloads it"""
+        with self.lock:
+            if name:
+                self.entries.pop(name, None)
+            else:
+                self.entries.clear()
+            self.stats["invalidations"] += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        return dict(self.stats, catalogs={
+            name: {"version": entry["version"], "rows": len(entry["rows"])}
+            for name, entry in list(self.entries.items())
+        })
+
+
+# Catalog tables served through CatalogCache, with their load queries
+CATALOG_QUERIES = {
+    'agents': """
+        SELECT id, name, display_name, personality, model_preference, 
+               prompt_template, config, status, created_at, updated_at
+        FROM agents 
+        ORDER BY created_at DESC
+    """,
+    'providers': """
+        SELECT id, name, type, api_url, api_key, config, status, created_at, updated_at
+        FROM providers 
+        ORDER BY created_at DESC
+    """
+}
+
+# Local SQLite store: the primary write target, replicated to MySQL
+LOCAL_TABLES = {
+    'conversations': ('user_id', 'agent_id', 'session_id', 'message', 'response', 'metadata', 'created_at'),
+    'analytics': ('event_type', 'user_id', 'agent_id', 'provider_id', 'metadata', 'created_at')
+}
+
+LOCAL_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS conversations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        agent_id INTEGER,
+        session_id TEXT,
+        message TEXT,
+        response TEXT,
+        metadata TEXT,
+        created_at TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS analytics (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        event_type TEXT NOT NULL,
+        user_id INTEGER,
+        agent_id INTEGER,
+        provider_id INTEGER,
+        metadata TEXT,
+        created_at TEXT NOT NULL
+    )
+    """,
+    "CREATE TABLE IF NOT EXISTS replication_state (name TEXT PRIMARY KEY, value TEXT NOT NULL)",
+    """
+    CREATE TABLE IF NOT EXISTS replication_lease (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        owner TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    )
+    """,
+    "INSERT OR IGNORE INTO replication_lease (id, owner, expires_at) VALUES (1, '', 0)",
+    """
+    CREATE TABLE IF NOT EXISTS replication_dead_letters (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        table_name TEXT NOT NULL,
+        local_id INTEGER NOT NULL,
+        origin_key TEXT NOT NULL,
+        row_data TEXT NOT NULL,
+        failed_at TEXT NOT NULL
+    )
+    """
+]
+
+# Idempotent MySQL upserts for replicated rows (origin_key is unique)
+REPLICATION_STATEMENTS = {
+    'conversations': """
+        INSERT INTO conversations (origin_key, user_id, agent_id, session_id, message, response, metadata, created_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE id = id
+    """,
+    'analytics': """
+        INSERT INTO analytics (origin_key, event_type, user_id, agent_id, provider_id, metadata, created_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE id = id
+    """
+}
+
+# Analytics rollups: per minute/hour/day counts and latency sums by event type and agent
+ROLLUP_GRANULARITIES = ('minute', 'hour', 'day')
+ROLLUP_RETENTION_DAYS = {'minute': 2, 'hour': 90, 'day': None}
+ROLLUP_UPSERT = """
+    INSERT INTO analytics_rollups (granularity, bucket_start, event_type, agent_id,
+                                   event_count, latency_sum, latency_count)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE event_count = event_count + VALUES(event_count),
+                            latency_sum = latency_sum + VALUES(latency_sum),
+                            latency_count = latency_count + VALUES(latency_count)
+"""
+
+def _rollup_backfill(granularity: str, bucket_expr: str, days: Optional[int]) -> str:
+    """Backfill statement building one rollup granularity from raw analytics rows"""
+    latency = ("COALESCE(CAST(JSON_UNQUOTE(JSON_EXTRACT(metadata, '$.latency_ms')) AS DECIMAL(16,3)), "
+               "CAST(JSON_UNQUOTE(JSON_EXTRACT(metadata, '$.response_time')) AS DECIMAL(16,6)) * 1000)")
+    window = f"WHERE created_at >= DATE_SUB(NOW(), INTERVAL {days} DAY)" if days else ""
+    return f"""
+        INSERT INTO analytics_rollups (granularity, bucket_start, event_type, agent_id,
+                                       event_count, latency_sum, latency_count)
+        SELECT '{granularity}', {bucket_expr}, event_type, COALESCE(agent_id, 0),
+               COUNT(*), COALESCE(SUM({latency}), 0), COUNT({latency})
+        FROM analytics {window}
+        GROUP BY {bucket_expr}, event_type, COALESCE(agent_id, 0)
+        ON DUPLICATE KEY UPDATE event_count = VALUES(event_count),
+                                latency_sum = VALUES(latency_sum),
+                                latency_count = VALUES(latency_count)
+    """
+
+# Schema migrations for the modelsraver database, applied once in order:
+# (version, base tables it needs, statements). The base tables come from the setup
+# script, so a migration whose tables are missing waits for a later connection
+SCHEMA_MIGRATIONS = [
+    ('001_analytics_rollups', ('analytics',), [
+        """
+        CREATE TABLE IF NOT EXISTS analytics_rollups (
+            granularity VARCHAR(6) NOT NULL,
+            bucket_start DATETIME NOT NULL,
+            event_type VARCHAR(100) NOT NULL,
+            agent_id INT NOT NULL DEFAULT 0,
+            event_count BIGINT NOT NULL DEFAULT 0,
+            latency_sum DOUBLE NOT NULL DEFAULT 0,
+            latency_count BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (granularity, event_type, agent_id, bucket_start),
+            KEY idx_rollups_bucket (granularity, bucket_start)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """,
+        _rollup_backfill('minute', "DATE_FORMAT(created_at, '%Y-%m-%d %H:%i:00')", ROLLUP_RETENTION_DAYS['minute']),
+        _rollup_backfill('hour', "DATE_FORMAT(created_at, '%Y-%m-%d %H:00:00')", ROLLUP_RETENTION_DAYS['hour']),
+        _rollup_backfill('day', "DATE(created_at)", ROLLUP_RETENTION_DAYS['day'])
+    ]),
+    # History is paged newest-first by (created_at, id); InnoDB secondary indexes
+    # carry the primary key, so these cover the keyset range without a filesort
+    ('002_conversation_history_indexes', ('conversations',), [
+        "CREATE INDEX idx_conversations_user_created ON conversations (user_id, created_at)",
+        "CREATE INDEX idx_conversations_agent_created ON conversations (agent_id, created_at)",
+        "CREATE INDEX idx_conversations_created ON conversations (created_at)"
+    ]),
+    ('003_catalog_versions', (), [
+        """
+        CREATE TABLE IF NOT EXISTS catalog_versions (
+            name VARCHAR(50) PRIMARY KEY,
+            version BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """,
+        "INSERT IGNORE INTO catalog_versions (name, version) VALUES ('agents', 0), ('providers', 0)"
+    ]),
+    ('004_replication_origin_keys', ('conversations', 'analytics'), [
+        "ALTER TABLE conversations ADD COLUMN origin_key VARCHAR(64) NULL",
+        "CREATE UNIQUE INDEX uq_conversations_origin ON conversations (origin_key)",
+        "ALTER TABLE analytics ADD COLUMN origin_key VARCHAR(64) NULL",
+        "CREATE UNIQUE INDEX uq_analytics_origin ON analytics (origin_key)"
+    ])
+]
+
+# MySQL errors for re-running DDL after a partial apply (duplicate column / index name)
+MYSQL_IDEMPOTENT_DDL_ERRORS = (1060, 1061)
+
+# Named lock serializing the migration runner across processes (DDL commits implicitly,
+# so a transaction cannot hold it); waiters give up after the timeout and retry later
+MIGRATION_LOCK = 'zombiecoder_schema_migrations'
+MIGRATION_LOCK_TIMEOUT = 60
+
+def _bucket_start(timestamp: datetime, granularity: str) -> datetime:
+    """Truncate a timestamp to the start of its rollup bucket"""
+    if granularity == 'minute':
+        return timestamp.replace(second=0, microsecond=0)
+    if granularity == 'hour':
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
 class DatabaseManager:
-    def __init__(self):
+    def __init__(self, pool_size: int = 8, replicate: bool = True):
         # MySQL connection configurations
         self.mysql_configs = [
             {
@@ -60,19 +630,59 @@ class DatabaseManager:
             }
         }
         
-        # SQLite database for local storage
-        self.sqlite_db = 'zombiecoder_ai.db'
+        # SQLite database for local storage (primary write target, WAL mode); the path is
+        # fixed up front because the replicator may open it later from another thread
+        self.sqlite_db = os.path.abspath('zombiecoder_ai.db')
+        self.sqlite_local = threading.local()
+        self.sqlite_schema_ready = False
+        self.sqlite_schema_lock = threading.Lock()
+        
+        # Connection pooling: one bounded pool per database, and the config that
+        # last worked is tried first so a dead config costs nothing after the first miss
+        self.pool_size = pool_size
+        self.pools = {}
+        self.pools_lock = threading.Lock()
+        self.working_config_index = None
+        self.mysql_retry_after = 0.0
+        self.mysql_retry_interval = 10.0  # seconds to skip MySQL after every config failed
+        
+        # Schema migrations run once on the first modelsraver connection
+        self.schema_ready = False
+        self.last_rollup_prune = 0.0
+        
+        # Agents/providers are read on most request paths but rarely change
+        self.catalog_cache = CatalogCache(self.load_catalog, self.read_catalog_version)
         
-    def get_mysql_connection(self, database: str = None) -> Optional[mysql.connector.MySQLConnection]:
-        """Get MySQL connection for specified database"""
-        for config in self.mysql_configs:
+        # Conversations/analytics are written to SQLite and shipped to MySQL in batches
+        self.replicator = SQLiteReplicator(self.get_sqlite_connection, self.write_batch)
+        self.import_legacy_spill('write_behind_spill.jsonl')
+        if replicate:
+            self.replicator.start()
+            atexit.register(self.replicator.stop)
+        
+    def open_mysql_connection(self, database: str = None) -> Optional[mysql.connector.MySQLConnection]:
+        """Open a new MySQL connection, trying the last working config first"""
+        if time.time() < self.mysql_retry_after:
+            return None
+        
+        order = list(range(len(self.mysql_configs)))
+        if self.working_config_index is not None:
+            order.remove(self.working_config_index)
+            order.insert(0, self.working_config_index)
+        
+        for index in order:
+            config = self.mysql_configs[index]
             try:
                 connection_config = config.copy()
                 if database:
                     connection_config['database'] = database
                     
                 connection = mysql.connector.connect(**connection_config)
-                logger.info(f"✅ MySQL connected to {database or 'server'} using {config['host']}:{config['port']}")
+                if self.working_config_index != index:
+                    logger.info(f"✅ MySQL connected to {database or 'server'} using {config['host']}:{config['port']} ({config['user']})")
+                self.working_config_index = index
+                if database == 'modelsraver' and not self.schema_ready:
+                    self.run_migrations(connection)
                 return connection
                 
             except Exception as e:
@@ -80,15 +690,46 @@ class DatabaseManager:
                 continue
         
         logger.error("❌ All MySQL connection attempts failed")
+        self.working_config_index = None
+        self.mysql_retry_after = time.time() + self.mysql_retry_interval
         return None
     
+    def get_pool(self, database: str = None) -> MySQLConnectionPool:
+        """Get (or create) the connection pool for a database"""
+        pool = self.pools.get(database)
+        if pool is None:
+            with self.pools_lock:
+                pool = self.pools.get(database)
+                if pool is None:
+                    pool = MySQLConnectionPool(database, self.open_mysql_connection, max_size=self.pool_size)
+                    self.pools[database] = pool
+        return pool
+    
+    def get_mysql_connection(self, database: str = None) -> Optional[PooledMySQLConnection]:
+        """Get a pooled MySQL connection for specified database (close() returns it to the pool)"""
+        return self.get_pool(database).acquire()
+    
     def get_sqlite_connection(self) -> Optional[sqlite3.Connection]:
-        """Get SQLite connection for local storage"""
+        """Get this thread's SQLite connection for local storage"""
+        connection = getattr(self.sqlite_local, 'connection', None)
+        if connection is not None:
+            return connection
+        
         try:
             os.makedirs('logs', exist_ok=True)
             
-            connection = sqlite3.connect(self.sqlite_db)
+            connection = sqlite3.connect(self.sqlite_db, timeout=5, factory=ReusableSQLiteConnection)
             connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            if not self.sqlite_schema_ready:
+                with self.sqlite_schema_lock:
+                    if not self.sqlite_schema_ready:
+                        for statement in LOCAL_SCHEMA:
+                            connection.execute(statement)
+                        connection.commit()
+                        self.sqlite_schema_ready = True
+            self.sqlite_local.connection = connection
             logger.info(f"✅ SQLite connected to {self.sqlite_db}")
             return connection
             
@@ -96,6 +737,220 @@ class DatabaseManager:
             logger.error(f"❌ SQLite connection error: {e}")
             return None
     
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """Get connection pool statistics"""
+        working = self.mysql_configs[self.working_config_index] if self.working_config_index is not None else None
+        return {
+            "pools": {database or 'server': pool.get_stats() for database, pool in list(self.pools.items())},
+            "working_config": f"{working['user']}@{working['host']}:{working['port']}" if working else None,
+            "mysql_backoff_seconds": max(0.0, round(self.mysql_retry_after - time.time(), 1))
+        }
+    
+    def run_migrations(self, connection) -> bool:
+        """Apply pending schema migrations on a raw (unpooled) connection
+        
+        Runs under a MySQL named lock and re-reads the applied set once it
+        holds it, so processes starting together apply each migration once.
+        """
+        try:
+            cursor = connection.cursor()
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version VARCHAR(100) PRIMARY KEY,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            if not self.pending_migrations(cursor):
+                cursor.close()
+                self.schema_ready = True
+                return True
+            
+            cursor.execute("SELECT GET_LOCK(%s, %s)", (MIGRATION_LOCK, MIGRATION_LOCK_TIMEOUT))
+            if cursor.fetchone()[0] != 1:
+                logger.warning("⚠️ Schema migrations are locked by another process, will retry")
+                cursor.close()
+                return False
+            
+            deferred = []
+            try:
+                cursor.execute("SELECT table_name FROM information_schema.tables WHERE table_schema = DATABASE()")
+                tables = {row[0] for row in cursor.fetchall()}
+                for version, requires, statements in self.pending_migrations(cursor):
+                    missing = [table for table in requires if table not in tables]
+                    if missing:
+                        deferred.append(version)
+                        logger.warning(f"⚠️ Schema migration {version} waits for tables: {', '.join(missing)}")
+                        continue
+                    for statement in statements:
+                        try:
+                            cursor.execute(statement)
+                        except Error as e:
+                            if e.errno not in MYSQL_IDEMPOTENT_DDL_ERRORS:
+                                raise
+                    cursor.execute("INSERT INTO schema_migrations (version) VALUES (%s)", (version,))
+                    connection.commit()
+                    logger.info(f"✅ Schema migration applied: {version}")
+            finally:
+                cursor.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK,))
+                cursor.fetchall()
+            
+            cursor.close()
+            self.schema_ready = not deferred
+            return not deferred
+            
+        except Exception as e:
+            logger.error(f"❌ Schema migration error: {e}")
+            return False
+    
+    def pending_migrations(self, cursor) -> List[tuple]:
+        """Migrations not yet recorded in schema_migrations, in order"""
+        cursor.execute("SELECT version FROM schema_migrations")
+        applied = {row[0] for row in cursor.fetchall()}
+        return [migration for migration in SCHEMA_MIGRATIONS if migration[0] not in applied]
+    
+    def write_local(self, table: str, row: tuple) -> bool:
+        """Write a row to the local SQLite store (replicated to MySQL later)"""
+        connection = self.get_sqlite_connection()
+        if connection is None:
+            return False
+        
+        try:
+            columns = LOCAL_TABLES[table]
+            connection.execute(
+                f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", row)
+            connection.commit()
+            return True
+        except Exception as e:
+            logger.error(f"❌ Error writing local {table} row: {e}")
+            # The connection is reused by this thread, so never leave it inside the failed transaction
+            try:
+                connection.rollback()
+            except sqlite3.Error:
+                pass
+            return False
+    
+    def import_legacy_spill(self, spill_file: str):
+        """Move rows left in an old write-behind spill file into the local store"""
+        if not os.path.exists(spill_file):
+            return
+        
+        imported = 0
+        with open(spill_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    item = json.loads(line)
+                    row = tuple(item["row"])
+                    if item["table"] == 'conversations' and len(row) == 6:
+                        row += (datetime.now().isoformat(sep=' '),)
+                    if self.write_local(item["table"], row):
+                        imported += 1
+                except (ValueError, KeyError):
+                    continue
+        os.remove(spill_file)
+        logger.info(f"✅ Imported {imported} spilled rows into {self.sqlite_db}")
+    
+    def write_batch(self, table: str, rows: List[tuple]) -> bool:
+        """Upsert a batch of replicated rows (origin_key first) into MySQL
+        
+        An empty batch only checks that MySQL is reachable and writable.
+        """
+        connection = self.get_mysql_connection('modelsraver')
+        if not connection:
+            return False
+        
+        try:
+            connection.start_transaction()
+            cursor = connection.cursor()
+            if table == 'analytics' and rows:
+                # Rollups are counters, so only fold in rows MySQL has not seen yet
+                placeholders = ', '.join(['%s'] * len(rows))
+                cursor.execute(f"SELECT origin_key FROM analytics WHERE origin_key IN ({placeholders})",
+                               [row[0] for row in rows])
+                seen = {row[0] for row in cursor.fetchall()}
+                rows = [row for row in rows if row[0] not in seen]
+            if rows:
+                cursor.executemany(REPLICATION_STATEMENTS[table], rows)
+                if table == 'analytics':
+                    self.update_rollups(cursor, [row[1:] for row in rows])
+            connection.commit()
+            cursor.close()
+            connection.close()
+            
+            if table == 'analytics' and time.time() - self.last_rollup_prune > 3600:
+                self.prune_rollups()
+            return True
+            
+        except Exception as e:
+            logger.error(f"❌ Error writing {table} batch ({len(rows)} rows): {e}")
+            try:
+                connection.rollback()
+            except Exception:
+                pass
+            connection.close()
+            return False
+    
+    def extract_latency_ms(self, metadata: Any) -> Optional[float]:
+        """Latency of an analytics event from its metadata (latency_ms, or response_time in seconds)"""
+        try:
+            if isinstance(metadata, str):
+                metadata = json.loads(metadata)
+            if metadata.get('latency_ms') is not None:
+                return float(metadata['latency_ms'])
+            if metadata.get('response_time') is not None:
+                return float(metadata['response_time']) * 1000
+        except (ValueError, TypeError, AttributeError):
+            pass
+        return None
+    
+    def fold_rollups(self, rows, granularities=ROLLUP_GRANULARITIES) -> Dict[tuple, list]:
+        """Aggregate analytics rows into {(granularity, bucket_start, event_type, agent_id): [count, latency_sum, latency_count]}"""
+        buckets = {}
+        for event_type, user_id, agent_id, provider_id, metadata, created_at in rows:
+            if not isinstance(created_at, datetime):
+                created_at = datetime.fromisoformat(str(created_at))
+            latency = self.extract_latency_ms(metadata)
+            for granularity in granularities:
+                key = (granularity, _bucket_start(created_at, granularity), event_type, agent_id or 0)
+                bucket = buckets.setdefault(key, [0, 0.0, 0])
+                bucket[0] += 1
+                if latency is not None:
+                    bucket[1] += latency
+                    bucket[2] += 1
+        return buckets
+    
+    def update_rollups(self, cursor, rows: List[tuple]):
+        """Fold a batch of analytics rows into the rollup tables"""
+        buckets = self.fold_rollups(rows)
+        cursor.executemany(ROLLUP_UPSERT, [key + tuple(values) for key, values in buckets.items()])
+    
+    def prune_rollups(self):
+        """Drop fine-grained rollup buckets past their retention window"""
+        self.last_rollup_prune = time.time()
+        connection = self.get_mysql_connection('modelsraver')
+        if not connection:
+            return
+        
+        try:
+            cursor = connection.cursor()
+            for granularity, days in ROLLUP_RETENTION_DAYS.items():
+                if days:
+                    cursor.execute(
+                        "DELETE FROM analytics_rollups WHERE granularity = %s AND bucket_start < %s",
+                        (granularity, datetime.now() - timedelta(days=days))
+                    )
+            connection.commit()
+            cursor.close()
+            connection.close()
+            
+        except Exception as e:
+            logger.error(f"❌ Error pruning analytics rollups: {e}")
+            connection.close()
+    
+    def close_pools(self):
+        """Close all idle pooled connections"""
+        for pool in list(self.pools.values()):
+            pool.close_all()
+    
     def test_connection(self, database_type: str = 'mysql', database: str = None) -> bool:
         """Test database connection"""
         if database_type == 'mysql':
@@ -128,82 +983,80 @@ class DatabaseManager:
                     return False
         return False
     
-    # Agent Management
-    def get_all_agents(self) -> List[Dict[str, Any]]:
-        """Get all agents from database"""
+    # Catalog Cache
+    def load_catalog(self, name: str) -> Optional[List[Dict[str, Any]]]:
+        """Load a catalog table from database (None on failure)"""
         connection = self.get_mysql_connection('modelsraver')
         if not connection:
-            return []
+            return None
         
         try:
             cursor = connection.cursor(dictionary=True)
-            cursor.execute("""
-                SELECT id, name, display_name, personality, model_preference, 
-                       prompt_template, config, status, created_at, updated_at
-                FROM agents 
-                ORDER BY created_at DESC
-            """)
-            agents = cursor.fetchall()
+            cursor.execute(CATALOG_QUERIES[name])
+            rows = cursor.fetchall()
             
             # Parse JSON fields
-            for agent in agents:
-                if agent.get('model_preference'):
+            for row in rows:
+                if row.get('model_preference'):
                     try:
-                        agent['model_preference'] = json.loads(agent['model_preference'])
+                        row['model_preference'] = json.loads(row['model_preference'])
                     except:
-                        agent['model_preference'] = []
+                        row['model_preference'] = []
                 
-                if agent.get('config'):
+                if row.get('config'):
                     try:
-                        agent['config'] = json.loads(agent['config'])
+                        row['config'] = json.loads(row['config'])
                     except:
-                        agent['config'] = {}
+                        row['config'] = {}
             
             cursor.close()
             connection.close()
-            return agents
+            return rows
             
         except Exception as e:
-            logger.error(f"❌ Error getting agents: {e}")
-            return []
+            logger.error(f"❌ Error loading {name}: {e}")
+            return None
     
-    def get_agent_by_id(self, agent_id: int) -> Optional[Dict[str, Any]]:
-        """Get agent by ID"""
+    def read_catalog_version(self, name: str) -> Optional[int]:
+        """Read a catalog's version row (None if unavailable)"""
         connection = self.get_mysql_connection('modelsraver')
         if not connection:
             return None
         
         try:
-            cursor = connection.cursor(dictionary=True)
-            cursor.execute("""
-                SELECT id, name, display_name, personality, model_preference, 
-                       prompt_template, config, status, created_at, updated_at
-                FROM agents 
-                WHERE id = %s
-            """, (agent_id,))
-            
-            agent = cursor.fetchone()
-            if agent:
-                # Parse JSON fields
-                if agent.get('model_preference'):
-                    try:
-                        agent['model_preference'] = json.loads(agent['model_preference'])
-                    except:
-                        agent['model_preference'] = []
-                
-                if agent.get('config'):
-                    try:
-                        agent['config'] = json.loads(agent['config'])
-                    except:
-                        agent['config'] = {}
-            
+            cursor = connection.cursor()
+            cursor.execute("SELECT version FROM catalog_versions WHERE name = %s", (name,))
+            row = cursor.fetchone()
             cursor.close()
             connection.close()
-            return agent
-            
+            return row[0] if row else None
+        except Exception:
+            connection.close()
+            return None
+    
+    def bump_catalog_version(self, cursor, name: str):
+        """Bump a catalog's version row inside the mutating transaction"""
+        try:
+            cursor.execute("UPDATE catalog_versions SET version = version + 1 WHERE name = %s", (name,))
         except Exception as e:
-            logger.error(f"❌ Error getting agent {agent_id}: {e}")
+            logger.warning(f"⚠️ Could not bump {name} catalog version: {e}")
+    
+    # Agent Management
+    def get_all_agents(self) -> List[Dict[str, Any]]:
+        """Get all agents (cached)"""
+        entry = self.catalog_cache.get('agents')
+        return [dict(agent) for agent in entry["rows"]] if entry else []
+    
+    def get_agent_by_id(self, agent_id: int) -> Optional[Dict[str, Any]]:
+        """Get agent by ID (cached)"""
+        try:
+            agent_id = int(agent_id)
+        except (TypeError, ValueError):
             return None
+        
+        entry = self.catalog_cache.get('agents')
+        agent = entry["by_id"].get(agent_id) if entry else None
+        return dict(agent) if agent else None
     
     def create_agent(self, agent_data: Dict[str, Any]) -> bool:
         """Create new agent"""
@@ -227,10 +1080,12 @@ class DatabaseManager:
                 agent_data.get('status', 'active')
             ))
             
+            self.bump_catalog_version(cursor, 'agents')
             connection.commit()
             cursor.close()
             connection.close()
             logger.info(f"✅ Agent created: {agent_data['name']}")
+            self.catalog_cache.invalidate('agents')
             return True
             
         except Exception as e:
@@ -262,10 +1117,12 @@ class DatabaseManager:
                 agent_id
             ))
             
+            self.bump_catalog_version(cursor, 'agents')
             connection.commit()
             cursor.close()
             connection.close()
             logger.info(f"✅ Agent updated: {agent_id}")
+            self.catalog_cache.invalidate('agents')
             return True
             
         except Exception as e:
@@ -282,10 +1139,12 @@ class DatabaseManager:
             cursor = connection.cursor()
             cursor.execute("DELETE FROM agents WHERE id = %s", (agent_id,))
             
+            self.bump_catalog_version(cursor, 'agents')
             connection.commit()
             cursor.close()
             connection.close()
             logger.info(f"✅ Agent deleted: {agent_id}")
+            self.catalog_cache.invalidate('agents')
             return True
             
         except Exception as e:
@@ -294,35 +1153,9 @@ class DatabaseManager:
     
     # Provider Management
     def get_all_providers(self) -> List[Dict[str, Any]]:
-        """Get all providers from database"""
-        connection = self.get_mysql_connection('modelsraver')
-        if not connection:
-            return []
-        
-        try:
-            cursor = connection.cursor(dictionary=True)
-            cursor.execute("""
-                SELECT id, name, type, api_url, api_key, config, status, created_at, updated_at
-                FROM providers 
-                ORDER BY created_at DESC
-            """)
-            providers = cursor.fetchall()
-            
-            # Parse JSON fields
-            for provider in providers:
-                if provider.get('config'):
-                    try:
-                        provider['config'] = json.loads(provider['config'])
-                    except:
-                        provider['config'] = {}
-            
-            cursor.close()
-            connection.close()
-            return providers
-            
-        except Exception as e:
-            logger.error(f"❌ Error getting providers: {e}")
-            return []
+        """Get all providers (cached)"""
+        entry = self.catalog_cache.get('providers')
+        return [dict(provider) for provider in entry["rows"]] if entry else []
     
     def create_provider(self, provider_data: Dict[str, Any]) -> bool:
         """Create new provider"""
@@ -344,10 +1177,12 @@ class DatabaseManager:
                 provider_data.get('status', 'active')
             ))
             
+            self.bump_catalog_version(cursor, 'providers')
             connection.commit()
             cursor.close()
             connection.close()
             logger.info(f"✅ Provider created: {provider_data['name']}")
+            self.catalog_cache.invalidate('providers')
             return True
             
         except Exception as e:
@@ -357,43 +1192,81 @@ class DatabaseManager:
     # Conversation Management
     def save_conversation(self, user_id: int, agent_id: int, session_id: str, 
                          message: str, response: str, metadata: Dict[str, Any] = None) -> bool:
-        """Save conversation to database"""
-        connection = self.get_mysql_connection('modelsraver')
-        if not connection:
-            return False
-        
-        try:
-            cursor = connection.cursor()
-            cursor.execute("""
-                INSERT INTO conversations (user_id, agent_id, session_id, message, response, metadata)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            """, (
-                user_id, agent_id, session_id, message, response, 
-                json.dumps(metadata or {})
-            ))
-            
-            connection.commit()
-            cursor.close()
-            connection.close()
-            return True
-            
-        except Exception as e:
-            logger.error(f"❌ Error saving conversation: {e}")
+        """Save conversation to the local store (replicated to MySQL in the background)"""
+        row = (user_id, agent_id, session_id, message, response, json.dumps(metadata or {}),
+               datetime.now().isoformat(sep=' '))
+        if not self.write_local('conversations', row):
             return False
+        conversation_search.add(message, response, user_id=user_id, agent=agent_id,
+                                session_id=session_id, source="database")
+        return True
+    
+    def search_conversations(self, query: str, user_id: int = None, agent_id: int = None,
+                             limit: int = 20, cursor: str = None, **filters) -> Dict[str, Any]:
+        """Full-text search over saved conversations"""
+        return conversation_search.search(query, user_id=user_id,
+                                          agent=None if agent_id is None else str(agent_id),
+                                          limit=limit, cursor=cursor, **filters)
     
     def get_conversations(self, user_id: int = None, agent_id: int = None, 
                          limit: int = 50) -> List[Dict[str, Any]]:
-        """Get conversations from database"""
+        """Get the most recent conversations from database"""
+        return self.get_conversation_page(user_id, agent_id, limit)["conversations"]
+    
+    def get_conversation_page(self, user_id: int = None, agent_id: int = None,
+                              limit: int = 50, cursor: str = None) -> Dict[str, Any]:
+        """Get one page of conversation history, newest first
+        
+        Keyset pagination on (created_at, id): pass back next_cursor for the
+        following (older) page, so deep pages cost the same as the first one.
+        Rows not yet replicated are merged in from the local store, and the
+        whole page is served locally while MySQL is unavailable.
+        """
+        page = {"conversations": [], "next_cursor": None}
+        limit = max(1, min(int(limit), 500))
+        position = self.decode_history_cursor(cursor) if cursor else None
+        
+        # Pending rows are read first: a row shipped in between then shows up in
+        # MySQL too and is dropped by origin key, rather than missing from both
+        pending = self.get_local_conversations(user_id, agent_id, limit + 1, position, pending_only=True)
+        conversations = self.query_conversations(user_id, agent_id, limit + 1, position)
+        if conversations is None:
+            conversations = self.get_local_conversations(user_id, agent_id, limit + 1, position)
+        elif pending:
+            shipped = {conv['origin_key'] for conv in conversations if conv.get('origin_key')}
+            conversations += [conv for conv in pending if conv['origin_key'] not in shipped]
+            conversations.sort(key=lambda conv: (conv['created_at'], conv['id']), reverse=True)
+        
+        if len(conversations) > limit:
+            conversations = conversations[:limit]
+            last = conversations[-1]
+            page["next_cursor"] = self.encode_history_cursor(last['created_at'], last['id'])
+        
+        # Parse JSON fields
+        for conv in conversations:
+            conv.pop('origin_key', None)
+            if conv.get('metadata'):
+                try:
+                    conv['metadata'] = json.loads(conv['metadata'])
+                except:
+                    conv['metadata'] = {}
+        
+        page["conversations"] = conversations
+        return page
+    
+    def query_conversations(self, user_id: int, agent_id: int, limit: int,
+                            position: tuple = None) -> Optional[List[Dict[str, Any]]]:
+        """Conversations from MySQL, newest first; None if MySQL is unavailable"""
         connection = self.get_mysql_connection('modelsraver')
         if not connection:
-            return []
+            return None
         
         try:
-            cursor = connection.cursor(dictionary=True)
+            db_cursor = connection.cursor(dictionary=True)
             
             query = """
                 SELECT c.id, c.user_id, c.agent_id, c.session_id, c.message, 
-                       c.response, c.metadata, c.created_at,
+                       c.response, c.metadata, c.created_at, c.origin_key,
                        a.name as agent_name, a.display_name as agent_display_name
                 FROM conversations c
                 LEFT JOIN agents a ON c.agent_id = a.id
@@ -409,57 +1282,202 @@ class DatabaseManager:
                 query += " AND c.agent_id = %s"
                 params.append(agent_id)
             
-            query += " ORDER BY c.created_at DESC LIMIT %s"
-            params.append(limit)
-            
-            cursor.execute(query, params)
-            conversations = cursor.fetchall()
+            if position:
+                last_created_at, last_id = position
+                query += " AND (c.created_at < %s OR (c.created_at = %s AND c.id < %s))"
+                params.extend([last_created_at, last_created_at, last_id])
             
-            # Parse JSON fields
-            for conv in conversations:
-                if conv.get('metadata'):
-                    try:
-                        conv['metadata'] = json.loads(conv['metadata'])
-                    except:
-                        conv['metadata'] = {}
+            query += " ORDER BY c.created_at DESC, c.id DESC LIMIT %s"
+            params.append(limit)
             
-            cursor.close()
+            db_cursor.execute(query, params)
+            conversations = db_cursor.fetchall()
+            db_cursor.close()
             connection.close()
             return conversations
             
         except Exception as e:
             logger.error(f"❌ Error getting conversations: {e}")
+            connection.close()
+            return None
+    
+    def get_local_conversations(self, user_id: int, agent_id: int, limit: int, position: tuple = None,
+                                pending_only: bool = False) -> List[Dict[str, Any]]:
+        """Conversations from the local store, newest first (pending_only: not replicated yet)"""
+        connection = self.get_sqlite_connection()
+        if connection is None:
+            return []
+        
+        try:
+            query = """
+                SELECT id, user_id, agent_id, session_id, message, response, metadata, created_at
+                FROM conversations WHERE 1=1
+            """
+            params = []
+            
+            if pending_only:
+                query += " AND id > ?"
+                params.append(self.replicator.get_cursor(connection, 'conversations'))
+            
+            if user_id:
+                query += " AND user_id = ?"
+                params.append(user_id)
+            
+            if agent_id:
+                query += " AND agent_id = ?"
+                params.append(agent_id)
+            
+            if position:
+                last_created_at = position[0].isoformat(sep=' ')
+                query += " AND (created_at < ? OR (created_at = ? AND id < ?))"
+                params.extend([last_created_at, last_created_at, position[1]])
+            
+            query += " ORDER BY created_at DESC, id DESC LIMIT ?"
+            params.append(limit)
+            
+            rows = connection.execute(query, params).fetchall()
+            if not rows:
+                return []
+            
+            node_id = self.replicator.get_node_id(connection)
+            entry = self.catalog_cache.get('agents')
+            agents = entry["by_id"] if entry else {}
+            conversations = []
+            for row in rows:
+                conv = dict(row)
+                agent = agents.get(conv['agent_id']) or {}
+                conv['created_at'] = datetime.fromisoformat(conv['created_at'])
+                conv['origin_key'] = f"{node_id}:{conv['id']}"
+                conv['agent_name'] = agent.get('name')
+                conv['agent_display_name'] = agent.get('display_name')
+                conversations.append(conv)
+            return conversations
+            
+        except Exception as e:
+            logger.error(f"❌ Error reading local conversations: {e}")
             return []
     
+    def encode_history_cursor(self, created_at: datetime, conversation_id: int) -> str:
+        """Encode a conversation history position as an opaque cursor"""
+        value = json.dumps([created_at.isoformat(sep=' '), conversation_id])
+        return base64.urlsafe_b64encode(value.encode('utf-8')).decode('ascii')
+    
+    def decode_history_cursor(self, cursor: str) -> tuple:
+        """Decode a conversation history cursor into (created_at, id)"""
+        try:
+            created_at, conversation_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            return datetime.fromisoformat(created_at), int(conversation_id)
+        except Exception:
+            raise ValueError("Invalid cursor")
+    
     # Analytics
     def log_analytics(self, event_type: str, user_id: int = None, agent_id: int = None,
                      provider_id: int = None, metadata: Dict[str, Any] = None) -> bool:
-        """Log analytics event"""
+        """Log analytics event to the local store (replicated to MySQL in the background)"""
+        row = (event_type, user_id, agent_id, provider_id, json.dumps(metadata or {}),
+               datetime.now().isoformat(sep=' '))
+        return self.write_local('analytics', row)
+    
+    def get_analytics(self, event_type: str = None, days: int = 7, granularity: str = None) -> List[Dict[str, Any]]:
+        """Get analytics counts and latency per bucket, served from the rollup tables
+        
+        Events still waiting in the local store are folded in on top, and the
+        buckets are built from the local store alone while MySQL is unavailable.
+        """
+        granularity = granularity or ('hour' if days <= 2 else 'day')
+        if granularity not in ROLLUP_GRANULARITIES:
+            raise ValueError(f"Unknown granularity: {granularity}")
+        
+        since = _bucket_start(datetime.now() - timedelta(days=days), granularity)
+        analytics = self.query_rollups(granularity, since, event_type)
+        local = self.get_local_rollups(granularity, since, event_type, pending_only=analytics is not None)
+        
+        buckets = {(bucket['bucket_start'], bucket['event_type'], bucket['agent_id'] or 0): bucket
+                   for bucket in analytics or []}
+        if local:
+            entry = self.catalog_cache.get('agents')
+            agents = entry["by_id"] if entry else {}
+            for (_, bucket_start, event, agent_id), (count, latency_sum, latency_count) in local.items():
+                bucket = buckets.get((bucket_start, event, agent_id))
+                if bucket is None:
+                    bucket = buckets[(bucket_start, event, agent_id)] = {
+                        'bucket_start': bucket_start, 'event_type': event, 'agent_id': agent_id,
+                        'event_count': 0, 'latency_sum': 0.0, 'latency_count': 0,
+                        'agent_name': (agents.get(agent_id) or {}).get('name')
+                    }
+                bucket['event_count'] += count
+                bucket['latency_sum'] += latency_sum
+                bucket['latency_count'] += latency_count
+        
+        analytics = sorted(buckets.values(), key=lambda bucket: bucket['bucket_start'], reverse=True)
+        for bucket in analytics:
+            bucket['granularity'] = granularity
+            bucket['agent_id'] = bucket['agent_id'] or None
+            bucket['avg_latency_ms'] = (
+                round(bucket['latency_sum'] / bucket['latency_count'], 2) if bucket['latency_count'] else None
+            )
+        return analytics
+    
+    def query_rollups(self, granularity: str, since: datetime, event_type: str = None) -> Optional[List[Dict[str, Any]]]:
+        """Rollup buckets from MySQL; None if MySQL is unavailable"""
         connection = self.get_mysql_connection('modelsraver')
         if not connection:
-            return False
+            return None
         
         try:
-            cursor = connection.cursor()
-            cursor.execute("""
-                INSERT INTO analytics (event_type, user_id, agent_id, provider_id, metadata)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (
-                event_type, user_id, agent_id, provider_id, 
-                json.dumps(metadata or {})
-            ))
+            cursor = connection.cursor(dictionary=True)
             
-            connection.commit()
+            query = """
+                SELECT r.bucket_start, r.event_type, r.agent_id, r.event_count,
+                       r.latency_sum, r.latency_count, ag.name as agent_name
+                FROM analytics_rollups r
+                LEFT JOIN agents ag ON r.agent_id = ag.id
+                WHERE r.granularity = %s AND r.bucket_start >= %s
+            """
+            params = [granularity, since]
+            
+            if event_type:
+                query += " AND r.event_type = %s"
+                params.append(event_type)
+            
+            cursor.execute(query, params)
+            analytics = cursor.fetchall()
             cursor.close()
             connection.close()
-            return True
+            return analytics
             
         except Exception as e:
-            logger.error(f"❌ Error logging analytics: {e}")
-            return False
+            logger.error(f"❌ Error getting analytics: {e}")
+            connection.close()
+            return None
+    
+    def get_local_rollups(self, granularity: str, since: datetime, event_type: str = None,
+                          pending_only: bool = False) -> Dict[tuple, list]:
+        """Rollup buckets computed from the local analytics store (pending_only: not replicated yet)"""
+        connection = self.get_sqlite_connection()
+        if connection is None:
+            return {}
+        
+        try:
+            query = f"SELECT {', '.join(LOCAL_TABLES['analytics'])} FROM analytics WHERE created_at >= ?"
+            params = [since.isoformat(sep=' ')]
+            
+            if pending_only:
+                query += " AND id > ?"
+                params.append(self.replicator.get_cursor(connection, 'analytics'))
+            
+            if event_type:
+                query += " AND event_type = ?"
+                params.append(event_type)
+            
+            return self.fold_rollups(connection.execute(query, params), (granularity,))
+            
+        except Exception as e:
+            logger.error(f"❌ Error reading local analytics: {e}")
+            return {}
     
-    def get_analytics(self, event_type: str = None, days: int = 7) -> List[Dict[str, Any]]:
-        """Get analytics data"""
+    def get_analytics_events(self, event_type: str = None, days: int = 7, limit: int = 500) -> List[Dict[str, Any]]:
+        """Get raw analytics events (newest first)"""
         connection = self.get_mysql_connection('modelsraver')
         if not connection:
             return []
@@ -474,15 +1492,16 @@ class DatabaseManager:
                 FROM analytics a
                 LEFT JOIN agents ag ON a.agent_id = ag.id
                 LEFT JOIN providers p ON a.provider_id = p.id
-                WHERE a.created_at >= DATE_SUB(NOW(), INTERVAL %s DAY)
+                WHERE a.created_at >= %s
             """
-            params = [days]
+            params = [datetime.now() - timedelta(days=days)]
             
             if event_type:
                 query += " AND a.event_type = %s"
                 params.append(event_type)
             
-            query += " ORDER BY a.created_at DESC"
+            query += " ORDER BY a.created_at DESC LIMIT %s"
+            params.append(limit)
             
             cursor.execute(query, params)
             analytics = cursor.fetchall()
@@ -500,7 +1519,7 @@ class DatabaseManager:
             return analytics
             
         except Exception as e:
-            logger.error(f"❌ Error getting analytics: {e}")
+            logger.error(f"❌ Error getting analytics events: {e}")
             return []
     
     # Database Statistics
@@ -538,9 +1557,14 @@ class DatabaseManager:
             cursor.execute("SELECT COUNT(*) as count FROM conversations WHERE DATE(created_at) = CURDATE()")
             stats['today_conversations'] = cursor.fetchone()['count']
             
-            # Count analytics events
-            cursor.execute("SELECT COUNT(*) as count FROM analytics")
-            stats['total_analytics'] = cursor.fetchone()['count']
+            # Count analytics events from daily rollups instead of scanning the raw table
+            cursor.execute("SELECT COALESCE(SUM(event_count), 0) as count FROM analytics_rollups WHERE granularity = 'day'")
+            stats['total_analytics'] = int(cursor.fetchone()['count'])
+            cursor.execute(
+                "SELECT COALESCE(SUM(event_count), 0) as count FROM analytics_rollups WHERE granularity = 'day' AND bucket_start = %s",
+                (_bucket_start(datetime.now(), 'day'),)
+            )
+            stats['today_analytics'] = int(cursor.fetchone()['count'])
             
             # Database size
             cursor.execute("""
@@ -552,6 +1576,11 @@ class DatabaseManager:
             result = cursor.fetchone()
             stats['database_size_mb'] = result['size_mb'] if result['size_mb'] else 0
             
+            # Connection pool statistics
+            stats['connection_pool'] = self.get_pool_stats()
+            stats['catalog_cache'] = self.catalog_cache.get_stats()
+            stats['replication'] = self.replicator.get_stats()
+            
             cursor.close()
             connection.close()
             return stats
@@ -33,7 +33,7 @@ try:
     from memory_manager import MemoryManager
     from unified_agent_system import UnifiedAgent
     from ai_providers import AIProviders
-    from database_manager import DatabaseManager
+    from database_manager import db_manager
 except ImportError as e:
     print(f"❌ Import error: {e}")
     sys.exit(1)
@@ -63,7 +63,7 @@ class ZombieCoderMainServer:
         self.memory_manager = MemoryManager()
         self.unified_agent = UnifiedAgent()
         self.ai_providers = AIProviders()
-        self.db_manager = DatabaseManager()
+        self.db_manager = db_manager
         
         # Server status
         self.server_status = "starting"
@@ -167,6 +167,48 @@ class ZombieCoderMainServer:
                 logger.error(f"Memory error: {e}")
                 return jsonify({'error': str(e)}), 500
         
+        @self.app.route('/api/conversations', methods=['GET'])
+        def get_conversations():
+            """Conversation history, newest first (cursor paginated)"""
+            try:
+                page = self.db_manager.get_conversation_page(
+                    user_id=request.args.get('user_id', type=int),
+                    agent_id=request.args.get('agent_id', type=int),
+                    limit=request.args.get('limit', 50, type=int),
+                    cursor=request.args.get('cursor')
+                )
+                page['count'] = len(page['conversations'])
+                return jsonify(page)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            except Exception as e:
+                logger.error(f"Conversations error: {e}")
+                return jsonify({'error': str(e)}), 500
+        
+        @self.app.route('/api/memory/search', methods=['GET'])
+        def search_memory():
+            """Full-text search over conversations (ranked, highlighted, paginated)"""
+            try:
+                query = request.args.get('q', '')
+                if not query:
+                    return jsonify({'error': 'Query required'}), 400
+                
+                result = self.memory_manager.search_conversations(
+                    query,
+                    user_id=request.args.get('user_id'),
+                    agent=request.args.get('agent'),
+                    since=request.args.get('since'),
+                    until=request.args.get('until'),
+                    limit=int(request.args.get('limit', 20)),
+                    cursor=request.args.get('cursor')
+                )
+                return jsonify(result)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            except Exception as e:
+                logger.error(f"Memory search error: {e}")
+                return jsonify({'error': str(e)}), 500
+        
         @self.app.route('/api/health', methods=['GET'])
         def health_check():
             """Health check endpoint"""
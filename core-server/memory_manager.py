@@ -12,6 +12,7 @@ import logging
 from datetime import datetime
 from typing import Dict, Any, List, Optional
 import threading
+from conversation_search import conversation_search
 
 logger = logging.getLogger(__name__)
 
@@ -40,6 +41,9 @@ class MemoryManager:
         # Thread lock for concurrent access
         self.lock = threading.Lock()
         
+        # Index existing session history on first run of the search index
+        self.backfill_search_index()
+        
         logger.info("🧠 Memory Manager initialized")
     
     def load_config(self, config_path: str) -> Dict[str, Any]:
@@ -121,8 +125,8 @@ class MemoryManager:
                 logger.error(f"Error reading {memory_type} memory: {e}")
                 return {}
     
-    def write_memory(self, memory_type: str, data: Dict[str, Any]):
-        """Write memory to botgachh files"""
+    def write_memory(self, memory_type: str, data: Dict[str, Any]) -> bool:
+        """Write memory to botgachh files; returns whether the write succeeded"""
         with self.lock:
             try:
                 if memory_type == "session":
@@ -136,9 +140,11 @@ class MemoryManager:
                     json.dump(data, f, indent=2, ensure_ascii=False)
                     
                 logger.info(f"Updated {memory_type} memory")
+                return True
                 
             except Exception as e:
                 logger.error(f"Error writing {memory_type} memory: {e}")
+                return False
     
     def add_conversation(self, user_id: str, message: str, response: str, agent: str = "chatgpt"):
         """Add conversation to session log"""
@@ -161,9 +167,36 @@ class MemoryManager:
         session_data["memory_stats"]["total_sessions"] += 1
         session_data["system_status"]["last_update"] = datetime.now().isoformat()
         
-        self.write_memory("session", session_data)
+        if not self.write_memory("session", session_data):
+            return
+        conversation_search.add(message, response, user_id=user_id, agent=agent,
+                                source="botgachh", created_at=conversation_entry["timestamp"])
         logger.info(f"Added conversation for user: {user_id}")
     
+    def backfill_search_index(self):
+        """Index the stored session history if the search index is empty"""
+        try:
+            if conversation_search.count() > 0:
+                return
+            session = self.read_memory("session").get("current_session", {})
+            entries = [{
+                "message": entry.get("message"),
+                "response": entry.get("response"),
+                "user_id": entry.get("user_id"),
+                "agent": entry.get("agent") or entry.get("agent_type"),
+                "session_id": session.get("session_id"),
+                "created_at": entry.get("timestamp")
+            } for entry in session.get("conversation_history", []) if entry.get("message")]
+            if entries:
+                indexed = conversation_search.add_many(entries, source="botgachh")
+                logger.info(f"🔎 Indexed {indexed} stored conversations for search")
+        except Exception as e:
+            logger.error(f"Search index backfill error: {e}")
+    
+    def search_conversations(self, query: str, **options) -> Dict[str, Any]:
+        """Full-text search over conversation memory"""
+        return conversation_search.search(query, **options)
+    
     def add_task(self, task_type: str, description: str, status: str = "pending", result: str = None):
         """Add task to task history"""
         task_data = self.read_memory("tasks")
@@ -354,7 +387,11 @@ class MemoryManager:
             if len(session_data["current_session"]["conversation_history"]) > 100:
                 session_data["current_session"]["conversation_history"] = session_data["current_session"]["conversation_history"][-100:]
             
-            self.write_memory("session", session_data)
+            if not self.write_memory("session", session_data):
+                return
+            conversation_search.add(message, response, agent=agent_type,
+                                    session_id=session_data["current_session"].get("session_id"),
+                                    source="botgachh", created_at=chat_entry["timestamp"])
             logger.info(f"💬 Chat logged: {agent_type} - {len(message)} chars")
             
         except Exception as e:
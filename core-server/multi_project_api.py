@@ -6,6 +6,7 @@ API endpoints for project management and agent switching
 """
 
 import os
+import re
 import json
 import time
 import logging
@@ -172,6 +173,34 @@ class MultiProjectAPI:
                 logger.error(f"Suggestions error: {e}")
                 return jsonify({"error": str(e)}), 500
         
+        @self.app.route('/api/projects/<project_name>/search', methods=['GET'])
+        def search_project(project_name):
+            """Search a project's files (literal or regex)"""
+            try:
+                query = request.args.get('q', '')
+                if not query:
+                    return jsonify({"error": "Query required"}), 400
+                
+                regex = request.args.get('regex', 'false').lower() in ('1', 'true', 'yes')
+                case_sensitive = request.args.get('case', 'false').lower() in ('1', 'true', 'yes')
+                try:
+                    max_results = max(1, min(int(request.args.get('limit', 100)), 1000))
+                except ValueError:
+                    return jsonify({"error": "limit must be an integer"}), 400
+                
+                result = multi_project_manager.search_project(project_name, query, regex, case_sensitive, max_results)
+                if result is None:
+                    return jsonify({"error": f"Project not found: {project_name}"}), 404
+                
+                result["project"] = project_name
+                return jsonify(result)
+                
+            except re.error as e:
+                return jsonify({"error": f"Invalid regex: {e}"}), 400
+            except Exception as e:
+                logger.error(f"Search project error: {e}")
+                return jsonify({"error": str(e)}), 500
+        
         @self.app.route('/api/projects/stats', methods=['GET'])
         def get_stats():
             """Get project statistics"""
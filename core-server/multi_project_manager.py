@@ -8,12 +8,16 @@ Dynamic agent assignment and project-specific configurations
 import os
 import json
 import time
+import atexit
 import logging
+import threading
 from typing import Dict, Any, Optional, List
 from pathlib import Path
+from collections import deque
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 from unified_agent_system import unified_agent
+from code_search_index import code_search_manager
 
 # Flask app setup
 app = Flask(__name__)
@@ -21,14 +25,136 @@ CORS(app)
 
 logger = logging.getLogger(__name__)
 
-class MultiProjectManager:
+# Field weights for project suggestions
+SUGGESTION_FIELD_WEIGHTS = {"name": 10.0, "type": 5.0, "capability": 3.0}
+FUZZY_MATCH_THRESHOLD = 0.35  # Minimum trigram similarity for a typo-tolerant match
+
+def _trigrams(term: str) -> set:
+    """Padded trigrams of a term, so short words still produce some"""
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class ProjectSuggestionIndex:
+    """Prefix trie plus trigram index over project names, types and capabilities"""
+    
     def __init__(self):
-        self.projects = {}
-        self.active_project = None
-        self.agent_mappings = {}
-        self.shortcut_keys = {}
+        self.trie = {}
+        self.trigram_terms = {}  # trigram -> set of terms
+        self.term_trigrams = {}  # term -> trigram set
+        self.term_postings = {}  # term -> {project_path: best field weight}
+    
+    @classmethod
+    def build(cls, projects: Dict[str, Dict[str, Any]]) -> "ProjectSuggestionIndex":
+        """Build a new index from the project table
+        
+        Readers score without a lock, so an index is never refilled in
+        place: the owner swaps in the new one with a single assignment.
+        """
+        index = cls()
+        for project_path, project_info in projects.items():
+            fields = [("name", project_info.get("name", "")), ("type", project_info.get("type", ""))]
+            fields += [("capability", cap) for cap in project_info.get("capabilities", [])]
+            for field, value in fields:
+                value = str(value).lower()
+                terms = {value} | set(value.replace("-", " ").replace("_", " ").split())
+                for term in terms:
+                    if term:
+                        index.add_term(term, project_path, SUGGESTION_FIELD_WEIGHTS[field])
+        return index
+    
+    def add_term(self, term: str, project_path: str, weight: float):
+        """Add a term for a project"""
+        postings = self.term_postings.get(term)
+        if postings is None:
+            postings = self.term_postings[term] = {}
+            node = self.trie
+            for char in term:
+                node = node.setdefault(char, {})
+            node["$"] = term
+            trigrams = self.term_trigrams[term] = _trigrams(term)
+            for trigram in trigrams:
+                self.trigram_terms.setdefault(trigram, set()).add(term)
+        postings[project_path] = max(postings.get(project_path, 0.0), weight)
+    
+    def prefix_terms(self, prefix: str, limit: int = 50) -> List[str]:
+        """Terms starting with a prefix"""
+        node = self.trie
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return []
+        # Breadth-first, so the shortest completions come first
+        terms = []
+        queue = deque([node])
+        while queue and len(terms) < limit:
+            node = queue.popleft()
+            for key, child in node.items():
+                if key == "$":
+                    terms.append(child)
+                else:
+                    queue.append(child)
+        return terms
+    
+    def fuzzy_terms(self, term: str) -> Dict[str, float]:
+        """Terms similar to a (possibly misspelled) term, with trigram similarity"""
+        query_trigrams = _trigrams(term)
+        shared = {}
+        for trigram in query_trigrams:
+            for candidate in self.trigram_terms.get(trigram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+        matches = {}
+        for candidate, count in shared.items():
+            similarity = count / len(query_trigrams | self.term_trigrams[candidate])
+            if similarity >= FUZZY_MATCH_THRESHOLD:
+                matches[candidate] = similarity
+        return matches
+    
+    def score(self, query: str) -> Dict[str, float]:
+        """Score projects for a query: exact > prefix > fuzzy matches"""
+        query = query.lower().strip()
+        tokens = {query} | set(query.replace("-", " ").replace("_", " ").split())
+        scores = {}
+        for token in tokens:
+            if not token:
+                continue
+            matched = {token: 1.0} if token in self.term_postings else {}
+            for term in self.prefix_terms(token):
+                matched.setdefault(term, 0.8)
+            # Typo tolerance only when nothing matched exactly or by prefix
+            if not matched and len(token) >= 3:
+                matched = {term: 0.6 * similarity for term, similarity in self.fuzzy_terms(token).items()}
+            
+            # Best matching term per project counts once per query token
+            token_scores = {}
+            for term, factor in matched.items():
+                for project_path, weight in self.term_postings[term].items():
+                    token_scores[project_path] = max(token_scores.get(project_path, 0.0), weight * factor)
+            for project_path, score in token_scores.items():
+                scores[project_path] = scores.get(project_path, 0.0) + score
+        return scores
+
+class MultiProjectManager:
+    def __init__(self, config_file: str = "data/multi_project_config.json",
+                 save_delay: float = 0.5, max_save_delay: float = 5.0):
+        self._projects = {}
+        self._active_project = None
+        self._agent_mappings = {}
+        self._shortcut_keys = {}
         self.project_configs = {}
         
+        # Write-behind persistence: mutations mark the state dirty and a timer
+        # coalesces bursts into one atomic write
+        self.config_file = Path(config_file)
+        self.save_delay = save_delay
+        self.max_save_delay = max_save_delay
+        self.lock = threading.RLock()
+        self.write_lock = threading.Lock()  # one flush at a time, so writes land in snapshot order
+        self.loaded = False
+        self.dirty_since = None
+        self.save_timer = None
+        self._suggestion_index = ProjectSuggestionIndex()
+        self.project_type_cache = {}  # project path -> (directory mtime, project type)
+        
         # Default project configurations
         self.default_config = {
             "agent": "ZombieCoder Agent (সাহন ভাই)",
@@ -73,10 +199,77 @@ class MultiProjectManager:
             }
         }
         
-        # Load existing projects
-        self.load_projects()
+        # Projects are loaded lazily on first access; pending writes flush on exit
+        atexit.register(self.flush_projects)
+    
+    def ensure_loaded(self):
+        """Load projects from file on first access"""
+        if not self.loaded:
+            with self.lock:
+                if not self.loaded:
+                    self.load_projects()
+    
+    @property
+    def projects(self) -> Dict[str, Dict[str, Any]]:
+        self.ensure_loaded()
+        return self._projects
+    
+    @projects.setter
+    def projects(self, value: Dict[str, Dict[str, Any]]):
+        self.ensure_loaded()
+        self._projects = value
+    
+    @property
+    def active_project(self) -> Optional[str]:
+        self.ensure_loaded()
+        return self._active_project
+    
+    @active_project.setter
+    def active_project(self, value: Optional[str]):
+        self.ensure_loaded()
+        self._active_project = value
+    
+    @property
+    def agent_mappings(self) -> Dict[str, str]:
+        self.ensure_loaded()
+        return self._agent_mappings
+    
+    @agent_mappings.setter
+    def agent_mappings(self, value: Dict[str, str]):
+        self.ensure_loaded()
+        self._agent_mappings = value
+    
+    @property
+    def shortcut_keys(self) -> Dict[str, str]:
+        self.ensure_loaded()
+        return self._shortcut_keys
+    
+    @shortcut_keys.setter
+    def shortcut_keys(self, value: Dict[str, str]):
+        self.ensure_loaded()
+        self._shortcut_keys = value
+    
+    @property
+    def suggestion_index(self) -> ProjectSuggestionIndex:
+        self.ensure_loaded()
+        return self._suggestion_index
     
     def detect_project_type(self, project_path: str) -> str:
+        """Detect project type, cached until the project directory changes"""
+        try:
+            mtime = os.path.getmtime(project_path)
+        except OSError:
+            return self.probe_project_type(project_path)
+        
+        cached = self.project_type_cache.get(project_path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        
+        project_type = self.probe_project_type(project_path)
+        self.project_type_cache[project_path] = (mtime, project_type)
+        return project_type
+    
+    def probe_project_type(self, project_path: str) -> str:
         """Detect project type based on files and structure"""
         try:
             path = Path(project_path)
@@ -130,8 +323,10 @@ class MultiProjectManager:
             }
             
             # Store project
-            self.projects[project_path] = project_info
-            self.agent_mappings[project_path] = config["agent"]
+            with self.lock:
+                self.projects[project_path] = project_info
+                self.agent_mappings[project_path] = config["agent"]
+                self._suggestion_index = ProjectSuggestionIndex.build(self.projects)
             
             # Save to file
             self.save_projects()
@@ -173,12 +368,14 @@ class MultiProjectManager:
                 logger.error(f"Project not found: {project_path}")
                 return False
             
-            self.active_project = project_path
-            project_info = self.projects[project_path]
-            project_info["last_accessed"] = time.time()
+            with self.lock:
+                self.active_project = project_path
+                project_info = self.projects[project_path]
+                project_info["last_accessed"] = time.time()
             
             # Update agent configuration
             self.update_agent_for_project(project_info)
+            self.save_projects()
             
             logger.info(f"✅ Switched to project: {project_info['name']}")
             return True
@@ -218,15 +415,21 @@ class MultiProjectManager:
         """Remove project assignment"""
         try:
             if project_path in self.projects:
-                project_name = self.projects[project_path]["name"]
-                del self.projects[project_path]
-                
-                if project_path in self.agent_mappings:
-                    del self.agent_mappings[project_path]
+                with self.lock:
+                    project_name = self.projects[project_path]["name"]
+                    del self.projects[project_path]
+                    
+                    if project_path in self.agent_mappings:
+                        del self.agent_mappings[project_path]
+                    
+                    self.project_type_cache.pop(project_path, None)
+                    self._suggestion_index = ProjectSuggestionIndex.build(self.projects)
+                    
+                    # If this was the active project, clear it
+                    if self.active_project == project_path:
+                        self.active_project = None
                 
-                # If this was the active project, clear it
-                if self.active_project == project_path:
-                    self.active_project = None
+                code_search_manager.drop_index(project_path)
                 
                 self.save_projects()
                 logger.info(f"✅ Project removed: {project_name}")
@@ -238,6 +441,21 @@ class MultiProjectManager:
             logger.error(f"Project removal error: {e}")
             return False
     
+    def get_project_by_name(self, project_name: str) -> Optional[Dict[str, Any]]:
+        """Get project by name"""
+        for project_info in self.projects.values():
+            if project_info.get("name") == project_name:
+                return project_info
+        return None
+    
+    def search_project(self, project_name: str, query: str, regex: bool = False,
+                       case_sensitive: bool = False, max_results: int = 100) -> Optional[Dict[str, Any]]:
+        """Search a project's files through its trigram index"""
+        project_info = self.get_project_by_name(project_name)
+        if not project_info:
+            return None
+        return code_search_manager.search(project_info["path"], query, regex, case_sensitive, max_results)
+    
     def get_project_by_shortcut(self, shortcut: str) -> Optional[Dict[str, Any]]:
         """Get project by shortcut key"""
         for project_info in self.projects.values():
@@ -284,17 +502,18 @@ class MultiProjectManager:
     
     def load_projects(self):
         """Load projects from file"""
+        self.loaded = True
         try:
-            config_file = Path("data/multi_project_config.json")
-            if config_file.exists():
-                with open(config_file, 'r', encoding='utf-8') as f:
+            if self.config_file.exists():
+                with open(self.config_file, 'r', encoding='utf-8') as f:
                     data = json.load(f)
-                    self.projects = data.get("projects", {})
-                    self.agent_mappings = data.get("agent_mappings", {})
-                    self.shortcut_keys = data.get("shortcut_keys", {})
-                    self.active_project = data.get("active_project")
+                    self._projects = data.get("projects", {})
+                    self._agent_mappings = data.get("agent_mappings", {})
+                    self._shortcut_keys = data.get("shortcut_keys", {})
+                    self._active_project = data.get("active_project")
                 
-                logger.info(f"✅ Loaded {len(self.projects)} projects")
+                self._suggestion_index = ProjectSuggestionIndex.build(self._projects)
+                logger.info(f"✅ Loaded {len(self._projects)} projects")
             else:
                 logger.info("No existing project configuration found")
                 
@@ -302,49 +521,97 @@ class MultiProjectManager:
             logger.error(f"Project loading error: {e}")
     
     def save_projects(self):
-        """Save projects to file"""
-        try:
-            config_file = Path("data/multi_project_config.json")
-            config_file.parent.mkdir(exist_ok=True)
+        """Schedule a debounced save; bursts of mutations become one write"""
+        with self.lock:
+            now = time.time()
+            if self.dirty_since is None:
+                self.dirty_since = now
             
-            data = {
-                "projects": self.projects,
-                "agent_mappings": self.agent_mappings,
-                "shortcut_keys": self.shortcut_keys,
-                "active_project": self.active_project,
-                "last_saved": time.time()
-            }
-            
-            with open(config_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-            
-            logger.info("✅ Projects configuration saved")
+            # Push the write back on every mutation, but never past max_save_delay
+            delay = max(0.0, min(self.save_delay, self.dirty_since + self.max_save_delay - now))
+            if self.save_timer:
+                self.save_timer.cancel()
+            self.save_timer = threading.Timer(delay, self.flush_projects)
+            self.save_timer.daemon = True
+            self.save_timer.start()
+    
+    def flush_projects(self):
+        """Write pending changes atomically (temp file + fsync + rename)"""
+        with self.write_lock:
+            with self.lock:
+                if self.save_timer:
+                    self.save_timer.cancel()
+                    self.save_timer = None
+                if self.dirty_since is None:
+                    return
+                
+                data = {
+                    "projects": self._projects,
+                    "agent_mappings": self._agent_mappings,
+                    "shortcut_keys": self._shortcut_keys,
+                    "active_project": self._active_project,
+                    "last_saved": time.time()
+                }
+                try:
+                    payload = json.dumps(data, indent=2, ensure_ascii=False)
+                except Exception as e:
+                    logger.error(f"Project saving error: {e}")
+                    return
+                dirty_since, self.dirty_since = self.dirty_since, None
             
-        except Exception as e:
-            logger.error(f"Project saving error: {e}")
+            temp_file = self.config_file.with_name(f".{self.config_file.name}.{os.getpid()}.tmp")
+            try:
+                self.config_file.parent.mkdir(parents=True, exist_ok=True)
+                with open(temp_file, 'w', encoding='utf-8') as f:
+                    f.write(payload)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_file, self.config_file)
+                
+                # Persist the rename itself
+                if hasattr(os, "O_DIRECTORY"):
+                    dir_fd = os.open(self.config_file.parent, os.O_RDONLY | os.O_DIRECTORY)
+                    try:
+                        os.fsync(dir_fd)
+                    finally:
+                        os.close(dir_fd)
+                
+                logger.info("✅ Projects configuration saved")
+                
+            except Exception as e:
+                logger.error(f"Project saving error: {e}")
+                try:
+                    temp_file.unlink()
+                except OSError:
+                    pass
+                # Keep the state dirty (since the unsaved changes began) so the next mutation or exit retries
+                with self.lock:
+                    if self.dirty_since is None or dirty_since < self.dirty_since:
+                        self.dirty_since = dirty_since
     
     def get_project_suggestions(self, query: str) -> List[Dict[str, Any]]:
-        """Get project suggestions based on query"""
+        """Get ranked, typo-tolerant project suggestions from the suggestion index"""
         try:
             suggestions = []
-            query_lower = query.lower()
+            recent_cutoff = time.time() - 86400  # Last 24 hours
             
-            for project_info in self.projects.values():
-                project_name = project_info["name"].lower()
-                project_type = project_info["type"].lower()
+            for project_path, score in self.suggestion_index.score(query).items():
+                project_info = self.projects.get(project_path)
+                if not project_info:
+                    continue
                 
-                if (query_lower in project_name or 
-                    query_lower in project_type or
-                    any(cap.lower() in query_lower for cap in project_info["capabilities"])):
-                    
-                    suggestions.append({
-                        "name": project_info["name"],
-                        "type": project_info["type"],
-                        "path": project_info["path"],
-                        "shortcut": project_info["shortcut_key"],
-                        "capabilities": project_info["capabilities"],
-                        "score": self.calculate_suggestion_score(project_info, query_lower)
-                    })
+                # Recent access bonus
+                if project_info.get("last_accessed", 0) > recent_cutoff:
+                    score += 2.0
+                
+                suggestions.append({
+                    "name": project_info["name"],
+                    "type": project_info["type"],
+                    "path": project_info["path"],
+                    "shortcut": project_info["shortcut_key"],
+                    "capabilities": project_info["capabilities"],
+                    "score": round(score, 3)
+                })
             
             # Sort by score
             suggestions.sort(key=lambda x: x["score"], reverse=True)
@@ -353,30 +620,6 @@ class MultiProjectManager:
         except Exception as e:
             logger.error(f"Suggestion error: {e}")
             return []
-    
-    def calculate_suggestion_score(self, project_info: Dict[str, Any], query: str) -> float:
-        """Calculate suggestion relevance score"""
-        score = 0.0
-        
-        # Name match
-        if query in project_info["name"].lower():
-            score += 10.0
-        
-        # Type match
-        if query in project_info["type"].lower():
-            score += 5.0
-        
-        # Capability match
-        for capability in project_info["capabilities"]:
-            if query in capability.lower():
-                score += 3.0
-        
-        # Recent access bonus
-        last_accessed = project_info.get("last_accessed", 0)
-        if last_accessed > time.time() - 86400:  # Last 24 hours
-            score += 2.0
-        
-        return score
 
 # Global instance
 multi_project_manager = MultiProjectManager()
@@ -396,7 +396,16 @@ sqlite3
             
             for table_sql in tables:
                 cursor.execute(table_sql)
-            
+
+            # Secondary indexes for the time-ordered log queries
+            indexes = [
+                "CREATE INDEX IF NOT EXISTS idx_system_logs_category_created ON system_logs (category, created_at)",
+                "CREATE INDEX IF NOT EXISTS idx_system_logs_level_created ON system_logs (level, created_at)"
+            ]
+
+            for index_sql in indexes:
+                cursor.execute(index_sql)
+
             # Insert sample data
             cursor.execute("INSERT OR IGNORE INTO users (username, email, password_hash, role) VALUES (?, ?, ?, ?)",
                          ('admin', 'admin@zombiecoder.com', 'admin_hash_here', 'admin'))
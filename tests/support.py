@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Shared test setup
+Import this before any project module: it puts the server packages on
+sys.path and moves the process into a scratch directory, because several
+modules create databases, logs and memory files relative to the working
+directory as soon as they are imported.
+"""
+
+import os
+import sys
+import atexit
+import shutil
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+for path in (
+    os.path.join(ROOT, "core-server"),
+    os.path.join(ROOT, "core-server", "agents"),
+    os.path.join(ROOT, "workspace", "projects", "shared"),
+    os.path.join(ROOT, "workspace", "projects", "pump_automation"),
+    os.path.join(ROOT, "workspace", "projects", "server_system_setup"),
+):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+ORIGINAL_CWD = os.getcwd()
+WORKDIR = tempfile.mkdtemp(prefix="zombiecoder-tests-")
+os.chdir(WORKDIR)
+
+
+def cleanup():
+    os.chdir(ORIGINAL_CWD)
+    shutil.rmtree(WORKDIR, ignore_errors=True)
+
+
+atexit.register(cleanup)
+
+
+def scratch_dir(name):
+    """A fresh directory inside the scratch area"""
+    return tempfile.mkdtemp(prefix=f"{name}-", dir=WORKDIR)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Auto-fix Scripts Tests
+Incremental log tailing (offsets, rotation, unreadable paths) and error detection
+"""
+
+import os
+import unittest
+
+from support import scratch_dir
+from auto_fix_scripts import AutoFixScripts, LogTailer
+
+
+def append(path, text):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(text)
+
+
+class TailerCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = scratch_dir("tailer")
+        self.state = os.path.join(self.directory, "state.db")
+        self.log = os.path.join(self.directory, "app.log")
+        append(self.log, "old line\n")
+        self.tailers = []
+
+    def tearDown(self):
+        for tailer in self.tailers:
+            tailer.close()
+
+    def tailer(self, paths, **options):
+        tailer = LogTailer(paths, self.state, **options)
+        self.tailers.append(tailer)
+        return tailer
+
+
+class TestLogTailer(TailerCase):
+
+    def test_reads_only_new_complete_lines(self):
+        tailer = self.tailer([self.log])
+        self.assertEqual(tailer.poll()[self.log], b"old line\n")
+        append(self.log, "first\nparti")
+        self.assertEqual(tailer.poll()[self.log], b"first\n")
+        append(self.log, "al\n")
+        self.assertEqual(tailer.poll()[self.log], b"partial\n")
+        self.assertEqual(tailer.poll()[self.log], b"")
+
+    def test_restart_resumes_from_saved_offset(self):
+        tailer = self.tailer([self.log])
+        tailer.poll()
+        tailer.save_offsets()
+        append(self.log, "while stopped\n")
+        self.assertEqual(self.tailer([self.log]).poll()[self.log], b"while stopped\n")
+
+    def test_rotation_finishes_the_old_file(self):
+        tailer = self.tailer([self.log])
+        tailer.poll()
+        append(self.log, "before rotate\n")
+        os.rename(self.log, self.log + ".1")
+        append(self.log, "after rotate\n")
+        self.assertEqual(tailer.poll()[self.log], b"before rotate\nafter rotate\n")
+        self.assertEqual(tailer.stats["rotations"], 1)
+
+    def test_truncation_restarts_at_zero(self):
+        tailer = self.tailer([self.log])
+        tailer.poll()
+        with open(self.log, "w", encoding="utf-8") as f:
+            f.write("fresh\n")
+        self.assertEqual(tailer.poll()[self.log], b"fresh\n")
+
+    def test_large_catch_up_uses_mmap_and_skips_old_bytes(self):
+        tailer = self.tailer([self.log], mmap_threshold=64, max_catchup_bytes=256)
+        tailer.poll()
+        append(self.log, "".join(f"line {i:04d}\n" for i in range(100)))
+        data = tailer.poll()[self.log]
+        self.assertTrue(data.endswith(b"line 0099\n"))
+        self.assertLessEqual(len(data), 256)
+        self.assertEqual(tailer.stats["mmap_reads"], 1)
+        self.assertGreater(tailer.stats["skipped_bytes"], 0)
+
+    def test_unreadable_path_does_not_abort_the_poll(self):
+        directory_path = os.path.join(self.directory, "not-a-file")
+        os.makedirs(directory_path)
+        missing = os.path.join(self.directory, "missing.log")
+        tailer = self.tailer([directory_path, missing, self.log])
+
+        updates = tailer.poll()
+        self.assertEqual(updates[directory_path], b"")
+        self.assertEqual(updates[missing], b"")
+        self.assertEqual(updates[self.log], b"old line\n")
+
+
+class TestDetectErrors(TailerCase):
+
+    def setUp(self):
+        super().setUp()
+        self.scripts = AutoFixScripts()
+        self.scripts.log_tailer.close()
+        self.scripts.log_files = {name: os.path.join(self.directory, f"{name}.log")
+                                  for name in ("system_log", "agent_work_log", "agent_error_log")}
+        for path in self.scripts.log_files.values():
+            append(path, "")
+        self.scripts.log_tailer = self.tailer(self.scripts.log_files.values())
+        self.scripts.log_tailer.poll()
+        self.scripts.check_system_resources = lambda agent_id: []
+        self.scripts.check_service_status = lambda agent_id: []
+
+    def test_lines_are_reported_once(self):
+        append(self.scripts.log_files["system_log"], "kernel: No space left on device\n")
+        append(self.scripts.log_files["agent_error_log"], "worker crashed\n")
+
+        errors = self.scripts.detect_errors("ops")
+        self.assertEqual(sorted(error["error_type"] for error in errors), ["agent_error", "disk_error"])
+        self.assertIsNone(self.scripts.log_updates)
+        self.assertEqual(self.scripts.detect_errors("ops"), [])
+
+    def test_cycle_shares_one_poll_between_agents(self):
+        append(self.scripts.log_files["agent_work_log"], "request failed: Connection refused\n")
+        self.scripts.poll_logs()
+        for agent_id in ("ops", "verifier"):
+            errors = self.scripts.detect_errors(agent_id)
+            self.assertEqual({error["error_type"] for error in errors}, {"network_error", "service_error"})
+        self.assertIsNotNone(self.scripts.log_updates)
+
+
+if __name__ == "__main__":
+    unittest.main()
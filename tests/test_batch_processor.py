@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Batch Processor Tests
+Job leases: expiry, heartbeat renewal and lost-lease completion
+"""
+
+import os
+import time
+import unittest
+
+from support import scratch_dir
+from batch_processor import BatchProcessor
+
+
+class LeaseCase(unittest.TestCase):
+
+    def setUp(self):
+        self.processor = BatchProcessor(os.path.join(scratch_dir("batch"), "batch.db"))
+        self.processor.retry_base_delay = 0
+        self.processor.retry_max_delay = 0
+
+    def create(self, job_id, max_attempts=3):
+        self.processor.create_batch_job(job_id, job_id, "generic_batch", "ops", {}, max_attempts=max_attempts)
+
+    def expire(self, job_id):
+        conn = self.processor.get_connection()
+        conn.execute("UPDATE batch_jobs SET lease_expires_at = ? WHERE job_id = ?", (time.time() - 1, job_id))
+        conn.commit()
+        conn.close()
+
+    def job(self, job_id):
+        conn = self.processor.get_connection()
+        row = conn.execute("SELECT status, lease_owner, lease_expires_at, attempts FROM batch_jobs WHERE job_id = ?",
+                           (job_id,)).fetchone()
+        conn.close()
+        return dict(zip(("status", "lease_owner", "lease_expires_at", "attempts"), row))
+
+
+class TestLeaseExpiry(LeaseCase):
+
+    def test_expired_lease_is_claimed_by_another_worker(self):
+        self.create("job")
+        self.assertEqual(self.processor.claim_job("w1")["job_id"], "job")
+        self.assertIsNone(self.processor.claim_job("w2"))
+
+        self.expire("job")
+        job = self.processor.claim_job("w2")
+        self.assertEqual((job["job_id"], job["attempt"]), ("job", 2))
+        self.assertEqual(self.job("job")["lease_owner"], "w2")
+
+    def test_lost_lease_cannot_complete_or_renew(self):
+        self.create("job")
+        self.processor.claim_job("w1")
+        self.expire("job")
+        self.processor.claim_job("w2")
+
+        self.assertFalse(self.processor.renew_lease("job", "w1"))
+        self.assertFalse(self.processor.complete_job("job", "w1", {"status": "success"}))
+        self.assertTrue(self.processor.complete_job("job", "w2", {"status": "success"}))
+        self.assertEqual(self.job("job")["status"], "completed")
+
+    def test_expiry_on_final_attempt_fails_the_job(self):
+        self.create("job", max_attempts=1)
+        self.processor.claim_job("w1")
+        self.expire("job")
+        self.assertIsNone(self.processor.claim_job("w2"))
+        self.assertEqual(self.job("job")["status"], "failed")
+
+
+class TestLeaseHeartbeat(LeaseCase):
+
+    def test_renew_extends_the_lease(self):
+        self.create("job")
+        self.processor.claim_job("w1")
+        self.expire("job")
+        self.assertTrue(self.processor.renew_lease("job", "w1"))
+        self.assertGreater(self.job("job")["lease_expires_at"], time.time())
+        self.assertIsNone(self.processor.claim_job("w2"))
+
+    def test_job_longer_than_its_lease_is_not_handed_out_twice(self):
+        self.processor.lease_seconds = 0.3
+        self.create("slow")
+        job = self.processor.claim_job("w1")
+        claims = []
+
+        def slow_job(agent_id, job_data):
+            deadline = time.time() + 1.0
+            while time.time() < deadline:
+                claims.append(self.processor.claim_job("w2"))
+                time.sleep(0.05)
+            return {"status": "success"}
+
+        self.processor.execute_generic_batch = slow_job
+        self.processor.process_batch_job(job["job_id"], job["job_name"], job["job_type"], job["agent_id"],
+                                         job["job_data"], job["priority"], worker_id="w1")
+
+        self.assertEqual([claim for claim in claims if claim], [])
+        self.assertEqual(self.job("slow")["status"], "completed")
+        self.assertEqual(self.job("slow")["attempts"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
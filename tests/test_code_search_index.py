@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Code Search Index Tests
+Trigram postings, incremental refresh, persistence and the project search endpoint
+"""
+
+import os
+import unittest
+from pathlib import Path
+
+from support import scratch_dir
+import code_search_index
+from code_search_index import (TrigramIndex, CodeSearchManager, encode_postings, decode_postings,
+                               regex_required_literals)
+
+
+def write(path, content, mode="w"):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, mode) as f:
+        f.write(content)
+
+
+class TestPostings(unittest.TestCase):
+
+    def test_round_trip(self):
+        doc_ids = [0, 1, 5, 127, 128, 300, 70000]
+        self.assertEqual(decode_postings(encode_postings(doc_ids)), doc_ids)
+        self.assertEqual(decode_postings(b""), [])
+
+    def test_regex_required_literals(self):
+        self.assertEqual(regex_required_literals(r"def\s+handle_\w+"), ["def", "handle_"])
+        self.assertEqual(regex_required_literals(r"(?:error)+ code"), ["error", " code"])
+        self.assertEqual(regex_required_literals(r"a|b"), [])
+        self.assertEqual(regex_required_literals(r"[unclosed"), [])
+
+
+class IndexCase(unittest.TestCase):
+
+    def setUp(self):
+        self.root = scratch_dir("project")
+        write(os.path.join(self.root, "app.py"), "def handle_login():\n    return authenticate(user)\n")
+        write(os.path.join(self.root, "lib", "auth.py"), "def authenticate(user):\n    return True\n")
+        write(os.path.join(self.root, "README.md"), "Login flow notes\n")
+        write(os.path.join(self.root, "node_modules", "dep.js"), "function authenticate() {}\n")
+        self.index = TrigramIndex(self.root)
+        self.index.refresh()
+
+    def paths(self, result):
+        return sorted({match["path"] for match in result["results"]})
+
+
+class TestSearch(IndexCase):
+
+    def test_literal_search_uses_candidates(self):
+        result = self.index.search("authenticate")
+        self.assertEqual(self.paths(result), ["app.py", os.path.join("lib", "auth.py")])
+        self.assertEqual(result["candidates"], 2)
+        self.assertEqual(result["indexed_files"], 3)
+
+    def test_case_and_position(self):
+        self.assertEqual(self.paths(self.index.search("LOGIN")), ["README.md", "app.py"])
+        self.assertEqual(self.paths(self.index.search("LOGIN", case_sensitive=True)), [])
+        match = self.index.search("authenticate(user)")["results"][0]
+        self.assertEqual((match["path"], match["line"], match["column"]), ("app.py", 2, 12))
+
+    def test_regex_search(self):
+        result = self.index.search(r"return\s+True", regex=True)
+        self.assertEqual(self.paths(result), [os.path.join("lib", "auth.py")])
+        self.assertEqual(result["candidates"], 1)
+        self.assertEqual(self.paths(self.index.search(r"def \w+\(user\)", regex=True)),
+                         [os.path.join("lib", "auth.py")])
+
+    def test_max_results(self):
+        result = self.index.search("e", max_results=2)
+        self.assertEqual(result["count"], 2)
+        self.assertTrue(result["truncated"])
+
+
+class TestRefresh(IndexCase):
+
+    def test_changes_and_deletions(self):
+        write(os.path.join(self.root, "app.py"), "def handle_logout():\n    pass\n")
+        os.utime(os.path.join(self.root, "app.py"), (1, 1))
+        os.remove(os.path.join(self.root, "README.md"))
+        write(os.path.join(self.root, "new.py"), "logout = True\n")
+
+        self.assertEqual(self.index.refresh(), {"added": 1, "updated": 1, "removed": 1})
+        self.assertEqual(self.paths(self.index.search("logout")), ["app.py", "new.py"])
+        self.assertEqual(self.paths(self.index.search("login")), [])
+
+    def test_skipped_files_are_not_reread_until_changed(self):
+        binary = os.path.join(self.root, "blob.bin")
+        write(binary, b"\x00login", mode="wb")
+        self.index.refresh()
+        self.assertIn("blob.bin", self.index.skipped)
+
+        reads = []
+        original = self.index._read_text
+        self.index._read_text = lambda path: reads.append(path) or original(path)
+        self.assertEqual(self.index.refresh(), {"added": 0, "updated": 0, "removed": 0})
+        self.assertEqual(reads, [])
+
+        write(binary, "login text\n")
+        os.utime(binary, (1, 1))
+        self.assertEqual(self.index.refresh()["added"], 1)
+        self.assertNotIn("blob.bin", self.index.skipped)
+
+    def test_oversized_file_is_skipped(self):
+        original = code_search_index.MAX_FILE_SIZE
+        code_search_index.MAX_FILE_SIZE = 8
+        try:
+            write(os.path.join(self.root, "big.txt"), "authenticate everything\n")
+            self.index.refresh()
+        finally:
+            code_search_index.MAX_FILE_SIZE = original
+        self.assertIn("big.txt", self.index.skipped)
+
+
+class TestPersistence(IndexCase):
+
+    def test_save_and_load(self):
+        write(os.path.join(self.root, "blob.bin"), b"\x00\x01", mode="wb")
+        self.index.refresh()
+        index_file = Path(scratch_dir("index")) / "project.idx"
+        self.index.save(index_file)
+        self.assertFalse(self.index.dirty)
+
+        loaded = TrigramIndex.load(index_file)
+        self.assertEqual(self.paths(loaded.search("authenticate")), ["app.py", os.path.join("lib", "auth.py")])
+        self.assertEqual(loaded.skipped, self.index.skipped)
+        self.assertEqual(loaded.refresh(), {"added": 0, "updated": 0, "removed": 0})
+
+    def test_corrupt_file_is_ignored(self):
+        index_file = Path(scratch_dir("index")) / "broken.idx"
+        index_file.write_bytes(code_search_index.INDEX_MAGIC + b"not zlib")
+        self.assertIsNone(TrigramIndex.load(index_file))
+
+    def test_save_compacts_tombstones(self):
+        for name in ("app.py", "README.md"):
+            self.index.remove_file(name)
+        self.index.save(Path(scratch_dir("index")) / "project.idx")
+        self.assertEqual(self.index.deleted, set())
+        self.assertEqual(sorted(self.index.docs), [0])
+        self.assertEqual(self.paths(self.index.search("authenticate")), [os.path.join("lib", "auth.py")])
+
+    def test_manager_reuses_the_saved_index(self):
+        manager = CodeSearchManager(index_dir=scratch_dir("indexes"), refresh_interval=0)
+        self.assertEqual(manager.search(self.root, "authenticate")["count"], 2)
+        self.assertTrue(manager.index_file_for(self.root).exists())
+
+        restarted = CodeSearchManager(index_dir=manager.index_dir, refresh_interval=3600)
+        self.assertEqual(restarted.search(self.root, "authenticate")["count"], 2)
+        restarted.drop_index(self.root)
+        self.assertFalse(manager.index_file_for(self.root).exists())
+
+
+class TestSearchEndpoint(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        from multi_project_api import MultiProjectAPI, multi_project_manager
+        cls.manager = multi_project_manager
+        cls.client = MultiProjectAPI().app.test_client()
+
+    def setUp(self):
+        self.calls = []
+        self.manager.search_project = lambda name, query, regex, case, limit: self.calls.append(limit) or {}
+
+    def tearDown(self):
+        del self.manager.search_project
+
+    def test_limit_is_validated_and_clamped(self):
+        self.assertEqual(self.client.get("/api/projects/p/search?q=x&limit=abc").status_code, 400)
+        for limit, expected in (("0", 1), ("5000", 1000), ("25", 25)):
+            self.assertEqual(self.client.get(f"/api/projects/p/search?q=x&limit={limit}").status_code, 200)
+            self.assertEqual(self.calls[-1], expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Conversation Search Tests
+FTS5 ranking, cursor pagination and single indexing of each stored turn
+"""
+
+import os
+import unittest
+
+from support import scratch_dir
+import conversation_search
+import database_manager
+import memory_manager
+from conversation_search import ConversationSearchIndex
+
+
+class SearchIndexCase(unittest.TestCase):
+    """Runs each test against a fresh index shared by the storage modules"""
+
+    def setUp(self):
+        self.directory = scratch_dir("search")
+        self.index = ConversationSearchIndex(os.path.join(self.directory, "search.db"))
+        self.originals = {module: module.conversation_search for module in (database_manager, memory_manager)}
+        for module in self.originals:
+            module.conversation_search = self.index
+
+    def tearDown(self):
+        for module, original in self.originals.items():
+            module.conversation_search = original
+
+
+class TestSearch(SearchIndexCase):
+
+    def test_cursor_pages_cover_every_match_once(self):
+        for i in range(23):
+            self.index.add(f"python question {i}", "python " * (i % 5 + 1) + "answer", user_id=1)
+        self.index.add("rust question", "unrelated answer", user_id=1)
+
+        seen = []
+        cursor = None
+        while True:
+            page = self.index.search("python", limit=5, cursor=cursor)
+            seen.extend(result["id"] for result in page["results"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        self.assertEqual(len(seen), 23)
+        self.assertEqual(len(set(seen)), 23)
+
+    def test_ranking_and_highlight(self):
+        self.index.add("how do I sort a list", "use sorted()")
+        self.index.add("sort sort sort", "sort it")
+        results = self.index.search("sort")["results"]
+        self.assertEqual(len(results), 2)
+        self.assertGreaterEqual(results[0]["score"], results[1]["score"])
+        self.assertIn(f"{conversation_search.HIGHLIGHT_START}sort", results[0]["message_snippet"])
+
+    def test_bengali_prefix_match(self):
+        self.index.add("আমি ভালো আছি", "ধন্যবাদ")
+        self.assertEqual(self.index.search("ভা")["count"], 1)
+
+    def test_filters(self):
+        self.index.add("deploy failed", "check logs", user_id=1, agent="editor")
+        self.index.add("deploy worked", "great", user_id=2, agent="chat")
+        self.assertEqual(self.index.search("deploy", user_id=2)["results"][0]["agent"], "chat")
+        self.assertEqual(self.index.search("deploy", agent="editor")["count"], 1)
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(ValueError):
+            self.index.search("anything", cursor="not-a-cursor")
+
+
+class TestSingleIndexing(SearchIndexCase):
+
+    def test_same_turn_indexed_once(self):
+        first = self.index.add("hello", "hi there", source="botgachh")
+        second = self.index.add("hello", "hi there", user_id=1, source="database")
+        self.assertEqual(first, second)
+        self.assertEqual(self.index.count(), 1)
+
+        self.index.add("hello", "a different reply")
+        self.assertEqual(self.index.count(), 2)
+
+    def test_repeat_after_window_is_indexed(self):
+        self.index.add("hello", "hi there")
+        connection = self.index.get_connection()
+        connection.execute("UPDATE conversation_digests SET indexed_at = indexed_at - ?",
+                           (conversation_search.DUPLICATE_WINDOW_SECONDS + 1,))
+        connection.commit()
+        self.index.add("hello", "hi there")
+        self.assertEqual(self.index.count(), 2)
+
+    def test_memory_and_database_paths_share_one_entry(self):
+        memory = memory_manager.MemoryManager(config_path=os.path.join(self.directory, "missing.json"))
+        memory.log_chat("what is WAL", "write-ahead logging", "editor")
+
+        manager = database_manager.DatabaseManager(replicate=False)
+        manager.sqlite_db = os.path.join(self.directory, "local.db")
+        self.assertTrue(manager.save_conversation(1, 1, "s", "what is WAL", "write-ahead logging"))
+        self.assertEqual(self.index.count(), 1)
+
+    def test_failed_write_is_not_indexed(self):
+        manager = database_manager.DatabaseManager(replicate=False)
+        manager.write_local = lambda table, row: False
+        self.assertFalse(manager.save_conversation(1, 1, "s", "lost turn", "never stored"))
+        self.assertEqual(self.index.count(), 0)
+
+        memory = memory_manager.MemoryManager(config_path=os.path.join(self.directory, "missing.json"))
+        memory.write_memory = lambda memory_type, data: False
+        memory.log_chat("lost chat", "never stored", "editor")
+        self.assertEqual(self.index.count(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
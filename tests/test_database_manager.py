@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Database Manager Tests
+Catalog lookups, local-first writes and replication to MySQL (no MySQL server needed)
+"""
+
+import os
+import time
+import sqlite3
+import threading
+import unittest
+import unittest.mock
+from datetime import datetime, timedelta
+
+from support import WORKDIR
+from database_manager import DatabaseManager, CatalogCache, SQLiteReplicator, LOCAL_SCHEMA, SCHEMA_MIGRATIONS
+
+
+def offline_manager(name):
+    """A manager on its own SQLite file with no reachable MySQL"""
+    manager = DatabaseManager(replicate=False)
+    manager.sqlite_db = os.path.join(WORKDIR, f"{name}.db")
+    manager.mysql_configs = []
+    manager.catalog_cache = CatalogCache(lambda name: [{"id": 1, "name": "editor", "display_name": "Editor"}],
+                                         lambda name: 1)
+    return manager
+
+
+class TestAgentLookup(unittest.TestCase):
+    """get_agent_by_id against a cached catalog"""
+
+    def setUp(self):
+        self.manager = DatabaseManager(replicate=False)
+        agents = [{"id": 1, "name": "editor"}, {"id": 2, "name": "chat"}]
+        self.manager.catalog_cache = CatalogCache(lambda name: agents, lambda name: 1)
+
+    def test_int_id(self):
+        self.assertEqual(self.manager.get_agent_by_id(2)["name"], "chat")
+
+    def test_string_id_is_coerced(self):
+        """IDs from URLs and JSON bodies arrive as strings"""
+        self.assertEqual(self.manager.get_agent_by_id("1")["name"], "editor")
+
+    def test_invalid_id(self):
+        self.assertIsNone(self.manager.get_agent_by_id("editor"))
+        self.assertIsNone(self.manager.get_agent_by_id(None))
+
+    def test_unknown_id(self):
+        self.assertIsNone(self.manager.get_agent_by_id(99))
+
+    def test_returns_copy(self):
+        self.manager.get_agent_by_id(1)["name"] = "changed"
+        self.assertEqual(self.manager.get_agent_by_id(1)["name"], "editor")
+
+
+class FakeMySQL:
+    """ship_batch stand-in: records shipped rows, rejects rows whose message is 'bad'"""
+
+    def __init__(self):
+        self.rows = {}
+        self.online = True
+
+    def ship(self, table, batch):
+        if not self.online or any(row[4] == "bad" for row in batch):
+            return False
+        for row in batch:
+            self.rows[row[0]] = row
+        return True
+
+
+class TestReplicator(unittest.TestCase):
+    """Lease handling and dead-lettering of rows MySQL keeps rejecting"""
+
+    def setUp(self):
+        self.connection = sqlite3.connect(":memory:")
+        for statement in LOCAL_SCHEMA:
+            self.connection.execute(statement)
+        self.mysql = FakeMySQL()
+        self.replicator = SQLiteReplicator(lambda: self.connection, self.mysql.ship,
+                                           batch_size=8, max_attempts=2)
+
+    def add_conversations(self, messages):
+        now = datetime.now().isoformat(sep=" ")
+        self.connection.executemany(
+            "INSERT INTO conversations (user_id, agent_id, session_id, message, response, metadata, created_at) "
+            "VALUES (1, 1, 's', ?, 'r', '{}', ?)", [(message, now) for message in messages])
+        self.connection.commit()
+
+    def dead_letters(self):
+        return self.connection.execute("SELECT local_id FROM replication_dead_letters ORDER BY local_id").fetchall()
+
+    def test_ships_all_rows(self):
+        self.add_conversations([f"m{i}" for i in range(20)])
+        self.assertEqual(self.replicator.replicate_once(), 20)
+        self.assertEqual(len(self.mysql.rows), 20)
+        self.assertEqual(self.replicator.get_stats()["pending"]["conversations"], 0)
+
+    def test_lease_held_elsewhere(self):
+        self.connection.execute("UPDATE replication_lease SET owner = 'other', expires_at = ?",
+                                (datetime.now().timestamp() + 60,))
+        self.connection.commit()
+        self.add_conversations(["m1"])
+        self.assertEqual(self.replicator.replicate_once(), 0)
+        self.assertEqual(self.mysql.rows, {})
+
+    def test_expired_lease_is_taken_over(self):
+        self.connection.execute("UPDATE replication_lease SET owner = 'other', expires_at = ?",
+                                (datetime.now().timestamp() - 1,))
+        self.connection.commit()
+        self.add_conversations(["m1"])
+        self.assertEqual(self.replicator.replicate_once(), 1)
+        owner = self.connection.execute("SELECT owner FROM replication_lease").fetchone()[0]
+        self.assertEqual(owner, self.replicator.owner)
+
+    def test_rejected_rows_are_dead_lettered(self):
+        self.add_conversations(["m1", "bad", "m3", "m4", "bad", "m6"])
+        self.assertEqual(self.replicator.replicate_once(), 0)  # first failure is retried later
+        self.assertEqual(self.replicator.replicate_once(), 4)
+        self.assertEqual(self.dead_letters(), [(2,), (5,)])
+        self.assertEqual(self.replicator.get_stats()["dead_lettered"], 2)
+        self.assertEqual(self.replicator.get_stats()["pending"]["conversations"], 0)
+
+    def test_outage_keeps_rows_queued(self):
+        self.add_conversations(["m1", "m2"])
+        self.mysql.online = False
+        for _ in range(5):
+            self.assertEqual(self.replicator.replicate_once(), 0)
+        self.assertEqual(self.dead_letters(), [])
+        self.assertEqual(self.replicator.get_stats()["pending"]["conversations"], 2)
+        
+        self.mysql.online = True
+        self.assertEqual(self.replicator.replicate_once(), 2)
+
+
+class TestLocalReads(unittest.TestCase):
+    """History and analytics served from the local store when MySQL is unavailable"""
+
+    def setUp(self):
+        self.manager = offline_manager(self.id().rsplit(".", 1)[-1])
+
+    def test_conversation_page_offline(self):
+        for i in range(5):
+            self.assertTrue(self.manager.save_conversation(1, 1, "s", f"message {i}", "reply"))
+        
+        page = self.manager.get_conversation_page(limit=3)
+        self.assertEqual([conv["message"] for conv in page["conversations"]],
+                         ["message 4", "message 3", "message 2"])
+        self.assertEqual(page["conversations"][0]["agent_name"], "editor")
+        self.assertNotIn("origin_key", page["conversations"][0])
+        
+        page = self.manager.get_conversation_page(limit=3, cursor=page["next_cursor"])
+        self.assertEqual([conv["message"] for conv in page["conversations"]], ["message 1", "message 0"])
+        self.assertIsNone(page["next_cursor"])
+
+    def test_conversation_filters_offline(self):
+        self.manager.save_conversation(1, 1, "s", "mine", "reply")
+        self.manager.save_conversation(2, 1, "s", "theirs", "reply")
+        page = self.manager.get_conversation_page(user_id=2)
+        self.assertEqual([conv["message"] for conv in page["conversations"]], ["theirs"])
+
+    def test_pending_rows_merged_with_mysql(self):
+        self.manager.save_conversation(1, 1, "s", "shipped", "reply")
+        self.manager.save_conversation(1, 1, "s", "pending", "reply")
+        node_id = self.manager.replicator.get_node_id(self.manager.get_sqlite_connection())
+        remote = {"id": 900, "user_id": 1, "agent_id": 1, "session_id": "s", "message": "shipped",
+                  "response": "reply", "metadata": "{}", "origin_key": f"{node_id}:1",
+                  "created_at": datetime.now() - timedelta(minutes=1)}
+        self.manager.query_conversations = lambda *args: [dict(remote)]
+        
+        page = self.manager.get_conversation_page()
+        self.assertEqual([conv["message"] for conv in page["conversations"]], ["pending", "shipped"])
+        self.assertEqual(page["conversations"][1]["id"], 900)
+
+    def test_analytics_offline(self):
+        self.manager.log_analytics("chat", agent_id=1, metadata={"latency_ms": 100})
+        self.manager.log_analytics("chat", agent_id=1, metadata={"latency_ms": 300})
+        self.manager.log_analytics("error", agent_id=1)
+        
+        buckets = {bucket["event_type"]: bucket for bucket in self.manager.get_analytics(days=1)}
+        self.assertEqual(buckets["chat"]["event_count"], 2)
+        self.assertEqual(buckets["chat"]["avg_latency_ms"], 200.0)
+        self.assertEqual(buckets["chat"]["agent_name"], "editor")
+        self.assertEqual(buckets["chat"]["granularity"], "hour")
+        self.assertIsNone(buckets["error"]["avg_latency_ms"])
+        
+        self.assertEqual([bucket["event_type"] for bucket in self.manager.get_analytics("error", days=1)], ["error"])
+
+    def test_pending_analytics_added_to_rollups(self):
+        self.manager.log_analytics("chat", agent_id=1, metadata={"latency_ms": 100})
+        bucket_start = datetime.now().replace(minute=0, second=0, microsecond=0)
+        self.manager.query_rollups = lambda *args: [{
+            "bucket_start": bucket_start, "event_type": "chat", "agent_id": 1, "event_count": 4,
+            "latency_sum": 200.0, "latency_count": 4, "agent_name": "editor"
+        }]
+        
+        buckets = self.manager.get_analytics(days=1)
+        self.assertEqual(len(buckets), 1)
+        self.assertEqual(buckets[0]["event_count"], 5)
+        self.assertEqual(buckets[0]["avg_latency_ms"], 60.0)
+
+
+class FakeMigrationServer:
+    """Just enough of MySQL for the migration runner: the applied set, named locks, a statement log"""
+
+    def __init__(self, tables=("conversations", "analytics")):
+        self.tables = set(tables)
+        self.applied = set()
+        self.executed = []
+        self.locks = {}
+        self.guard = threading.Lock()
+
+    def connect(self):
+        return FakeMigrationConnection(self)
+
+
+class FakeMigrationConnection:
+
+    def __init__(self, server):
+        self.server = server
+
+    def cursor(self):
+        return FakeMigrationCursor(self.server)
+
+    def commit(self):
+        pass
+
+
+class FakeMigrationCursor:
+
+    def __init__(self, server):
+        self.server = server
+        self.result = []
+
+    def execute(self, statement, params=()):
+        server = self.server
+        self.result = []
+        if statement.startswith("SELECT GET_LOCK"):
+            lock = server.locks.setdefault(params[0], threading.Lock())
+            self.result = [(1 if lock.acquire(timeout=params[1]) else 0,)]
+        elif statement.startswith("SELECT RELEASE_LOCK"):
+            server.locks[params[0]].release()
+            self.result = [(1,)]
+        elif "information_schema.tables" in statement:
+            self.result = [(table,) for table in server.tables]
+        elif statement.startswith("SELECT version FROM schema_migrations"):
+            with server.guard:
+                self.result = [(version,) for version in server.applied]
+        elif statement.startswith("INSERT INTO schema_migrations"):
+            with server.guard:
+                server.applied.add(params[0])
+        elif "schema_migrations" not in statement:
+            time.sleep(0.001)  # widen the window between reading the applied set and recording
+            server.executed.append(statement)
+
+    def fetchone(self):
+        return self.result[0] if self.result else None
+
+    def fetchall(self):
+        return list(self.result)
+
+    def close(self):
+        pass
+
+
+class TestMigrations(unittest.TestCase):
+    """run_migrations against a fake server shared by concurrent processes"""
+
+    def test_applies_every_migration_in_order(self):
+        server = FakeMigrationServer()
+        manager = DatabaseManager(replicate=False)
+        self.assertTrue(manager.run_migrations(server.connect()))
+        self.assertTrue(manager.schema_ready)
+        self.assertEqual(server.applied, {version for version, _, _ in SCHEMA_MIGRATIONS})
+        self.assertEqual(server.executed, [statement for _, _, statements in SCHEMA_MIGRATIONS for statement in statements])
+
+    def test_concurrent_runners_apply_each_migration_once(self):
+        server = FakeMigrationServer()
+        managers = [DatabaseManager(replicate=False) for _ in range(4)]
+        threads = [threading.Thread(target=manager.run_migrations, args=(server.connect(),)) for manager in managers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        expected = [statement for _, _, statements in SCHEMA_MIGRATIONS for statement in statements]
+        self.assertEqual(server.executed, expected)
+        self.assertTrue(all(manager.schema_ready for manager in managers))
+
+    def test_lock_timeout_leaves_schema_pending(self):
+        server = FakeMigrationServer()
+        server.locks["zombiecoder_schema_migrations"] = held = threading.Lock()
+        held.acquire()
+        manager = DatabaseManager(replicate=False)
+        with unittest.mock.patch("database_manager.MIGRATION_LOCK_TIMEOUT", 0.05):
+            self.assertFalse(manager.run_migrations(server.connect()))
+        self.assertFalse(manager.schema_ready)
+        self.assertEqual(server.executed, [])
+
+    def test_nothing_pending_skips_the_lock(self):
+        server = FakeMigrationServer()
+        server.applied = {version for version, _, _ in SCHEMA_MIGRATIONS}
+        manager = DatabaseManager(replicate=False)
+        self.assertTrue(manager.run_migrations(server.connect()))
+        self.assertEqual(server.locks, {})
+
+    def test_migrations_wait_for_missing_base_tables(self):
+        server = FakeMigrationServer(tables=["analytics"])
+        manager = DatabaseManager(replicate=False)
+        self.assertFalse(manager.run_migrations(server.connect()))
+        self.assertFalse(manager.schema_ready)
+        self.assertEqual(server.applied, {"001_analytics_rollups", "003_catalog_versions"})
+        self.assertFalse(any("ON conversations" in statement for statement in server.executed))
+        
+        server.tables.add("conversations")
+        self.assertTrue(manager.run_migrations(server.connect()))
+        self.assertTrue(manager.schema_ready)
+        self.assertEqual(server.applied, {version for version, _, _ in SCHEMA_MIGRATIONS})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Editor Agent Tests
+Project scanning and the symbol index behind definition/usage lookups
+"""
+
+import os
+import unittest
+
+from support import scratch_dir
+from editor_agent import EditorAgent, SymbolIndex
+from editor_analysis import SOURCE_LANGUAGES, SYMBOL_INDEX_EXTENSIONS, DIAGNOSTICS_LANGUAGES
+
+
+def write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+class TestSymbolIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = scratch_dir("symbols")
+        self.index = SymbolIndex(max_workers=1)
+        self.path = os.path.join(self.directory, "models.py")
+        write(self.path, "class User:\n    def save(self):\n        pass\n\n"
+                         "class Order:\n    def save(self):\n        User().save()\n\ndef save():\n    pass\n")
+        self.index.build([self.path])
+
+    def test_unqualified_lookup(self):
+        self.assertEqual(sorted(d["qualname"] for d in self.index.find_definitions("save")),
+                         ["Order.save", "User.save", "save"])
+
+    def test_qualified_lookup(self):
+        self.assertEqual([d["qualname"] for d in self.index.find_definitions("Order.save")], ["Order.save"])
+        self.assertEqual(self.index.find_definitions("Missing.save"), [])
+
+    def test_usages_and_removal(self):
+        self.assertEqual(self.index.find_usages("save")[0]["caller"], "Order.save")
+        self.index.remove_file(self.path)
+        self.assertEqual(self.index.find_definitions("save"), [])
+
+
+class TestProjectScan(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.agent = EditorAgent()
+
+    def setUp(self):
+        self.workspace = scratch_dir("workspace")
+        self.app = os.path.join(self.workspace, "app")
+        self.agent.project_paths = {}
+        self.agent.symbol_index = SymbolIndex(max_workers=1)
+
+    def test_extension_sets_are_shared(self):
+        self.assertTrue(set(SYMBOL_INDEX_EXTENSIONS) <= self.agent.supported_extensions)
+        self.assertTrue(set(DIAGNOSTICS_LANGUAGES) <= self.agent.supported_extensions)
+        self.assertEqual(self.agent.supported_extensions, set(SOURCE_LANGUAGES))
+
+    def test_jsx_and_tsx_are_indexed(self):
+        write(os.path.join(self.app, "Button.jsx"), "function Button() { return click(); }\n")
+        write(os.path.join(self.app, "Form.tsx"), "function Form() { return Button(); }\n")
+        write(os.path.join(self.app, "node_modules", "lib.js"), "function Ignored() {}\n")
+        self.agent.project_paths[self.app] = {"path": self.app}
+
+        self.assertEqual(self.agent.refresh_symbol_index(self.app), 2)
+        self.assertEqual(self.agent.symbol_index.find_definitions("Form")[0]["path"],
+                         os.path.join(self.app, "Form.tsx"))
+        self.assertEqual(self.agent.symbol_index.find_usages("Button")[0]["caller"], "Form")
+        self.assertEqual(self.agent.symbol_index.find_definitions("Ignored"), [])
+
+    def test_refresh_is_scoped_to_the_project_directory(self):
+        sibling = os.path.join(self.workspace, "app2")
+        write(os.path.join(self.app, "main.py"), "def main():\n    pass\n")
+        write(os.path.join(sibling, "tool.py"), "def tool():\n    pass\n")
+        self.agent.project_paths = {self.app: {"path": self.app}, sibling: {"path": sibling}}
+        self.agent.refresh_symbol_index()
+
+        os.remove(os.path.join(self.app, "main.py"))
+        self.agent.refresh_symbol_index(self.app)
+        self.assertEqual(self.agent.symbol_index.find_definitions("main"), [])
+        self.assertEqual(len(self.agent.symbol_index.find_definitions("tool")), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
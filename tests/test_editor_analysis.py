@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Editor Analysis Tests
+Symbol extraction, syntax checks and lint used by the editor agent's worker processes
+"""
+
+import os
+import sys
+import subprocess
+import unittest
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from support import ROOT, scratch_dir
+import editor_analysis
+from editor_analysis import check_source, check_item, index_file, parse_python_symbols, parse_js_symbols
+
+
+def messages(diagnostics):
+    return [diagnostic["message"] for diagnostic in diagnostics]
+
+
+class TestLint(unittest.TestCase):
+
+    def test_empty_source_is_valid(self):
+        self.assertEqual(check_source("python", ""), [])
+        self.assertEqual(check_source("python", "\n\n"), [])
+
+    def test_syntax_error(self):
+        diagnostics = check_source("python", "def broken(:\n    pass\n")
+        self.assertEqual(diagnostics[0]["severity"], "error")
+        self.assertEqual(diagnostics[0]["line"], 1)
+
+    def test_unused_import(self):
+        self.assertEqual(messages(check_source("python", "import os\nimport sys\nprint(sys.argv)\n")),
+                         ["'os' imported but unused"])
+
+    def test_string_mentioning_import_is_not_a_use(self):
+        code = "import json\nprint('json')\n"
+        self.assertEqual(messages(check_source("python", code)), ["'json' imported but unused"])
+
+    def test_names_in_all_are_used(self):
+        code = "from os import path, sep\n__all__ = ['path']\n__all__ += ('sep',)\n"
+        self.assertEqual(check_source("python", code), [])
+
+    def test_lint_warnings(self):
+        code = "def f(items=[]):\n    try:\n        return items == None\n    except:\n        pass\n"
+        self.assertEqual(sorted(messages(check_source("python", code))), [
+            "Bare 'except:' catches SystemExit and KeyboardInterrupt",
+            "Comparison to None should use 'is' / 'is not'",
+            "Mutable default argument in 'f'"
+        ])
+
+    def test_json_and_brackets(self):
+        self.assertEqual(check_source("json", '{"a": [1, 2]}'), [])
+        self.assertEqual(check_source("json", '{"a": }')[0]["severity"], "error")
+        self.assertEqual(check_source("javascript", "const s = '(';\nfoo(bar[1]);\n"), [])
+        self.assertEqual(messages(check_source("javascript", "function f() {\n  if (x) {\n}\n")), ["Unclosed '{'"])
+
+    def test_check_item_reports_checker_errors(self):
+        key, diagnostics = check_item(("k", "python", None))
+        self.assertEqual(key, "k")
+        self.assertEqual(diagnostics[0]["source"], "checker")
+
+
+class TestSymbols(unittest.TestCase):
+
+    def test_python_symbols(self):
+        symbols = parse_python_symbols(
+            "import os\nclass Store:\n    def save(self):\n        os.fsync(1)\n\ndef main():\n    Store().save()\n")
+        self.assertEqual([(d["qualname"], d["kind"]) for d in symbols["definitions"]],
+                         [("Store", "class"), ("Store.save", "method"), ("main", "function")])
+        self.assertIn({"name": "fsync", "line": 4, "caller": "Store.save"}, symbols["calls"])
+
+    def test_js_symbols(self):
+        symbols = parse_js_symbols(
+            "import x from 'lib';\nclass View {\n  render() { draw(); }\n}\nconst run = () => { new View().render(); };\n")
+        self.assertEqual([(d["qualname"], d["kind"]) for d in symbols["definitions"]],
+                         [("View", "class"), ("View.render", "method"), ("run", "function")])
+        self.assertEqual(symbols["imports"][0]["module"], "lib")
+
+    def test_index_file(self):
+        directory = scratch_dir("symbols")
+        path = os.path.join(directory, "widget.tsx")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("function Widget() { return render(); }\n")
+        shard = index_file(path)
+        self.assertEqual(shard["language"], "typescript")
+        self.assertEqual(shard["definitions"][0]["name"], "Widget")
+        self.assertIsNone(index_file(os.path.join(directory, "missing.py")))
+
+
+class TestWorkerIsolation(unittest.TestCase):
+    """Pool workers import only editor_analysis, never the agent module"""
+
+    def test_import_has_no_agent_side_effects(self):
+        agents = os.path.join(ROOT, "core-server", "agents")
+        result = subprocess.run(
+            [sys.executable, "-c",
+             f"import sys; sys.path.insert(0, {agents!r}); import editor_analysis; "
+             "print(sorted(name for name in ('editor_agent', 'requests') if name in sys.modules))"],
+            capture_output=True, text=True, timeout=60)
+        self.assertEqual(result.stdout.strip(), "[]")
+
+    def test_spawn_pool(self):
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=2, mp_context=context) as pool:
+            checked = dict(pool.map(check_item, [("a", "python", "import os\n"), ("b", "json", "[1]")]))
+        self.assertEqual(messages(checked["a"]), ["'os' imported but unused"])
+        self.assertEqual(checked["b"], [])
+        self.assertEqual(check_item.__module__, editor_analysis.__name__)
+
+
+if __name__ == "__main__":
+    unittest.main()
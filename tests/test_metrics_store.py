@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Metrics Store Tests
+Chunked storage precision, rollup tiers, aligned queries and retention
+"""
+
+import os
+import time
+import zlib
+import unittest
+
+import numpy as np
+
+from support import scratch_dir
+from metrics_store import MetricsStore, RAW, MINUTE, HOUR
+
+
+class StoreCase(unittest.TestCase):
+
+    def setUp(self):
+        self.store = MetricsStore(os.path.join(scratch_dir("metrics"), "metrics.db"), flush_interval=3600,
+                                  flush_size=10 ** 6)
+        self.now = (time.time() // HOUR) * HOUR - 1
+
+
+class TestPrecision(StoreCase):
+
+    def test_large_counters_keep_their_increments(self):
+        values = 1.2e12 + np.arange(10) * 1500.0
+        for i, value in enumerate(values):
+            self.store.record("net.bytes", value, self.now - 600 + i * 10)
+        data = self.store.query("net.bytes", self.now - 700, self.now, resolution=RAW)
+        np.testing.assert_array_equal(data["values"], values)
+
+    def test_float32_chunks_are_read_and_widened(self):
+        chunk_start = int(self.now // HOUR) * HOUR
+        conn = self.store.get_connection()
+        conn.execute('''
+            INSERT INTO metric_chunks (series, resolution, chunk_start, point_count, offsets, "values")
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', ("legacy", RAW, chunk_start, 2, zlib.compress(np.array([0, 1000], dtype=np.uint32).tobytes()),
+              zlib.compress(np.array([1.5, 2.5], dtype=np.float32).tobytes())))
+
+        self.store.record("legacy", 3.25, chunk_start + 2)
+        self.store.flush()
+        chunk = self.store.read_chunk(conn, "legacy", RAW, chunk_start)
+        self.assertEqual(chunk["values"].dtype, np.float64)
+        np.testing.assert_array_equal(chunk["values"], [1.5, 2.5, 3.25])
+
+
+class TestRollups(StoreCase):
+
+    def test_minute_tier_and_unrolled_tail(self):
+        start = (self.now // MINUTE) * MINUTE - 30 * MINUTE
+        for i in range(30 * 6):
+            self.store.record("cpu", float(i % 6), start + i * 10)
+        self.store.flush()
+
+        data = self.store.query("cpu", start, self.now, resolution=MINUTE)
+        np.testing.assert_array_equal(data["timestamps"], start + np.arange(30) * MINUTE)
+        self.assertTrue(np.allclose(data["values"], 2.5))
+        self.assertEqual((data["minimums"][0], data["maximums"][0]), (0.0, 5.0))
+        self.assertEqual(data["counts"].sum(), 30 * 6)
+
+        # The newest minute is still open, so it comes from raw points rather than the rollup tier
+        rolled = self.store.read_range(self.store.get_connection(), "cpu", MINUTE, start, self.now)
+        self.assertEqual(len(rolled["timestamps"]), 29)
+
+    def test_query_aligned_marks_gaps(self):
+        start = self.now - 5 * MINUTE
+        self.store.record("a", 1.0, start + 10)
+        self.store.record("a", 3.0, start + 20)
+        self.store.record("b", 7.0, start + 4 * MINUTE)
+        buckets, matrix = self.store.query_aligned(["a", "b", "missing"], start, start + 5 * MINUTE)
+
+        self.assertEqual(len(buckets), 5)
+        self.assertEqual(matrix[0, 0], 2.0)
+        self.assertTrue(np.isnan(matrix[0, 1:]).all())
+        self.assertEqual(matrix[1, 4], 7.0)
+        self.assertTrue(np.isnan(matrix[2]).all())
+
+    def test_latest_and_series_listing(self):
+        self.store.record("performance.ops.cpu_usage", 10.0, self.now - 20)
+        self.store.flush()
+        self.store.record("performance.ops.cpu_usage", 12.0, self.now - 10)
+        self.store.record("performance.verifier.cpu_usage", 5.0, self.now - 10)
+        self.assertEqual(self.store.latest("performance.ops.cpu_usage"), 12.0)
+        self.assertEqual(self.store.list_series("performance.ops."), ["performance.ops.cpu_usage"])
+        self.assertIsNone(self.store.latest("missing"))
+
+
+class TestRetention(StoreCase):
+
+    def test_expired_chunks_are_pruned_on_flush(self):
+        self.store.record("old", 1.0, time.time() - 3 * 86400)
+        self.store.record("new", 1.0, self.now)
+        self.store.flush()
+        self.assertEqual(self.store.get_stats()["tiers"][RAW]["series"], 1)
+        self.assertEqual(self.store.list_series(), ["new"])
+        self.assertEqual(len(self.store.query("old", time.time() - 4 * 86400, time.time(), RAW)["values"]), 0)
+        self.assertEqual(len(self.store.query("new", self.now - 60, self.now + 1, RAW)["values"]), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
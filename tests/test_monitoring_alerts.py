@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Monitoring Alerts Tests
+Notification dispatcher delivering to local HTTP and SMTP stand-ins
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+import unittest
+import socketserver
+from email import message_from_bytes
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from support import scratch_dir
+from monitoring_alerts import MonitoringAlerts, NotificationDispatcher
+
+
+class WebhookStandIn(ThreadingHTTPServer):
+    """Records POSTed JSON bodies; answers 500 to the first `failures` requests"""
+
+    def __init__(self, failures=0):
+        super().__init__(("127.0.0.1", 0), WebhookHandler)
+        self.failures = failures
+        self.bodies = []
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}/hook"
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.server.failures > 0:
+            self.server.failures -= 1
+            self.send_response(500)
+        else:
+            self.server.bodies.append(json.loads(body))
+            self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    """Accepts SMTP sessions and keeps the DATA of every message"""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SMTPHandler)
+        self.messages = []
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+
+    def reply(self, line):
+        self.wfile.write(line.encode("ascii") + b"\r\n")
+
+    def handle(self):
+        self.reply("220 localhost stand-in")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode("ascii", "replace").strip().upper()
+            if command.startswith(("EHLO", "HELO")):
+                self.reply("250 localhost")
+            elif command == "DATA":
+                self.reply("354 end with <CRLF>.<CRLF>")
+                data = b""
+                for data_line in iter(self.rfile.readline, b""):
+                    if data_line == b".\r\n":
+                        break
+                    data += data_line[1:] if data_line.startswith(b"..") else data_line
+                self.server.messages.append(message_from_bytes(data))
+                self.reply("250 queued")
+            elif command == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("250 ok")
+
+
+def stop_server(server):
+    server.shutdown()
+    server.server_close()
+
+
+class AlertsCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.alerts = MonitoringAlerts()
+        cls.alerts.alerts_database = os.path.join(scratch_dir("alerts"), "monitoring_alerts.db")
+        cls.alerts.setup_database()
+
+    def setUp(self):
+        self.alerts.dispatcher.stop()
+        self.alerts.dispatcher = NotificationDispatcher(
+            senders={"email": self.alerts.send_email_notification, "webhook": self.alerts.send_webhook_notification},
+            on_result=self.alerts.record_deliveries,
+            concurrency={"email": 2, "webhook": 4},
+            backoff_base=0.01, backoff_max=0.05, max_attempts=3, digest_interval=3600
+        )
+        self.alerts.alert_channels = {"console": False, "log": False, "email": False, "webhook": False}
+
+    def tearDown(self):
+        self.alerts.dispatcher.stop()
+
+    def notify(self, alert_id, level="critical"):
+        self.alerts.send_notifications(alert_id, "ops", "high_cpu", level, f"CPU high ({alert_id})")
+
+    def deliveries(self, alert_id, columns="channel, status"):
+        conn = sqlite3.connect(self.alerts.alerts_database)
+        rows = conn.execute(f"SELECT {columns} FROM notification_log WHERE alert_id = ? ORDER BY id",
+                            (alert_id,)).fetchall()
+        conn.close()
+        return rows
+
+
+class TestWebhook(AlertsCase):
+
+    def start_webhook(self, failures=0):
+        server = WebhookStandIn(failures)
+        self.addCleanup(stop_server, server)
+        self.alerts.notification_settings["webhook"]["url"] = server.url
+        self.alerts.alert_channels["webhook"] = True
+        return server
+
+    def test_critical_alert_is_posted(self):
+        server = self.start_webhook()
+        self.notify("w1")
+        self.assertTrue(self.alerts.dispatcher.flush(10))
+        self.assertEqual(server.bodies[0]["alerts"][0]["alert_id"], "w1")
+        self.assertFalse(server.bodies[0]["digest"])
+        self.assertEqual(self.deliveries("w1"), [("webhook", "success")])
+
+    def test_failed_delivery_is_retried(self):
+        server = self.start_webhook(failures=1)
+        self.notify("w2")
+        self.assertTrue(self.alerts.dispatcher.flush(10))
+        self.assertEqual(len(server.bodies), 1)
+        self.assertEqual(self.alerts.dispatcher.get_stats()["retried"], 1)
+        time.sleep(0.1)  # retry reports are written from the executor
+        self.assertEqual(self.deliveries("w2"), [("webhook", "retry"), ("webhook", "success")])
+
+    def test_gives_up_after_max_attempts(self):
+        server = self.start_webhook(failures=10)
+        self.notify("w3")
+        self.assertTrue(self.alerts.dispatcher.flush(10))
+        time.sleep(0.1)
+        self.assertEqual(server.bodies, [])
+        self.assertEqual(self.alerts.dispatcher.get_stats()["failed"], 1)
+        self.assertEqual([status for _, status in self.deliveries("w3")], ["retry", "retry", "failed"])
+
+    def test_warnings_are_sent_as_one_digest(self):
+        server = self.start_webhook()
+        for alert_id in ("d1", "d2", "d3"):
+            self.notify(alert_id, level="warning")
+        time.sleep(0.1)
+        self.assertEqual(server.bodies, [])
+        self.assertEqual(self.alerts.dispatcher.get_stats()["pending_digest"]["webhook"], 3)
+
+        self.assertTrue(self.alerts.dispatcher.flush(10))
+        self.assertEqual(len(server.bodies), 1)
+        self.assertTrue(server.bodies[0]["digest"])
+        self.assertEqual([alert["alert_id"] for alert in server.bodies[0]["alerts"]], ["d1", "d2", "d3"])
+
+    def test_unconfigured_webhook_is_skipped(self):
+        self.alerts.alert_channels["webhook"] = True
+        self.alerts.notification_settings["webhook"]["url"] = None
+        self.notify("w4")
+        self.assertTrue(self.alerts.dispatcher.flush(10))
+        self.assertEqual(self.deliveries("w4"), [("webhook", "skipped")])
+
+
+class TestEmail(AlertsCase):
+
+    def setUp(self):
+        super().setUp()
+        self.smtp = SMTPStandIn()
+        self.addCleanup(stop_server, self.smtp)
+        self.alerts.notification_settings["email"].update(
+            smtp_host="127.0.0.1", smtp_port=self.smtp.server_address[1], to=["ops@example.com"])
+        self.alerts.alert_channels["email"] = True
+
+    def tearDown(self):
+        super().tearDown()
+        self.alerts.notification_settings["email"]["to"] = []
+
+    def test_critical_alert_is_mailed(self):
+        self.notify("e1")
+        self.assertTrue(self.alerts.dispatcher.flush(10))
+        [message] = self.smtp.messages
+        self.assertEqual(message["Subject"], "[CRITICAL] high_cpu on agent ops")
+        self.assertEqual(message["To"], "ops@example.com")
+        self.assertEqual(self.deliveries("e1"), [("email", "success")])
+
+    def test_digest_is_one_message(self):
+        self.notify("e2", level="info")
+        self.notify("e3", level="warning")
+        self.assertTrue(self.alerts.dispatcher.flush(10))
+        [message] = self.smtp.messages
+        self.assertEqual(message["Subject"], "ZombieCoder alert digest: 2 alerts")
+        self.assertIn("(digest of 2)", self.deliveries("e2", "message")[0][0])
+
+
+class TestDispatcher(unittest.TestCase):
+
+    def test_channel_concurrency_limit(self):
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def slow_sender(notifications):
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.05)
+            with lock:
+                active.pop()
+
+        dispatcher = NotificationDispatcher(senders={"webhook": slow_sender}, concurrency={"webhook": 2})
+        for i in range(8):
+            dispatcher.enqueue("webhook", {"alert_id": i, "alert_level": "critical"})
+        self.assertTrue(dispatcher.stop(10))
+        self.assertEqual(max(peak), 2)
+        self.assertEqual(dispatcher.stats["sent"], 8)
+
+    def test_full_queue_drops(self):
+        release = threading.Event()
+        dispatcher = NotificationDispatcher(senders={"log": lambda notifications: release.wait(5) and None},
+                                            queue_size=1)
+        dispatcher.enqueue("log", {"alert_id": 0, "alert_level": "error"})
+        time.sleep(0.1)  # the only worker is now blocked in the sender
+        for i in range(1, 4):
+            dispatcher.enqueue("log", {"alert_id": i, "alert_level": "error"})
+        time.sleep(0.1)
+        release.set()
+        dispatcher.stop(10)
+        self.assertEqual(dispatcher.stats["dropped"], 2)
+        self.assertEqual(dispatcher.stats["sent"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Multi-Project Manager Tests
+Project suggestions and write-behind persistence of the project table
+"""
+
+import os
+import unittest
+
+from support import scratch_dir
+from multi_project_manager import MultiProjectManager
+
+
+class TestProjectSuggestions(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = scratch_dir("projects")
+        self.config_file = os.path.join(self.directory, "config.json")
+        self.manager = MultiProjectManager(config_file=self.config_file)
+        self.paths = {}
+        for name in ("payment-gateway", "analytics-dashboard", "mobile-shop"):
+            path = self.paths[name] = os.path.join(self.directory, name)
+            os.makedirs(path)
+            self.manager.assign_project(path)
+
+    def names(self, manager, query):
+        return [suggestion["name"] for suggestion in manager.get_project_suggestions(query)]
+
+    def test_prefix_and_typo(self):
+        self.assertEqual(self.names(self.manager, "paym")[0], "payment-gateway")
+        self.assertEqual(self.names(self.manager, "dashbaord")[0], "analytics-dashboard")
+        self.assertEqual(self.names(self.manager, "zzzz"), [])
+
+    def test_suggestions_after_restart(self):
+        """A fresh manager loads the saved projects before answering from the index"""
+        self.manager.flush_projects()
+        restarted = MultiProjectManager(config_file=self.config_file)
+        self.assertEqual(self.names(restarted, "mobile")[0], "mobile-shop")
+
+    def test_removed_project_is_not_suggested(self):
+        self.manager.remove_project(self.paths["mobile-shop"])
+        self.assertNotIn("mobile-shop", self.names(self.manager, "mobile"))
+
+    def test_rebuild_swaps_in_a_new_index(self):
+        """An index a reader already holds is never refilled underneath it"""
+        index = self.manager.suggestion_index
+        before = index.score("pay")
+        extra = os.path.join(self.directory, "payroll")
+        os.makedirs(extra)
+        self.manager.assign_project(extra)
+
+        self.assertEqual(index.score("pay"), before)
+        self.assertIsNot(self.manager.suggestion_index, index)
+        self.assertIn(extra, self.manager.suggestion_index.score("pay"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Performance Tuner Tests
+Windowed anomaly detection (z-score, trend to limit, seasonal shift) over stored metric history
+"""
+
+import os
+import time
+import unittest
+
+import numpy as np
+
+from support import scratch_dir
+from metrics_store import MetricsStore
+from performance_tuner import PerformanceTuner
+
+
+class AnomalyCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tuner = PerformanceTuner()
+
+    def setUp(self):
+        self.store = MetricsStore(os.path.join(scratch_dir("metrics"), "metrics.db"), flush_interval=3600,
+                                  flush_size=10 ** 6)
+        self.tuner.metrics_store = self.store
+        self.now = (time.time() // 60) * 60
+        self.rng = np.random.default_rng(0)
+
+    def history(self, agent_id, metric, values, end=None):
+        """One sample per minute, the last one in the newest bucket before end"""
+        end = self.now if end is None else end
+        for i, value in enumerate(values):
+            timestamp = end - (len(values) - i) * 60 + 30
+            self.store.record(f"performance.{agent_id}.{metric}", value, timestamp)
+        self.store.flush()
+
+    def flat(self, level, minutes=120):
+        return level + self.rng.normal(0, 0.5, minutes)
+
+    def detect(self, agent_ids=("ops",)):
+        return self.tuner.detect_anomalies(list(agent_ids), now=self.now)
+
+
+class TestDetectAnomalies(AnomalyCase):
+
+    def test_steady_metrics_are_quiet(self):
+        self.history("ops", "cpu_usage", self.flat(30))
+        self.history("ops", "memory_usage", self.flat(50))
+        self.assertEqual(self.detect(), {})
+
+    def test_too_little_history_is_ignored(self):
+        self.history("ops", "cpu_usage", [30] * 5 + [99])
+        self.assertEqual(self.detect(), {})
+
+    def test_spike_below_the_limit(self):
+        self.history("ops", "cpu_usage", np.append(self.flat(30, 119), 70))
+        [finding] = self.detect()["ops"]
+        self.assertEqual(finding["type"], "cpu_optimization")
+        self.assertEqual(finding["priority"], "high")
+        self.assertIn("σ from baseline", finding["description"])
+
+    def test_slow_memory_climb_is_a_suspected_leak(self):
+        self.history("ops", "memory_usage", np.linspace(51.2, 75, 120))
+        [finding] = self.detect()["ops"]
+        self.assertEqual(finding["type"], "memory_leak_suspected")
+        self.assertEqual(finding["action"], "optimize_memory_usage")
+        self.assertIn("reaches 85.0", finding["description"])
+
+    def test_past_limit_and_low_score(self):
+        self.history("ops", "disk_usage", self.flat(95))
+        self.history("ops", "performance_score", self.flat(40))
+        findings = {finding["metric"]: finding for finding in self.detect()["ops"]}
+        self.assertEqual(set(findings), {"disk_usage", "performance_score"})
+        self.assertTrue(all("past limit" in finding["description"] for finding in findings.values()))
+
+    def test_shift_from_yesterday(self):
+        self.history("ops", "cpu_usage", self.flat(10, 30), end=self.now - 86400)
+        self.history("ops", "cpu_usage", self.flat(40))
+        [finding] = self.detect()["ops"]
+        self.assertIn("from this time yesterday", finding["description"])
+
+    def test_agents_are_ranked_independently(self):
+        self.history("ops", "cpu_usage", self.flat(30))
+        self.history("verifier", "disk_usage", self.flat(99))
+        self.history("verifier", "memory_usage", np.append(self.flat(40, 119), 60))
+        anomalies = self.detect(("ops", "verifier"))
+        self.assertEqual(list(anomalies), ["verifier"])
+        scores = [finding["score"] for finding in anomalies["verifier"]]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+
+class TestAnalyzePerformance(AnomalyCase):
+
+    metrics = {"cpu_usage": 85.0, "memory_usage": 40.0, "disk_usage": 50.0, "performance_score": 70.0}
+
+    def test_thresholds_without_history(self):
+        [recommendation] = self.tuner.analyze_performance("ops", self.metrics, anomalies={})
+        self.assertEqual((recommendation["action"], recommendation["score"]), ("optimize_cpu_usage", 2.0))
+
+    def test_stronger_finding_replaces_the_threshold_check(self):
+        self.history("ops", "cpu_usage", np.append(self.flat(30, 119), 85))
+        self.history("ops", "memory_usage", np.linspace(51.2, 75, 120))
+        recommendations = self.tuner.analyze_performance("ops", self.metrics)
+
+        self.assertEqual([rec["action"] for rec in recommendations], ["optimize_cpu_usage", "optimize_memory_usage"])
+        self.assertGreater(recommendations[0]["score"], 2.0)
+        self.assertEqual(recommendations[1]["type"], "memory_leak_suspected")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Task Scheduler Tests
+Frequencies, catch-up policies after downtime and queued runs under run_all
+"""
+
+import os
+import time
+import threading
+import unittest
+from datetime import datetime
+
+from support import scratch_dir
+from task_scheduler import TaskScheduler
+
+
+class TestSlots(unittest.TestCase):
+
+    def setUp(self):
+        self.scheduler = TaskScheduler()
+
+    def test_frequency_interval(self):
+        self.assertEqual(self.scheduler.frequency_interval("hourly"), 3600)
+        self.assertEqual(self.scheduler.frequency_interval("every_15_minutes"), 900)
+        self.assertEqual(self.scheduler.frequency_interval("every_2_days"), 172800)
+        self.assertIsNone(self.scheduler.frequency_interval("fortnightly"))
+        self.assertIsNone(self.scheduler.frequency_interval(None))
+
+    def test_catch_up_policies(self):
+        now = 10000.0
+        expected = {"run_once": 10000.0, "skip": 10060.0, "run_all": 9820.0}
+        for policy, slot in expected.items():
+            self.scheduler.catchup_policy = policy
+            self.assertEqual(self.scheduler.catch_up_slot(9820.0, 60, now), slot, policy)
+
+    def test_run_all_is_capped(self):
+        self.scheduler.catchup_policy = "run_all"
+        self.scheduler.max_catchup_runs = 3
+        self.assertEqual(self.scheduler.catch_up_slot(0.0, 60, 6000.0), 5880.0)
+
+
+class TestMissedRuns(unittest.TestCase):
+    """A minutely task that was due 150 s ago has missed three slots"""
+
+    def run_missed(self, policy):
+        scheduler = TaskScheduler(catchup_policy=policy)
+        scheduler.scheduler_database = os.path.join(scratch_dir("scheduler"), "task_scheduler.db")
+        scheduler.setup_database()
+        scheduler.jitter_ratio = 0
+
+        runs = []
+        active = []
+        overlaps = []
+        lock = threading.Lock()
+
+        def execute_task(task_id, agent_id, task_name, task_type, task_data):
+            with lock:
+                active.append(task_id)
+                overlaps.append(len(active))
+                runs.append(time.time())
+            time.sleep(0.05)
+            with lock:
+                active.remove(task_id)
+
+        scheduler.execute_task = execute_task
+        scheduler.start_scheduler()
+        due = datetime.fromtimestamp(time.time() - 150).isoformat()
+        scheduler.add_to_scheduler("t1", "ops", "Missed task", "generic", {}, "every_1_minutes", next_run=due)
+        time.sleep(0.5)
+        scheduler.stop_scheduler()
+
+        self.assertEqual(max(overlaps, default=0), min(len(runs), 1))
+        self.assertEqual(scheduler.pending_runs, {})
+        self.assertGreater(scheduler.scheduled_tasks["t1"]["slot"], time.time())
+        return len(runs)
+
+    def test_run_all_replays_every_missed_slot_in_turn(self):
+        self.assertEqual(self.run_missed("run_all"), 3)
+
+    def test_run_once(self):
+        self.assertEqual(self.run_missed("run_once"), 1)
+
+    def test_skip(self):
+        self.assertEqual(self.run_missed("skip"), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Terminal Chat Integration Tests
+Async command executor: streamed output, concurrency limit, timeouts and cancellation
+"""
+
+import os
+import time
+import sqlite3
+import unittest
+
+from support import scratch_dir
+from terminal_chat_integration import CommandExecutor, TerminalChatIntegration
+
+
+class ExecutorCase(unittest.TestCase):
+
+    def executor(self, **options):
+        executor = CommandExecutor(**options)
+        self.addCleanup(executor.stop)
+        return executor
+
+
+class TestCommandExecutor(ExecutorCase):
+
+    def test_output_is_streamed_and_captured(self):
+        lines = []
+        result = self.executor().submit(
+            1, "printf 'one\\ntwo\\n'; echo oops >&2; exit 3",
+            on_output=lambda command_id, agent_id, stream, line: lines.append((stream, line))).result(10)
+
+        self.assertEqual((result["status"], result["return_code"]), ("success", 3))
+        self.assertEqual(result["result"], "one\ntwo\n")
+        self.assertEqual(result["error"], "oops\n")
+        self.assertEqual(sorted(lines), [("stderr", "oops"), ("stdout", "one"), ("stdout", "two")])
+
+    def test_concurrency_limit(self):
+        executor = self.executor(concurrency=2)
+        start = time.time()
+        futures = [executor.submit(i, "sleep 0.3") for i in range(4)]
+        results = [future.result(10) for future in futures]
+        elapsed = time.time() - start
+
+        self.assertTrue(all(result["status"] == "success" for result in results))
+        self.assertGreaterEqual(elapsed, 0.6)
+        self.assertLess(elapsed, 1.2)
+
+    def test_timeout_kills_the_process_group(self):
+        start = time.time()
+        result = self.executor().submit(1, "echo started; sleep 5 & sleep 5; wait", timeout=0.3).result(10)
+        self.assertEqual(result["status"], "timeout")
+        self.assertEqual(result["result"], "started\n")
+        self.assertIn("exceeded 0.3 seconds", result["error"])
+        self.assertLess(time.time() - start, 3)
+
+    def test_cancel_running_and_queued(self):
+        executor = self.executor(concurrency=1)
+        running = executor.submit(1, "sleep 5")
+        queued = executor.submit(2, "echo never")
+        time.sleep(0.2)
+        self.assertEqual(executor.running(), [1, 2])
+
+        self.assertTrue(executor.cancel(2))
+        self.assertTrue(executor.cancel(1))
+        self.assertEqual(queued.result(10)["started_at"], None)
+        self.assertEqual(queued.result()["status"], "cancelled")
+        self.assertEqual(running.result(10)["status"], "cancelled")
+        self.assertFalse(executor.cancel(1))
+
+    def test_output_is_capped(self):
+        result = self.executor(max_output=10).submit(1, "head -c 1000 /dev/zero | tr '\\0' x").result(10)
+        self.assertTrue(result["result"].startswith("x" * 10 + "\n[output truncated, 990 more characters]"))
+
+    def test_bad_working_directory_is_an_error(self):
+        result = self.executor().submit(1, "true", cwd=os.path.join(scratch_dir("cwd"), "missing")).result(10)
+        self.assertEqual((result["status"], result["return_code"]), ("error", -1))
+
+
+class TestTerminalCommands(unittest.TestCase):
+
+    def setUp(self):
+        self.integration = TerminalChatIntegration()
+        self.integration.chat_database = os.path.join(scratch_dir("chat"), "terminal_chat.db")
+        self.integration.create_chat_database()
+        self.addCleanup(self.integration.command_executor.stop)
+
+    def test_result_is_recorded_by_command_id(self):
+        for _ in range(2):
+            result = self.integration.process_terminal_command("ops", "echo hi")
+        self.assertEqual(result["result"], "hi\n")
+
+        conn = sqlite3.connect(self.integration.chat_database)
+        rows = conn.execute("SELECT command, status, result, return_code FROM terminal_commands ORDER BY id").fetchall()
+        conn.close()
+        self.assertEqual(rows, [("echo hi", "completed", "hi\n", 0)] * 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Workstation Sync Tests
+Outbox batching against a live main server, high-water-mark acks and batch validation
+"""
+
+import os
+import gzip
+import json
+import sqlite3
+import threading
+import unittest
+
+import requests
+from werkzeug.serving import make_server
+
+from support import scratch_dir
+from main_server_integration import MainServerIntegration
+from workstation_integration import WorkstationIntegration
+
+
+def event(seq, data=None, event_type="workstation_update"):
+    return {"seq": seq, "timestamp": "2026-01-01T00:00:00", "agent_id": "ops",
+            "event_type": event_type, "data": data or {"n": seq}}
+
+
+class SyncCase(unittest.TestCase):
+
+    def setUp(self):
+        directory = scratch_dir("sync")
+        self.server = MainServerIntegration()
+        self.server.sync_database = os.path.join(directory, "server_sync.db")
+        self.server.create_sync_database()
+
+    def stored(self):
+        conn = sqlite3.connect(self.server.sync_database)
+        rows = conn.execute("SELECT update_data FROM workstation_updates ORDER BY id").fetchall()
+        conn.close()
+        return [json.loads(data)["n"] for (data,) in rows]
+
+
+class TestStoreSyncBatch(SyncCase):
+
+    def test_overlapping_batches_are_stored_once(self):
+        first = self.server.store_sync_batch("stream", "ws", [event(1), event(2), event(3)])
+        self.assertEqual((first["acked_seq"], first["accepted"], first["duplicates"]), (3, 3, 0))
+
+        retried = self.server.store_sync_batch("stream", "ws", [event(2), event(3), event(4)])
+        self.assertEqual((retried["acked_seq"], retried["accepted"], retried["duplicates"]), (4, 1, 2))
+        self.assertEqual(self.stored(), [1, 2, 3, 4])
+
+    def test_streams_are_independent(self):
+        self.server.store_sync_batch("a", "ws", [event(1), event(2)])
+        self.assertEqual(self.server.store_sync_batch("b", "ws", [event(1)])["accepted"], 1)
+        self.assertEqual({s["stream_id"]: s["acked_seq"] for s in self.server.get_sync_streams()}, {"a": 2, "b": 1})
+
+    def test_input_and_output_events_go_to_sync_data(self):
+        self.server.store_sync_batch("stream", "ws", [event(1, event_type="input"), event(2)])
+        conn = sqlite3.connect(self.server.sync_database)
+        self.assertEqual(conn.execute("SELECT data_type FROM sync_data").fetchall(), [("input",)])
+        conn.close()
+
+    def test_validation(self):
+        validate = self.server.validate_sync_batch
+        self.assertIsNone(validate({"stream_id": "s", "events": [event(1)]}))
+        self.assertIsNotNone(validate([]))
+        self.assertIsNotNone(validate({"events": []}))
+        self.assertIsNotNone(validate({"stream_id": "s", "events": {}}))
+        self.assertIsNotNone(validate({"stream_id": "s", "events": [dict(event(1), seq=0)]}))
+        self.assertIsNotNone(validate({"stream_id": "s", "events": [dict(event(1), seq=True)]}))
+        self.assertIsNotNone(validate({"stream_id": "s", "events": [dict(event(1), agent_id="")]}))
+
+    def test_endpoint_rejects_malformed_batches(self):
+        client = self.server.app.test_client()
+        gzip_headers = {"Content-Encoding": "gzip"}
+        self.assertEqual(client.post("/workstation/sync", data=b"not gzip", headers=gzip_headers).status_code, 400)
+        bad_seq = {"stream_id": "s", "events": [dict(event(1), seq="1")]}
+        self.assertEqual(client.post("/workstation/sync", data=json.dumps(bad_seq)).status_code, 400)
+        self.assertEqual(self.stored(), [])
+
+        body = gzip.compress(json.dumps({"stream_id": "s", "events": [event(1)]}).encode("utf-8"))
+        response = client.post("/workstation/sync", data=body, headers=gzip_headers)
+        self.assertEqual(response.get_json()["acked_seq"], 1)
+
+
+class TestOutbox(SyncCase):
+    """A workstation shipping its outbox to a main server on a local port"""
+
+    def setUp(self):
+        super().setUp()
+        self.http = make_server("127.0.0.1", 0, self.server.app)
+        threading.Thread(target=self.http.serve_forever, daemon=True).start()
+
+        self.workstation = WorkstationIntegration()
+        self.workstation.sync_database = os.path.join(scratch_dir("outbox"), "workstation_sync.db")
+        self.workstation.setup_sync_database()
+        self.workstation.main_server_url = f"http://127.0.0.1:{self.http.server_port}"
+        self.workstation.sync_batch_size = 2
+
+    def tearDown(self):
+        self.http.shutdown()
+        self.http.server_close()
+
+    def queue(self, *values):
+        for value in values:
+            self.workstation.sync_with_main_server("ops", {"n": value})
+
+    def test_flush_sends_batches_and_empties_the_outbox(self):
+        self.queue(1, 2, 3, 4, 5)
+        self.assertTrue(self.workstation.flush_sync_outbox())
+
+        status = self.workstation.get_sync_status()
+        self.assertEqual((status["pending_events"], status["batches_sent"], status["acked_seq"]), (0, 3, 5))
+        self.assertEqual(self.stored(), [1, 2, 3, 4, 5])
+
+    def test_lost_acknowledgement_does_not_duplicate_events(self):
+        self.queue(1, 2)
+        post = self.workstation.sync_session.post
+        calls = []
+
+        def drop_first_response(*args, **kwargs):
+            response = post(*args, **kwargs)
+            calls.append(response.status_code)
+            if len(calls) == 1:
+                raise requests.ConnectionError("response lost")
+            return response
+
+        self.workstation.sync_session.post = drop_first_response
+        self.assertFalse(self.workstation.flush_sync_outbox())
+        self.assertEqual(self.workstation.get_sync_status()["pending_events"], 2)
+
+        self.queue(3)
+        self.workstation.sync_batch_size = 10
+        self.assertTrue(self.workstation.flush_sync_outbox())
+        self.assertEqual(self.stored(), [1, 2, 3])
+        self.assertEqual(self.workstation.sync_stats["duplicates"], 2)
+        self.assertEqual(self.workstation.get_sync_status()["pending_events"], 0)
+
+    def test_unreachable_server_keeps_events(self):
+        self.queue(1)
+        self.workstation.main_server_url = "http://127.0.0.1:9"
+        self.workstation.sync_timeout = (1, 1)
+        self.assertFalse(self.workstation.flush_sync_outbox())
+        self.assertEqual(self.workstation.sync_stats["consecutive_failures"], 1)
+        self.assertEqual(self.workstation.get_sync_status()["pending_events"], 1)
+
+    def test_restart_resumes_the_same_stream(self):
+        self.queue(1)
+        self.workstation.flush_sync_outbox()
+        restarted = WorkstationIntegration()
+        restarted.sync_database = self.workstation.sync_database
+        restarted.setup_sync_database()
+        self.assertEqual(restarted.sync_stream_id, self.workstation.sync_stream_id)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -8,12 +8,252 @@ import json
 import time
 import threading
 from datetime import datetime, timedelta
-import sqlite3
 import os
 import subprocess
 import psutil
 import requests
 import re
+import mmap
+import struct
+import ctypes
+import ctypes.util
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "shared"))
+import workspace_db
+
+# inotify event masks (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+INOTIFY_EVENT = struct.Struct("iIII")
+
+class LogTailer:
+    """Read only the bytes appended to log files since the last poll
+    
+    Offsets are persisted per path together with the file's inode, so a
+    restart resumes where it stopped and a rotated or truncated file is
+    detected. When inotify is available, files without events since the
+    last poll are skipped without touching them; otherwise each poll is
+    one stat() per file. Large catch-up reads go through mmap.
+    """
+    
+    def __init__(self, paths, state_database, initial_tail_bytes=16384,
+                 mmap_threshold=1024 * 1024, max_catchup_bytes=8 * 1024 * 1024):
+        self.paths = list(paths)
+        self.state_database = state_database
+        self.initial_tail_bytes = initial_tail_bytes
+        self.mmap_threshold = mmap_threshold
+        self.max_catchup_bytes = max_catchup_bytes
+        self.offsets = {}  # path -> {"inode", "device", "offset"}
+        self.dirty = False
+        self.stats = {"polls": 0, "bytes_read": 0, "mmap_reads": 0, "skipped_bytes": 0, "rotations": 0}
+        
+        self.inotify_fd = None
+        self.watches = {}  # watch descriptor -> directory
+        self.changed = set(self.paths)
+        
+        self.setup_database()
+        self.load_offsets()
+        self.start_watching()
+    
+    def setup_database(self):
+        conn = workspace_db.connect(self.state_database)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS log_offsets (
+                path TEXT PRIMARY KEY,
+                inode INTEGER NOT NULL,
+                device INTEGER NOT NULL,
+                offset INTEGER NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        ''')
+        
+        conn.commit()
+        conn.close()
+    
+    def load_offsets(self):
+        conn = workspace_db.connect(self.state_database)
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT path, inode, device, offset FROM log_offsets")
+        for path, inode, device, offset in cursor.fetchall():
+            self.offsets[path] = {"inode": inode, "device": device, "offset": offset}
+        
+        conn.close()
+    
+    def save_offsets(self):
+        """Persist current offsets (one transaction for all files)"""
+        if not self.dirty:
+            return
+        conn = workspace_db.connect(self.state_database)
+        cursor = conn.cursor()
+        
+        cursor.executemany('''
+            INSERT OR REPLACE INTO log_offsets (path, inode, device, offset, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [
+            (path, state["inode"], state["device"], state["offset"], datetime.now().isoformat())
+            for path, state in self.offsets.items()
+        ])
+        
+        conn.commit()
+        conn.close()
+        self.dirty = False
+    
+    def start_watching(self):
+        """Watch the directories holding the logs with inotify (Linux only)"""
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd < 0:
+                return
+        except (OSError, AttributeError):
+            return
+        
+        mask = IN_MODIFY | IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO
+        for directory in {os.path.dirname(os.path.abspath(path)) for path in self.paths}:
+            wd = libc.inotify_add_watch(fd, directory.encode(), mask)
+            if wd >= 0:
+                self.watches[wd] = directory
+        
+        if self.watches:
+            self.inotify_fd = fd
+        else:
+            os.close(fd)
+    
+    def watched(self, path):
+        return os.path.dirname(os.path.abspath(path)) in self.watches.values()
+    
+    def drain_events(self):
+        """Collect paths with inotify events since the last poll"""
+        if self.inotify_fd is None:
+            return
+        while True:
+            try:
+                data = os.read(self.inotify_fd, 65536)
+            except BlockingIOError:
+                return
+            position = 0
+            while position < len(data):
+                wd, mask, _, name_length = INOTIFY_EVENT.unpack_from(data, position)
+                name = data[position + INOTIFY_EVENT.size:position + INOTIFY_EVENT.size + name_length]
+                position += INOTIFY_EVENT.size + name_length
+                if mask & IN_Q_OVERFLOW:
+                    self.changed.update(self.paths)
+                elif wd in self.watches:
+                    self.changed.add(os.path.join(self.watches[wd], name.rstrip(b"\0").decode(errors="replace")))
+    
+    def poll(self):
+        """Return {path: bytes} of complete new lines for every tracked file"""
+        self.stats["polls"] += 1
+        self.drain_events()
+        changed, self.changed = self.changed, set()
+        
+        updates = {}
+        for path in self.paths:
+            if (path in self.offsets and self.watched(path) and
+                    os.path.abspath(path) not in changed and path not in changed):
+                updates[path] = b""
+                continue
+            updates[path] = self.read_new(path)
+        return updates
+    
+    def read_new(self, path):
+        """Read complete lines appended to path since the stored offset"""
+        try:
+            info = os.stat(path)
+        except OSError:
+            return b""
+        
+        state = self.offsets.get(path)
+        chunks = []
+        
+        if state is None:
+            # First sight: start near the end instead of replaying the whole history
+            offset = max(0, info.st_size - self.initial_tail_bytes)
+            start_at_line = offset > 0
+        elif (state["inode"], state["device"]) != (info.st_ino, info.st_dev):
+            # Rotated: finish the old file if it was renamed next to the new one
+            self.stats["rotations"] += 1
+            rotated = path + ".1"
+            try:
+                old = os.stat(rotated)
+                if (old.st_ino, old.st_dev) == (state["inode"], state["device"]):
+                    old_data, _ = self.read_range(rotated, state["offset"], old.st_size)
+                    chunks.append(old_data)
+            except OSError:
+                pass
+            offset, start_at_line = 0, False
+        elif info.st_size < state["offset"]:
+            # Truncated in place (copytruncate)
+            self.stats["rotations"] += 1
+            offset, start_at_line = 0, False
+        else:
+            offset, start_at_line = state["offset"], False
+        
+        if info.st_size - offset > self.max_catchup_bytes:
+            self.stats["skipped_bytes"] += info.st_size - self.max_catchup_bytes - offset
+            offset, start_at_line = info.st_size - self.max_catchup_bytes, True
+        
+        data, consumed = self.read_range(path, offset, info.st_size, start_at_line)
+        chunks.append(data)
+        new_state = {"inode": info.st_ino, "device": info.st_dev, "offset": offset + consumed}
+        if new_state != state:
+            self.offsets[path] = new_state
+            self.dirty = True
+        return b"".join(chunks)
+    
+    def read_range(self, path, start, end, start_at_line=False):
+        """Read whole lines in [start, end); returns (data, bytes consumed)
+        
+        An unreadable path (permissions, a directory, a file that vanished or
+        shrank since the stat) reads as nothing, so one bad log never aborts
+        the poll of the others; its offset stays put for the next poll.
+        """
+        if end <= start:
+            return b"", 0
+        
+        try:
+            return self.read_lines(path, start, end, start_at_line)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Cannot read log {path}: {e}")
+            return b"", 0
+    
+    def read_lines(self, path, start, end, start_at_line):
+        """read_range without the error handling"""
+        with open(path, "rb") as f:
+            if end - start >= self.mmap_threshold:
+                self.stats["mmap_reads"] += 1
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    end = min(end, len(mapped))
+                    last_newline = mapped.rfind(b"\n", start, end)
+                    first = mapped.find(b"\n", start, end) + 1 if start_at_line else start
+                    if last_newline < 0 or first > last_newline:
+                        return b"", 0
+                    data = mapped[first:last_newline + 1]
+            else:
+                f.seek(start)
+                data = f.read(end - start)
+                last_newline = data.rfind(b"\n")
+                if last_newline < 0:
+                    return b"", 0
+                first = data.find(b"\n") + 1 if start_at_line else 0
+                data = data[first:last_newline + 1]
+                last_newline += start
+        
+        self.stats["bytes_read"] += len(data)
+        return data, last_newline + 1 - start
+    
+    def close(self):
+        if self.inotify_fd is not None:
+            os.close(self.inotify_fd)
+            self.inotify_fd = None
 
 class AutoFixScripts:
     def __init__(self):
@@ -38,11 +278,27 @@ class AutoFixScripts:
             "process_error": "fix_process_issue",
             "service_error": "fix_service_issue"
         }
+        self.log_files = {
+            "system_log": "/var/log/syslog",
+            "agent_work_log": "logs/agent_work.log",
+            "agent_error_log": "logs/agent_error.log"
+        }
+        # One combined pattern finds candidate lines in a single pass; per-type patterns classify them
+        self.compiled_error_patterns = {
+            error_type: re.compile(pattern.encode(), re.IGNORECASE)
+            for error_type, pattern in self.error_patterns.items()
+        }
+        self.error_scanner = re.compile(
+            b"|".join(b"(?:" + pattern.encode() + b")" for pattern in self.error_patterns.values()),
+            re.IGNORECASE
+        )
+        self.log_updates = None
         self.setup_database()
+        self.log_tailer = LogTailer(self.log_files.values(), self.autofix_database)
         
     def setup_database(self):
         """Setup auto-fix database"""
-        conn = sqlite3.connect(self.autofix_database)
+        conn = workspace_db.connect(self.autofix_database)
         cursor = conn.cursor()
         
         # Create error detection table
@@ -92,17 +348,54 @@ class AutoFixScripts:
         conn.close()
         print("✅ Auto-fix database created successfully")
     
+    def poll_logs(self):
+        """Read what was appended to the watched logs since the last poll"""
+        updates = self.log_tailer.poll()
+        self.log_tailer.save_offsets()
+        self.log_updates = {name: updates.get(path, b"") for name, path in self.log_files.items()}
+        return self.log_updates
+    
+    def match_errors(self, data):
+        """Find lines matching any error pattern; returns [(line, [error_type, ...])]"""
+        matches = []
+        position = 0
+        while True:
+            match = self.error_scanner.search(data, position)
+            if not match:
+                break
+            line_start = data.rfind(b"\n", 0, match.start()) + 1
+            line_end = data.find(b"\n", match.end())
+            if line_end < 0:
+                line_end = len(data)
+            line = data[line_start:line_end]
+            error_types = [
+                error_type for error_type, pattern in self.compiled_error_patterns.items()
+                if pattern.search(line)
+            ]
+            matches.append((line.decode("utf-8", errors="replace").strip(), error_types))
+            position = line_end + 1
+        return matches
+    
     def detect_errors(self, agent_id):
         """Detect errors for specific agent"""
         errors_detected = []
         
-        # Check system logs
-        system_errors = self.check_system_logs(agent_id)
-        errors_detected.extend(system_errors)
+        # Outside an auto-fix cycle, read fresh lines for this call only
+        polled_here = self.log_updates is None
+        if polled_here:
+            self.poll_logs()
         
-        # Check agent logs
-        agent_errors = self.check_agent_logs(agent_id)
-        errors_detected.extend(agent_errors)
+        try:
+            # Check system logs
+            system_errors = self.check_system_logs(agent_id)
+            errors_detected.extend(system_errors)
+            
+            # Check agent logs
+            agent_errors = self.check_agent_logs(agent_id)
+            errors_detected.extend(agent_errors)
+        finally:
+            if polled_here:
+                self.log_updates = None
         
         # Check system resources
         resource_errors = self.check_system_resources(agent_id)
@@ -119,23 +412,15 @@ class AutoFixScripts:
         errors = []
         
         try:
-            # Check syslog for recent errors
-            result = subprocess.run([
-                "tail", "-n", "100", "/var/log/syslog"
-            ], capture_output=True, text=True, timeout=10)
-            
-            if result.returncode == 0:
-                log_lines = result.stdout.split('\n')
-                
-                for line in log_lines:
-                    for error_type, pattern in self.error_patterns.items():
-                        if re.search(pattern, line, re.IGNORECASE):
-                            errors.append({
-                                "error_type": error_type,
-                                "error_message": line.strip(),
-                                "error_source": "system_log",
-                                "severity": "medium"
-                            })
+            # Check new syslog lines since the last cycle
+            for line, error_types in self.match_errors(self.log_updates["system_log"]):
+                for error_type in error_types:
+                    errors.append({
+                        "error_type": error_type,
+                        "error_message": line,
+                        "error_source": "system_log",
+                        "severity": "medium"
+                    })
             
         except Exception as e:
             print(f"Error checking system logs: {str(e)}")
@@ -147,29 +432,19 @@ class AutoFixScripts:
         errors = []
         
         try:
-            # Check agent work log
-            log_file = f"logs/agent_work.log"
-            if os.path.exists(log_file):
-                with open(log_file, 'r') as f:
-                    log_lines = f.readlines()[-50:]  # Last 50 lines
-                
-                for line in log_lines:
-                    for error_type, pattern in self.error_patterns.items():
-                        if re.search(pattern, line, re.IGNORECASE):
-                            errors.append({
-                                "error_type": error_type,
-                                "error_message": line.strip(),
-                                "error_source": f"agent_{agent_id}_log",
-                                "severity": "high"
-                            })
-            
-            # Check agent error log
-            error_log_file = f"logs/agent_error.log"
-            if os.path.exists(error_log_file):
-                with open(error_log_file, 'r') as f:
-                    error_lines = f.readlines()[-20:]  # Last 20 lines
-                
-                for line in error_lines:
+            # Check new agent work log lines
+            for line, error_types in self.match_errors(self.log_updates["agent_work_log"]):
+                for error_type in error_types:
+                    errors.append({
+                        "error_type": error_type,
+                        "error_message": line,
+                        "error_source": f"agent_{agent_id}_log",
+                        "severity": "high"
+                    })
+            
+            # Every new agent error log line is an error
+            for line in self.log_updates["agent_error_log"].decode("utf-8", errors="replace").splitlines():
+                if line.strip():
                     errors.append({
                         "error_type": "agent_error",
                         "error_message": line.strip(),
@@ -259,7 +534,7 @@ class AutoFixScripts:
     
     def store_error_detection(self, agent_id, errors):
         """Store detected errors in database"""
-        conn = sqlite3.connect(self.autofix_database)
+        conn = workspace_db.connect(self.autofix_database)
         cursor = conn.cursor()
         
         for error in errors:
@@ -286,7 +561,7 @@ class AutoFixScripts:
         print(f"   🔧 Applying auto-fix for {error_type}: {error_message}")
         
         # Store fix action
-        conn = sqlite3.connect(self.autofix_database)
+        conn = workspace_db.connect(self.autofix_database)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -552,7 +827,7 @@ class AutoFixScripts:
     
     def update_fix_action(self, agent_id, error_type, fix_action, status, result, execution_time):
         """Update fix action status"""
-        conn = sqlite3.connect(self.autofix_database)
+        conn = workspace_db.connect(self.autofix_database)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -583,20 +858,27 @@ class AutoFixScripts:
             try:
                 print(f"🔍 Running auto-fix cycle... {datetime.now().strftime('%H:%M:%S')}")
                 
-                for agent_id in self.agents:
-                    # Detect errors
-                    errors = self.detect_errors(agent_id)
-                    
-                    if errors:
-                        print(f"   ⚠️ Detected {len(errors)} errors for agent {agent_id}")
-                        
-                        # Store errors
-                        self.store_error_detection(agent_id, errors)
+                # Read new log bytes once per cycle; every agent's checks share them
+                self.poll_logs()
+                
+                try:
+                    for agent_id in self.agents:
+                        # Detect errors
+                        errors = self.detect_errors(agent_id)
                         
-                        # Apply fixes
-                        for error in errors:
-                            if error["severity"] in ["high", "critical"]:
-                                self.apply_auto_fix(agent_id, error["error_type"], error["error_message"])
+                        if errors:
+                            print(f"   ⚠️ Detected {len(errors)} errors for agent {agent_id}")
+                            
+                            # Store errors
+                            self.store_error_detection(agent_id, errors)
+                            
+                            # Apply fixes
+                            for error in errors:
+                                if error["severity"] in ["high", "critical"]:
+                                    self.apply_auto_fix(agent_id, error["error_type"], error["error_message"])
+                finally:
+                    # These lines are handled; never report them again
+                    self.log_updates = None
                 
                 # Wait for next cycle
                 time.sleep(self.check_interval)
@@ -607,7 +889,7 @@ class AutoFixScripts:
     
     def get_autofix_status(self):
         """Get current auto-fix status"""
-        conn = sqlite3.connect(self.autofix_database)
+        conn = workspace_db.connect(self.autofix_database)
         cursor = conn.cursor()
         
         # Get error counts by type
@@ -655,6 +937,8 @@ class AutoFixScripts:
             "agents": self.agents,
             "check_interval": self.check_interval,
             "error_patterns": self.error_patterns,
+            "log_files": self.log_files,
+            "log_tailer": dict(self.log_tailer.stats, inotify=self.log_tailer.inotify_fd is not None),
             "fix_actions": self.fix_actions,
             "autofix_status": status,
             "system_status": "active"
@@ -6,26 +6,79 @@ Pump/Automation - Batch Job Processing for Repetitive Tasks
 
 import json
 import time
+import random
 import threading
+import multiprocessing
 from datetime import datetime, timedelta
-import sqlite3
 import os
+import sys
 import subprocess
-import queue
 import concurrent.futures
 
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "shared"))
+import workspace_db
+
+# Columns added to batch_jobs for the durable queue and pipelines (ALTERed into older databases)
+QUEUE_COLUMNS = {
+    "attempts": "INTEGER DEFAULT 0",
+    "max_attempts": "INTEGER DEFAULT 3",
+    "available_at": "REAL DEFAULT 0",
+    "lease_owner": "TEXT",
+    "lease_expires_at": "REAL",
+    "pipeline_id": "TEXT",
+    "stage": "TEXT"
+}
+
+# All transitive dependents of a job (used to cancel or reset the rest of a pipeline)
+DOWNSTREAM_JOBS_SQL = '''
+    WITH RECURSIVE downstream(job_id) AS (
+        SELECT job_id FROM batch_job_dependencies WHERE depends_on = ?
+        UNION
+        SELECT d.job_id FROM batch_job_dependencies d JOIN downstream ON d.depends_on = downstream.job_id
+    )
+    SELECT job_id FROM downstream
+'''
+
+# Blocked jobs whose dependencies have all completed
+READY_BLOCKED_JOBS_SQL = '''
+    UPDATE batch_jobs SET status = 'pending', available_at = ?
+    WHERE status = 'blocked' AND job_id IN ({candidates})
+      AND NOT EXISTS (
+          SELECT 1 FROM batch_job_dependencies d JOIN batch_jobs upstream ON upstream.job_id = d.depends_on
+          WHERE d.job_id = batch_jobs.job_id AND upstream.status != 'completed'
+      )
+'''
+
+def run_worker_process(batch_database, worker_name, stop_event, poll_interval=0.5):
+    """Entry point for process-mode workers (one BatchProcessor per process)"""
+    processor = BatchProcessor(batch_database, create_tables=False)
+    processor.stop_event = stop_event
+    processor.poll_interval = poll_interval
+    processor.worker_loop(worker_name)
+
 class BatchProcessor:
-    def __init__(self):
-        self.batch_database = "batch_processor.db"
+    def __init__(self, batch_database="batch_processor.db", create_tables=True):
+        self.batch_database = batch_database
         self.agents = ["programming", "bestpractices", "verifier", "conversational", "ops"]
-        self.batch_queue = queue.Queue()
         self.processing_threads = []
+        self.processing_processes = []
         self.max_workers = 3
-        self.setup_database()
+        self.worker_mode = "thread"
+        self.poll_interval = 0.5
+        self.lease_seconds = 60  # renewed by a heartbeat while the job runs; expired leases are re-queued
+        self.retry_base_delay = 5
+        self.retry_max_delay = 600
+        self.stop_event = threading.Event()
+        if create_tables:
+            self.setup_database()
+    
+    def get_connection(self):
+        """Open a connection to the job database (WAL allows concurrent workers)"""
+        return workspace_db.connect(self.batch_database)
         
     def setup_database(self):
         """Setup batch processor database"""
-        conn = sqlite3.connect(self.batch_database)
+        conn = self.get_connection()
         cursor = conn.cursor()
         
         # Create batch jobs table
@@ -43,9 +96,50 @@ class BatchProcessor:
                 started_at TEXT,
                 completed_at TEXT,
                 result TEXT,
-                error_message TEXT
+                error_message TEXT,
+                attempts INTEGER DEFAULT 0,
+                max_attempts INTEGER DEFAULT 3,
+                available_at REAL DEFAULT 0,
+                lease_owner TEXT,
+                lease_expires_at REAL,
+                pipeline_id TEXT,
+                stage TEXT
+            )
+        ''')
+        
+        # Upgrade databases created before the durable queue columns existed
+        cursor.execute("PRAGMA table_info(batch_jobs)")
+        existing_columns = {row[1] for row in cursor.fetchall()}
+        for column, definition in QUEUE_COLUMNS.items():
+            if column not in existing_columns:
+                cursor.execute(f"ALTER TABLE batch_jobs ADD COLUMN {column} {definition}")
+        
+        # Claim order: highest priority (lowest number) first, then oldest
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_batch_jobs_claim ON batch_jobs (status, priority, id)
+        ''')
+        
+        # Pipeline (DAG) definitions: a job runs once every job it depends on has completed
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS batch_pipelines (
+                pipeline_id TEXT PRIMARY KEY,
+                pipeline_name TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS batch_job_dependencies (
+                job_id TEXT NOT NULL,
+                depends_on TEXT NOT NULL,
+                PRIMARY KEY (job_id, depends_on)
             )
         ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_batch_job_dependencies_upstream ON batch_job_dependencies (depends_on)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_batch_jobs_pipeline ON batch_jobs (pipeline_id)
+        ''')
         
         # Create batch job log table
         cursor.execute('''
@@ -62,26 +156,23 @@ class BatchProcessor:
         conn.close()
         print("✅ Batch processor database created successfully")
     
-    def create_batch_job(self, job_id, job_name, job_type, agent_id, job_data, priority=5):
-        """Create a new batch job"""
-        conn = sqlite3.connect(self.batch_database)
+    def create_batch_job(self, job_id, job_name, job_type, agent_id, job_data, priority=5, max_attempts=3):
+        """Create a new batch job (lower priority number runs first)"""
+        conn = self.get_connection()
         cursor = conn.cursor()
         
         cursor.execute('''
             INSERT INTO batch_jobs 
-            (job_id, job_name, job_type, agent_id, job_data, priority, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
+            (job_id, job_name, job_type, agent_id, job_data, priority, created_at, max_attempts, available_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', (
             job_id, job_name, job_type, agent_id, json.dumps(job_data), priority,
-            datetime.now().isoformat()
+            datetime.now().isoformat(), max_attempts, time.time()
         ))
         
         conn.commit()
         conn.close()
         
-        # Add to processing queue
-        self.batch_queue.put((job_id, job_name, job_type, agent_id, job_data, priority))
-        
         print(f"✅ Batch job created: {job_name} for agent {agent_id}")
     
     def create_batch_jobs_from_template(self, template_name, agent_ids, job_data_template):
@@ -104,15 +195,335 @@ class BatchProcessor:
         print(f"✅ Created {job_count} batch jobs from template {template_name}")
         return job_count
     
-    def process_batch_job(self, job_id, job_name, job_type, agent_id, job_data, priority):
-        """Process a single batch job"""
+    def create_pipeline(self, pipeline_name, stages, priority=5, max_attempts=3):
+        """Create a DAG of batch jobs
+        
+        stages maps stage name -> {"job_type", "agent_id", "job_data", "depends_on": [stage, ...]}.
+        Stages without dependencies start right away; the rest run as soon as
+        everything they depend on has completed, in parallel where possible.
+        """
+        # Validate dependencies and order stages topologically (Kahn)
+        for stage, spec in stages.items():
+            for dependency in spec.get("depends_on", []):
+                if dependency not in stages:
+                    raise ValueError(f"Stage {stage} depends on unknown stage {dependency}")
+        
+        remaining = {stage: len(set(spec.get("depends_on", []))) for stage, spec in stages.items()}
+        dependents = {stage: [] for stage in stages}
+        for stage, spec in stages.items():
+            for dependency in set(spec.get("depends_on", [])):
+                dependents[dependency].append(stage)
+        
+        order = [stage for stage, count in remaining.items() if count == 0]
+        for stage in order:
+            for dependent in dependents[stage]:
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    order.append(dependent)
+        if len(order) != len(stages):
+            raise ValueError(f"Pipeline {pipeline_name} has a dependency cycle")
+        
+        # Longest chain from each stage to the end of the pipeline; among ready
+        # jobs of equal priority the one on the critical path is claimed first
+        height = {}
+        for stage in reversed(order):
+            height[stage] = 1 + max((height[dependent] for dependent in dependents[stage]), default=0)
+        
+        pipeline_id = f"{pipeline_name}_{int(time.time() * 1000)}"
+        now = time.time()
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO batch_pipelines (pipeline_id, pipeline_name, created_at) VALUES (?, ?, ?)",
+                       (pipeline_id, pipeline_name, datetime.now().isoformat()))
+        
+        for stage in sorted(order, key=lambda name: -height[name]):
+            spec = stages[stage]
+            job_id = f"{pipeline_id}:{stage}"
+            cursor.execute('''
+                INSERT INTO batch_jobs 
+                (job_id, job_name, job_type, agent_id, job_data, priority, status, created_at,
+                 max_attempts, available_at, pipeline_id, stage)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                job_id, f"{pipeline_name} - {stage}", spec["job_type"], spec.get("agent_id", "ops"),
+                json.dumps(spec.get("job_data", {})), spec.get("priority", priority),
+                "blocked" if spec.get("depends_on") else "pending",
+                datetime.now().isoformat(), spec.get("max_attempts", max_attempts), now, pipeline_id, stage
+            ))
+            cursor.executemany("INSERT OR IGNORE INTO batch_job_dependencies (job_id, depends_on) VALUES (?, ?)",
+                               [(job_id, f"{pipeline_id}:{dependency}") for dependency in spec.get("depends_on", [])])
+        
+        conn.commit()
+        conn.close()
+        
+        print(f"✅ Pipeline created: {pipeline_name} ({len(stages)} stages, critical path {max(height.values(), default=0)})")
+        return pipeline_id
+    
+    def create_maintenance_pipeline(self, agent_ids=None):
+        """Nightly maintenance: optimize model -> performance analysis -> system health, per agent in parallel"""
+        stages = {}
+        for agent_id in agent_ids or self.agents:
+            stages[f"{agent_id}_optimize"] = {
+                "job_type": "model_optimization_batch", "agent_id": agent_id,
+                "job_data": {"optimization_level": "high", "timeout": 60}
+            }
+            stages[f"{agent_id}_performance"] = {
+                "job_type": "performance_analysis_batch", "agent_id": agent_id,
+                "job_data": {"analysis_depth": "detailed", "include_metrics": True},
+                "depends_on": [f"{agent_id}_optimize"]
+            }
+            stages[f"{agent_id}_health"] = {
+                "job_type": "system_health_batch", "agent_id": agent_id,
+                "job_data": {"check_level": "comprehensive", "alert_threshold": 80},
+                "depends_on": [f"{agent_id}_performance"]
+            }
+        return self.create_pipeline("nightly_maintenance", stages)
+    
+    def rerun_pipeline(self, pipeline_id, from_stage=None):
+        """Re-run a pipeline from a stage (default: its failed stages)
+        
+        The stage and everything downstream of it are reset; completed upstream
+        stages keep their results and are not run again.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        if from_stage:
+            roots = [f"{pipeline_id}:{from_stage}"]
+        else:
+            cursor.execute("SELECT job_id FROM batch_jobs WHERE pipeline_id = ? AND status = 'failed'", (pipeline_id,))
+            roots = [row[0] for row in cursor.fetchall()]
+        
+        reset = set(roots)
+        for root in roots:
+            cursor.execute(DOWNSTREAM_JOBS_SQL, (root,))
+            reset.update(row[0] for row in cursor.fetchall())
+        if not reset:
+            conn.close()
+            return 0
+        
+        placeholders = ", ".join("?" * len(reset))
+        cursor.execute(f'''
+            UPDATE batch_jobs SET status = 'blocked', attempts = 0, started_at = NULL, completed_at = NULL,
+                   result = NULL, error_message = NULL, lease_owner = NULL, lease_expires_at = NULL
+            WHERE job_id IN ({placeholders}) AND status != 'running'
+        ''', list(reset))
+        reset_count = cursor.rowcount
+        cursor.execute(READY_BLOCKED_JOBS_SQL.format(candidates=placeholders), [time.time()] + list(reset))
+        
+        conn.commit()
+        conn.close()
+        
+        print(f"🔁 Pipeline {pipeline_id}: re-running {reset_count} stages")
+        return reset_count
+    
+    def get_pipeline_status(self, pipeline_id):
+        """Get per-stage status of a pipeline"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT stage, job_type, agent_id, status, attempts, started_at, completed_at, error_message
+            FROM batch_jobs WHERE pipeline_id = ? ORDER BY id
+        ''', (pipeline_id,))
+        stages = [{
+            "stage": row[0], "job_type": row[1], "agent_id": row[2], "status": row[3],
+            "attempts": row[4], "started_at": row[5], "completed_at": row[6], "error_message": row[7]
+        } for row in cursor.fetchall()]
+        conn.close()
+        
+        statuses = {stage["status"] for stage in stages}
+        if not stages:
+            overall_status = "unknown"
+        elif statuses == {"completed"}:
+            overall_status = "completed"
+        elif "failed" in statuses and not statuses & {"pending", "running"}:
+            overall_status = "failed"
+        else:
+            overall_status = "running"
+        
+        return {"pipeline_id": pipeline_id, "status": overall_status, "stages": stages}
+    
+    def get_upstream_results(self, job_id):
+        """Results of the stages a job depends on, keyed by stage name"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT upstream.stage, upstream.job_id, upstream.result
+            FROM batch_job_dependencies d JOIN batch_jobs upstream ON upstream.job_id = d.depends_on
+            WHERE d.job_id = ?
+        ''', (job_id,))
+        results = {}
+        for stage, upstream_id, result in cursor.fetchall():
+            results[stage or upstream_id] = json.loads(result) if result else None
+        conn.close()
+        return results
+    
+    def cancel_downstream(self, cursor, job_id, reason):
+        """Cancel jobs that can no longer run because an upstream job failed"""
+        cursor.execute(DOWNSTREAM_JOBS_SQL, (job_id,))
+        downstream = [row[0] for row in cursor.fetchall()]
+        if downstream:
+            cursor.execute(f'''
+                UPDATE batch_jobs SET status = 'cancelled', error_message = ?
+                WHERE job_id IN ({", ".join("?" * len(downstream))}) AND status IN ('blocked', 'pending')
+            ''', [reason] + downstream)
+    
+    def claim_job(self, worker_id):
+        """Lease the next ready job to a worker, or return None"""
+        now = time.time()
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            
+            # Jobs whose lease ran out (worker crashed or hung) become visible again
+            cursor.execute('''
+                SELECT job_id FROM batch_jobs
+                WHERE status = 'running' AND lease_expires_at < ? AND attempts >= max_attempts
+            ''', (now,))
+            for (expired_job_id,) in cursor.fetchall():
+                cursor.execute('''
+                    UPDATE batch_jobs SET status = 'failed', lease_owner = NULL,
+                           completed_at = ?, error_message = 'Lease expired on final attempt'
+                    WHERE job_id = ?
+                ''', (datetime.now().isoformat(), expired_job_id))
+                self.cancel_downstream(cursor, expired_job_id, f"Upstream job failed: {expired_job_id}")
+            cursor.execute('''
+                UPDATE batch_jobs SET status = 'pending', lease_owner = NULL, available_at = ?
+                WHERE status = 'running' AND lease_expires_at < ?
+            ''', (now, now))
+            
+            cursor.execute('''
+                SELECT job_id, job_name, job_type, agent_id, job_data, priority, attempts, max_attempts
+                FROM batch_jobs
+                WHERE status = 'pending' AND available_at <= ?
+                ORDER BY priority, id
+                LIMIT 1
+            ''', (now,))
+            row = cursor.fetchone()
+            
+            if row:
+                cursor.execute('''
+                    UPDATE batch_jobs SET status = 'running', attempts = attempts + 1,
+                           lease_owner = ?, lease_expires_at = ?, started_at = ?
+                    WHERE job_id = ?
+                ''', (worker_id, now + self.lease_seconds, datetime.now().isoformat(), row[0]))
+            
+            conn.commit()
+        finally:
+            conn.close()
+        
+        if not row:
+            return None
+        
+        return {
+            "job_id": row[0],
+            "job_name": row[1],
+            "job_type": row[2],
+            "agent_id": row[3],
+            "job_data": json.loads(row[4]),
+            "priority": row[5],
+            "attempt": row[6] + 1,
+            "max_attempts": row[7]
+        }
+    
+    def renew_lease(self, job_id, worker_id):
+        """Extend a running job's lease (False once another worker has taken it over)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE batch_jobs SET lease_expires_at = ?
+            WHERE job_id = ? AND lease_owner = ? AND status = 'running'
+        ''', (time.time() + self.lease_seconds, job_id, worker_id))
+        renewed = cursor.rowcount == 1
+        conn.commit()
+        conn.close()
+        return renewed
+    
+    def start_lease_heartbeat(self, job_id, worker_id):
+        """Renew a job's lease every third of the lease until the returned event is set"""
+        stop_heartbeat = threading.Event()
+        
+        def heartbeat():
+            while not stop_heartbeat.wait(self.lease_seconds / 3):
+                try:
+                    if not self.renew_lease(job_id, worker_id):
+                        self.log_job_message(job_id, "WARNING", f"Lease lost by {worker_id}")
+                        return
+                except Exception as e:
+                    print(f"⚠️ Lease heartbeat error for {job_id}: {str(e)}")
+        
+        heartbeat_thread = threading.Thread(target=heartbeat, name=f"Lease-{job_id}", daemon=True)
+        heartbeat_thread.start()
+        return stop_heartbeat
+    
+    def complete_job(self, job_id, worker_id, result):
+        """Mark a leased job completed (ignored if the lease was lost)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE batch_jobs SET status = 'completed', completed_at = ?, result = ?,
+                   lease_owner = NULL, lease_expires_at = NULL
+            WHERE job_id = ? AND lease_owner = ?
+        ''', (datetime.now().isoformat(), json.dumps(result), job_id, worker_id))
+        updated = cursor.rowcount
+        
+        # Release dependents that were only waiting on this job
+        if updated == 1:
+            cursor.execute(READY_BLOCKED_JOBS_SQL.format(
+                candidates="SELECT job_id FROM batch_job_dependencies WHERE depends_on = ?"
+            ), (time.time(), job_id))
+        
+        conn.commit()
+        conn.close()
+        return updated == 1
+    
+    def fail_job(self, job_id, worker_id, error_message):
+        """Schedule a retry with exponential backoff, or fail the job for good"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT attempts, max_attempts FROM batch_jobs WHERE job_id = ? AND lease_owner = ?",
+                       (job_id, worker_id))
+        row = cursor.fetchone()
+        
+        retry_in = None
+        if row and row[0] < row[1]:
+            retry_in = min(self.retry_base_delay * 2 ** (row[0] - 1), self.retry_max_delay)
+            retry_in *= random.uniform(0.8, 1.2)
+            cursor.execute('''
+                UPDATE batch_jobs SET status = 'pending', available_at = ?, error_message = ?,
+                       lease_owner = NULL, lease_expires_at = NULL
+                WHERE job_id = ? AND lease_owner = ?
+            ''', (time.time() + retry_in, error_message, job_id, worker_id))
+        elif row:
+            cursor.execute('''
+                UPDATE batch_jobs SET status = 'failed', completed_at = ?, error_message = ?,
+                       lease_owner = NULL, lease_expires_at = NULL
+                WHERE job_id = ? AND lease_owner = ?
+            ''', (datetime.now().isoformat(), error_message, job_id, worker_id))
+            self.cancel_downstream(cursor, job_id, f"Upstream job failed: {job_id}")
+        
+        conn.commit()
+        conn.close()
+        return retry_in
+    
+    def process_batch_job(self, job_id, job_name, job_type, agent_id, job_data, priority, worker_id=None):
+        """Process a single (leased) batch job"""
         start_time = time.time()
         
-        # Update job status
-        self.update_job_status(job_id, "running", started_at=datetime.now().isoformat())
         self.log_job_message(job_id, "INFO", f"Starting batch job: {job_name}")
         
+        # Keep the lease alive however long the job runs, so it is never handed to a second worker
+        stop_heartbeat = self.start_lease_heartbeat(job_id, worker_id) if worker_id else None
+        
         try:
+            # Pipeline stages see the results of the stages they depend on
+            upstream_results = self.get_upstream_results(job_id)
+            if upstream_results:
+                job_data = dict(job_data, upstream_results=upstream_results)
+            
             # Execute based on job type
             if job_type == "model_optimization_batch":
                 result = self.execute_model_optimization_batch(agent_id, job_data)
@@ -129,13 +540,15 @@ class BatchProcessor:
             else:
                 result = self.execute_generic_batch(agent_id, job_data)
             
+            # Executors report subprocess errors/timeouts in the result; retry those too
+            if isinstance(result, dict) and result.get("status") in ("error", "timeout"):
+                raise RuntimeError(result.get("error") or result["status"])
+            
             # Calculate duration
             duration = time.time() - start_time
             
             # Update job status
-            self.update_job_status(job_id, "completed", 
-                                 completed_at=datetime.now().isoformat(),
-                                 result=json.dumps(result))
+            self.complete_job(job_id, worker_id, result)
             
             self.log_job_message(job_id, "INFO", f"Batch job completed successfully in {duration:.2f}s")
             
@@ -146,13 +559,17 @@ class BatchProcessor:
             error_message = str(e)
             
             # Update job status
-            self.update_job_status(job_id, "failed", 
-                                 completed_at=datetime.now().isoformat(),
-                                 error_message=error_message)
+            retry_in = self.fail_job(job_id, worker_id, error_message)
             
-            self.log_job_message(job_id, "ERROR", f"Batch job failed: {error_message}")
-            
-            print(f"❌ Batch job failed: {job_name} - {error_message}")
+            if retry_in is not None:
+                self.log_job_message(job_id, "WARNING", f"Batch job failed, retrying in {retry_in:.0f}s: {error_message}")
+                print(f"⚠️ Batch job failed: {job_name} - {error_message} (retry in {retry_in:.0f}s)")
+            else:
+                self.log_job_message(job_id, "ERROR", f"Batch job failed: {error_message}")
+                print(f"❌ Batch job failed: {job_name} - {error_message}")
+        finally:
+            if stop_heartbeat:
+                stop_heartbeat.set()
     
     def execute_model_optimization_batch(self, agent_id, job_data):
         """Execute model optimization batch job"""
@@ -372,7 +789,7 @@ class BatchProcessor:
     
     def update_job_status(self, job_id, status, started_at=None, completed_at=None, result=None, error_message=None):
         """Update job status in database"""
-        conn = sqlite3.connect(self.batch_database)
+        conn = self.get_connection()
         cursor = conn.cursor()
         
         update_fields = ["status = ?"]
@@ -406,7 +823,7 @@ class BatchProcessor:
     
     def log_job_message(self, job_id, log_level, message):
         """Log job message"""
-        conn = sqlite3.connect(self.batch_database)
+        conn = self.get_connection()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -417,37 +834,64 @@ class BatchProcessor:
         conn.commit()
         conn.close()
     
-    def start_batch_processor(self):
-        """Start the batch processor"""
+    def start_batch_processor(self, mode=None, workers=None):
+        """Start the batch processor
+        
+        mode "thread" runs workers in this process; mode "process" runs them in
+        separate processes so CPU-heavy jobs use every core.
+        """
         print("🧟 Batch Processor - Starting Processor")
         print("=" * 50)
         
-        # Start worker threads
-        for i in range(self.max_workers):
-            worker_thread = threading.Thread(target=self.worker_thread, name=f"Worker-{i+1}")
-            worker_thread.daemon = True
-            worker_thread.start()
-            self.processing_threads.append(worker_thread)
+        self.worker_mode = mode or self.worker_mode
+        if workers:
+            self.max_workers = workers
+        
+        if self.worker_mode == "process":
+            self.stop_event = multiprocessing.Event()
+            for i in range(self.max_workers):
+                worker_process = multiprocessing.Process(
+                    target=run_worker_process,
+                    args=(self.batch_database, f"Worker-{i+1}", self.stop_event, self.poll_interval),
+                    name=f"Worker-{i+1}"
+                )
+                worker_process.daemon = True
+                worker_process.start()
+                self.processing_processes.append(worker_process)
+        else:
+            for i in range(self.max_workers):
+                worker_thread = threading.Thread(target=self.worker_loop, args=(f"Worker-{i+1}",), name=f"Worker-{i+1}")
+                worker_thread.daemon = True
+                worker_thread.start()
+                self.processing_threads.append(worker_thread)
         
-        print(f"✅ Batch processor started with {self.max_workers} workers")
+        print(f"✅ Batch processor started with {self.max_workers} {self.worker_mode} workers")
         return True
     
-    def worker_thread(self):
-        """Worker thread for processing batch jobs"""
-        while True:
+    def stop_batch_processor(self, timeout=10):
+        """Stop workers after their current job (unfinished leases are re-queued on expiry)"""
+        self.stop_event.set()
+        for worker in self.processing_threads + self.processing_processes:
+            worker.join(timeout=timeout)
+        for worker_process in self.processing_processes:
+            if worker_process.is_alive():
+                worker_process.terminate()
+        self.processing_threads = []
+        self.processing_processes = []
+    
+    def worker_loop(self, worker_name):
+        """Claim and process jobs until stopped"""
+        worker_id = f"{os.getpid()}:{worker_name}"
+        while not self.stop_event.is_set():
             try:
-                # Get job from queue
-                job_data = self.batch_queue.get(timeout=1)
-                job_id, job_name, job_type, agent_id, job_data_dict, priority = job_data
+                job = self.claim_job(worker_id)
+                if job is None:
+                    self.stop_event.wait(self.poll_interval)
+                    continue
                 
-                # Process job
-                self.process_batch_job(job_id, job_name, job_type, agent_id, job_data_dict, priority)
+                self.process_batch_job(job["job_id"], job["job_name"], job["job_type"], job["agent_id"],
+                                       job["job_data"], job["priority"], worker_id=worker_id)
                 
-                # Mark task as done
-                self.batch_queue.task_done()
-                
-            except queue.Empty:
-                continue
             except Exception as e:
                 print(f"Worker thread error: {str(e)}")
                 time.sleep(1)
@@ -481,7 +925,7 @@ class BatchProcessor:
     
     def get_batch_processor_status(self):
         """Get current batch processor status"""
-        conn = sqlite3.connect(self.batch_database)
+        conn = self.get_connection()
         cursor = conn.cursor()
         
         # Get job counts by status
@@ -490,8 +934,11 @@ class BatchProcessor:
         ''')
         status_counts = dict(cursor.fetchall())
         
-        # Get queue size
-        queue_size = self.batch_queue.qsize()
+        # Get queue size (jobs ready now) and jobs waiting out a retry backoff
+        cursor.execute("SELECT COUNT(*) FROM batch_jobs WHERE status = 'pending' AND available_at <= ?", (time.time(),))
+        queue_size = cursor.fetchone()[0]
+        cursor.execute("SELECT COUNT(*) FROM batch_jobs WHERE status = 'pending' AND attempts > 0")
+        retrying_jobs = cursor.fetchone()[0]
         
         # Get recent jobs
         cursor.execute('''
@@ -508,7 +955,9 @@ class BatchProcessor:
             "timestamp": datetime.now().isoformat(),
             "status_counts": status_counts,
             "queue_size": queue_size,
-            "active_workers": len(self.processing_threads),
+            "retrying_jobs": retrying_jobs,
+            "worker_mode": self.worker_mode,
+            "active_workers": len(self.processing_threads) + len(self.processing_processes),
             "recent_jobs": recent_jobs,
             "processor_active": True
         }
@@ -538,8 +987,11 @@ def main():
     # Create sample batch jobs
     processor.create_sample_batch_jobs()
     
-    # Start batch processor
-    success = processor.start_batch_processor()
+    # Start batch processor (--processes: one worker process per core)
+    if "--processes" in sys.argv:
+        success = processor.start_batch_processor(mode="process", workers=os.cpu_count() or processor.max_workers)
+    else:
+        success = processor.start_batch_processor()
     
     if success:
         # Generate report
@@ -6,10 +6,14 @@ Pump/Automation - Real-time Alerts for Failures or Delays
 
 import json
 import time
+import random
+import asyncio
 import threading
+import hashlib
+import concurrent.futures
 from datetime import datetime, timedelta
-import sqlite3
 import os
+import sys
 import subprocess
 import psutil
 import requests
@@ -17,6 +21,206 @@ import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "shared"))
+from metrics_store import MetricsStore
+import workspace_db
+
+# Incident tracking columns added to the alerts table (ALTERed into older databases)
+INCIDENT_COLUMNS = {
+    "fingerprint": "TEXT",
+    "occurrence_count": "INTEGER DEFAULT 1",
+    "first_seen": "TEXT",
+    "last_seen": "TEXT",
+    "last_notified_at": "TEXT",
+    "flap_count": "INTEGER DEFAULT 0"
+}
+
+# alert_data keys that distinguish otherwise identical alerts (one incident per service / log file)
+FINGERPRINT_DATA_KEYS = ("service", "log_file")
+
+# Alert types whose metric gets a hysteresis band once an incident is open
+HYSTERESIS_METRICS = {
+    "high_cpu_usage": "cpu_usage",
+    "high_memory_usage": "memory_usage",
+    "high_disk_usage": "disk_usage"
+}
+
+class NotificationDispatcher:
+    """Deliver notifications from an asyncio loop on its own thread
+    
+    Each channel has its own queue drained by a fixed number of workers (its
+    concurrency limit). Senders are plain blocking callables run on a thread
+    pool; a sender receives a list of notifications and raises on failure.
+    Failed deliveries are retried with exponential backoff. Low-severity
+    notifications for digest channels are buffered and sent as one batch.
+    """
+    
+    def __init__(self, senders, on_result=None, concurrency=None, max_attempts=4,
+                 backoff_base=1.0, backoff_max=60.0, digest_interval=300, digest_max=50,
+                 digest_levels=("info", "warning"), digest_channels=("email", "webhook"),
+                 queue_size=1000):
+        self.senders = senders
+        self.on_result = on_result
+        self.concurrency = {channel: 1 for channel in senders}
+        self.concurrency.update(concurrency or {})
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.digest_interval = digest_interval
+        self.digest_max = digest_max
+        self.digest_levels = set(digest_levels)
+        self.digest_channels = set(digest_channels)
+        self.queue_size = queue_size
+        
+        self.loop = None
+        self.thread = None
+        self.executor = None
+        self.queues = {}
+        self.digests = {}
+        self.tasks = []
+        self.pending_retries = 0
+        self.start_lock = threading.Lock()
+        self.stats = {"enqueued": 0, "sent": 0, "retried": 0, "failed": 0, "dropped": 0, "digests": 0}
+    
+    def start(self):
+        """Start the dispatcher loop (safe to call more than once)"""
+        with self.start_lock:
+            if self.thread and self.thread.is_alive():
+                return
+            self.loop = asyncio.new_event_loop()
+            self.executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=sum(self.concurrency.values()), thread_name_prefix="notify")
+            self.thread = threading.Thread(target=self.loop.run_forever, name="notification-dispatcher")
+            self.thread.daemon = True
+            self.thread.start()
+            asyncio.run_coroutine_threadsafe(self.setup(), self.loop).result()
+    
+    async def setup(self):
+        """Create channel queues and workers inside the loop"""
+        for channel, workers in self.concurrency.items():
+            self.queues[channel] = asyncio.Queue(maxsize=self.queue_size)
+            self.digests[channel] = []
+            for _ in range(workers):
+                self.tasks.append(asyncio.ensure_future(self.worker(channel)))
+        self.tasks.append(asyncio.ensure_future(self.digest_flusher()))
+    
+    def enqueue(self, channel, notification):
+        """Queue a notification for a channel (thread-safe, never blocks)"""
+        self.start()
+        self.loop.call_soon_threadsafe(self.put, channel, notification)
+    
+    def put(self, channel, notification):
+        self.stats["enqueued"] += 1
+        if channel in self.digest_channels and notification.get("alert_level") in self.digest_levels:
+            self.digests[channel].append(notification)
+            if len(self.digests[channel]) >= self.digest_max:
+                self.flush_digest(channel)
+            return
+        self.submit({"channel": channel, "notifications": [notification], "attempt": 1, "digest": False})
+    
+    def submit(self, job):
+        try:
+            self.queues[job["channel"]].put_nowait(job)
+        except asyncio.QueueFull:
+            self.stats["dropped"] += len(job["notifications"])
+            self.report(job, "failed", f"{job['channel']} queue full, notification dropped")
+    
+    def flush_digest(self, channel):
+        notifications, self.digests[channel] = self.digests[channel], []
+        if notifications:
+            self.stats["digests"] += 1
+            self.submit({"channel": channel, "notifications": notifications, "attempt": 1, "digest": True})
+    
+    async def digest_flusher(self):
+        while True:
+            await asyncio.sleep(self.digest_interval)
+            for channel in self.digests:
+                self.flush_digest(channel)
+    
+    async def worker(self, channel):
+        while True:
+            job = await self.queues[channel].get()
+            try:
+                await self.loop.run_in_executor(self.executor, self.deliver, job)
+                self.stats["sent"] += len(job["notifications"])
+            except Exception as e:
+                if job["attempt"] < self.max_attempts:
+                    delay = min(self.backoff_max, self.backoff_base * 2 ** (job["attempt"] - 1))
+                    delay *= random.uniform(0.8, 1.2)
+                    self.stats["retried"] += 1
+                    self.report(job, "retry", f"Attempt {job['attempt']} failed: {str(e)}, retrying in {delay:.1f}s")
+                    job["attempt"] += 1
+                    self.pending_retries += 1
+                    self.loop.call_later(delay, self.retry, job)
+                else:
+                    self.stats["failed"] += len(job["notifications"])
+                    self.report(job, "failed", f"{channel} notification failed after {job['attempt']} attempts: {str(e)}")
+            finally:
+                self.queues[channel].task_done()
+    
+    def retry(self, job):
+        self.pending_retries -= 1
+        self.submit(job)
+    
+    def deliver(self, job):
+        """Run a sender and record the outcome (executor thread)"""
+        result = self.senders[job["channel"]](job["notifications"])
+        status, message = result or ("success", f"{job['channel'].capitalize()} notification sent")
+        if job["digest"]:
+            message = f"{message} (digest of {len(job['notifications'])})"
+        if self.on_result:
+            self.on_result(job["channel"], job["notifications"], status, message)
+    
+    def report(self, job, status, message):
+        if self.on_result:
+            self.executor.submit(self.on_result, job["channel"], job["notifications"], status, message)
+    
+    async def drain(self):
+        for channel in self.digests:
+            self.flush_digest(channel)
+        while True:
+            await asyncio.gather(*(queue.join() for queue in self.queues.values()))
+            if not self.pending_retries:
+                return
+            await asyncio.sleep(0.05)
+    
+    def flush(self, timeout=30):
+        """Send digests now and wait until every queue (and pending retry) is done"""
+        if not self.thread or not self.thread.is_alive():
+            return True
+        try:
+            asyncio.run_coroutine_threadsafe(self.drain(), self.loop).result(timeout)
+            return True
+        except concurrent.futures.TimeoutError:
+            return False
+    
+    def stop(self, timeout=30):
+        """Flush outstanding notifications and stop the loop"""
+        if not self.thread or not self.thread.is_alive():
+            return True
+        drained = self.flush(timeout)
+        
+        async def cancel_tasks():
+            for task in self.tasks:
+                task.cancel()
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+            self.tasks = []
+        
+        asyncio.run_coroutine_threadsafe(cancel_tasks(), self.loop).result(timeout)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout)
+        self.executor.shutdown(wait=True)
+        self.loop.close()
+        return drained
+    
+    def get_stats(self):
+        return dict(
+            self.stats,
+            queued={channel: queue.qsize() for channel, queue in self.queues.items()},
+            pending_digest={channel: len(items) for channel, items in self.digests.items()},
+            pending_retries=self.pending_retries
+        )
+
 class MonitoringAlerts:
     def __init__(self):
         self.alerts_database = "monitoring_alerts.db"
@@ -36,11 +240,67 @@ class MonitoringAlerts:
             "email": False,  # Disabled by default
             "webhook": False  # Disabled by default
         }
+        self.log_files = [
+            "logs/agent_work.log",
+            "logs/agent_error.log",
+            "logs/agent_report.log"
+        ]
+        self.services_to_check = [
+            "ollama",
+            "systemd-resolved",
+            "networking"
+        ]
+        self.service_check_timeout = 5  # seconds per probe; probes run concurrently
+        self.probe_executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(self.services_to_check),
+                                                                    thread_name_prefix="service-probe")
+        self.last_snapshot = None
+        self.last_cycle_duration = None
+        self.metrics_store = MetricsStore()
+        self.incident_settings = {
+            "renotify_interval": 3600,  # seconds between reminders while an incident stays open
+            "clear_cycles": 3,          # consecutive clean cycles before an incident auto-resolves
+            "flap_window": 900,         # re-firing within this many seconds of resolving counts as a flap
+            "flap_threshold": 3,        # flaps before an incident is marked flapping and muted
+            "hysteresis_margin": 5.0    # percentage points below threshold before a metric clears
+        }
+        self.incidents = {}  # fingerprint -> open incident
+        self.incidents_lock = threading.Lock()
+        self.notification_settings = {
+            "email": {
+                "smtp_host": "localhost",
+                "smtp_port": 25,
+                "use_tls": False,
+                "username": None,
+                "password": None,
+                "from": "zombiecoder-alerts@localhost",
+                "to": [],
+                "timeout": 10
+            },
+            "webhook": {
+                "url": None,
+                "headers": {},
+                "timeout": 5
+            }
+        }
+        self.dispatcher = NotificationDispatcher(
+            senders={
+                "console": self.send_console_notification,
+                "log": self.send_log_notification,
+                "email": self.send_email_notification,
+                "webhook": self.send_webhook_notification
+            },
+            on_result=self.record_deliveries,
+            concurrency={"console": 1, "log": 1, "email": 2, "webhook": 4}
+        )
+        
+        # Prime psutil so later cpu_percent(interval=None) calls measure since the previous cycle
+        psutil.cpu_percent(interval=None)
         self.setup_database()
+        self.load_incidents()
         
     def setup_database(self):
         """Setup monitoring alerts database"""
-        conn = sqlite3.connect(self.alerts_database)
+        conn = workspace_db.connect(self.alerts_database)
         cursor = conn.cursor()
         
         # Create alerts table
@@ -60,6 +320,31 @@ class MonitoringAlerts:
             )
         ''')
         
+        cursor.execute("PRAGMA table_info(alerts)")
+        existing_columns = {row[1] for row in cursor.fetchall()}
+        for column, definition in INCIDENT_COLUMNS.items():
+            if column not in existing_columns:
+                cursor.execute(f"ALTER TABLE alerts ADD COLUMN {column} {definition}")
+        
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_alerts_fingerprint
+            ON alerts (fingerprint, status)
+        ''')
+        
+        # Create suppression windows table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS alert_suppressions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created_at TEXT NOT NULL,
+                agent_id TEXT,
+                alert_type TEXT,
+                starts_at TEXT NOT NULL,
+                ends_at TEXT NOT NULL,
+                reason TEXT,
+                user TEXT DEFAULT 'system'
+            )
+        ''')
+        
         # Create alert history table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS alert_history (
@@ -89,14 +374,136 @@ class MonitoringAlerts:
         conn.close()
         print("✅ Monitoring alerts database created successfully")
     
-    def check_system_health(self, agent_id):
+    def load_incidents(self):
+        """Load open incidents so dedup survives restarts"""
+        conn = workspace_db.connect(self.alerts_database)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT fingerprint, alert_id, agent_id, alert_type, alert_level, status,
+                   last_notified_at, flap_count
+            FROM alerts
+            WHERE status IN ('active', 'flapping') AND fingerprint IS NOT NULL
+        ''')
+        
+        with self.incidents_lock:
+            for row in cursor.fetchall():
+                self.incidents[row[0]] = {
+                    "alert_id": row[1],
+                    "agent_id": row[2],
+                    "alert_type": row[3],
+                    "alert_level": row[4],
+                    "status": row[5],
+                    "last_notified_at": row[6],
+                    "flap_count": row[7] or 0,
+                    "clean_cycles": 0
+                }
+        
+        conn.close()
+    
+    def alert_fingerprint(self, agent_id, alert_type, alert_level, alert_data=None):
+        """Identify an incident by agent, type and level (plus service / log file when present)"""
+        parts = [str(agent_id), alert_type, alert_level]
+        for key in FINGERPRINT_DATA_KEYS:
+            if alert_data and key in alert_data:
+                parts.append(f"{key}={alert_data[key]}")
+        return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:16]
+    
+    def metric_threshold(self, agent_id, alert_type, metric):
+        """Alert threshold for a metric, lowered by the hysteresis margin while an incident is open"""
+        threshold = self.alert_thresholds[metric]
+        with self.incidents_lock:
+            incident_open = any(
+                incident["agent_id"] == agent_id and incident["alert_type"] == alert_type
+                for incident in self.incidents.values()
+            )
+        if incident_open:
+            threshold -= self.incident_settings["hysteresis_margin"]
+        return threshold
+    
+    def collect_snapshot(self):
+        """Sample host metrics, log files, processes and services once for a whole cycle"""
+        snapshot = {"timestamp": time.time(), "errors": {}}
+        
+        # Service probes are the slow part; start them first so they overlap the rest
+        probes = {
+            service: self.probe_executor.submit(self.probe_service, service)
+            for service in self.services_to_check
+        }
+        
+        try:
+            snapshot["cpu_usage"] = psutil.cpu_percent(interval=None)
+            snapshot["memory_usage"] = psutil.virtual_memory().percent
+            snapshot["disk_usage"] = psutil.disk_usage('/').percent
+            snapshot["uptime"] = time.time() - psutil.boot_time()
+        except Exception as e:
+            snapshot["errors"]["system"] = str(e)
+        
+        snapshot["log_files"] = {}
+        for log_file in self.log_files:
+            try:
+                snapshot["log_files"][log_file] = time.time() - os.path.getmtime(log_file)
+            except OSError:
+                snapshot["log_files"][log_file] = None
+        
+        try:
+            snapshot["python_processes"] = []
+            for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
+                try:
+                    if proc.info['name'] == 'python3':
+                        snapshot["python_processes"].append(
+                            dict(proc.info, cmdline_text=' '.join(proc.info['cmdline'] or []))
+                        )
+                except:
+                    continue
+        except Exception as e:
+            snapshot["errors"]["processes"] = str(e)
+        
+        snapshot["services"] = {}
+        for service, probe in probes.items():
+            try:
+                snapshot["services"][service] = probe.result(timeout=self.service_check_timeout + 1)
+            except concurrent.futures.TimeoutError:
+                snapshot["services"][service] = {"state": "timeout"}
+        
+        # Keep the host metrics and service states as history in the shared store
+        samples = {
+            f"monitoring.host.{metric}": snapshot.get(metric)
+            for metric in ("cpu_usage", "memory_usage", "disk_usage")
+        }
+        samples["monitoring.host.cycle_duration"] = self.last_cycle_duration
+        for service, probe in snapshot["services"].items():
+            samples[f"monitoring.{service}.service_active"] = 1.0 if probe["state"] == "active" else 0.0
+        self.metrics_store.record_many(samples, snapshot["timestamp"])
+        
+        self.last_snapshot = snapshot
+        return snapshot
+    
+    def probe_service(self, service):
+        """Probe one service with systemctl (runs on the probe pool)"""
+        try:
+            result = subprocess.run([
+                "systemctl", "is-active", service
+            ], capture_output=True, text=True, timeout=self.service_check_timeout)
+            return {"state": "active" if result.returncode == 0 else "inactive", "status": result.stdout.strip()}
+        except subprocess.TimeoutExpired:
+            return {"state": "timeout"}
+        except:
+            # Service might not be managed by systemd
+            return {"state": "unknown"}
+    
+    def check_system_health(self, agent_id, snapshot=None):
         """Check system health and generate alerts"""
         alerts = []
+        snapshot = snapshot or self.collect_snapshot()
         
         try:
+            if "system" in snapshot["errors"]:
+                raise RuntimeError(snapshot["errors"]["system"])
+            
             # Check CPU usage
-            cpu_usage = psutil.cpu_percent(interval=1)
-            if cpu_usage > self.alert_thresholds["cpu_usage"]:
+            cpu_usage = snapshot["cpu_usage"]
+            if cpu_usage > self.metric_threshold(agent_id, "high_cpu_usage", "cpu_usage"):
                 alerts.append({
                     "alert_type": "high_cpu_usage",
                     "alert_level": "warning" if cpu_usage < 95 else "critical",
@@ -105,27 +512,27 @@ class MonitoringAlerts:
                 })
             
             # Check memory usage
-            memory = psutil.virtual_memory()
-            if memory.percent > self.alert_thresholds["memory_usage"]:
+            memory_usage = snapshot["memory_usage"]
+            if memory_usage > self.metric_threshold(agent_id, "high_memory_usage", "memory_usage"):
                 alerts.append({
                     "alert_type": "high_memory_usage",
-                    "alert_level": "warning" if memory.percent < 95 else "critical",
-                    "alert_message": f"High memory usage detected: {memory.percent:.1f}%",
-                    "alert_data": {"memory_usage": memory.percent, "threshold": self.alert_thresholds["memory_usage"]}
+                    "alert_level": "warning" if memory_usage < 95 else "critical",
+                    "alert_message": f"High memory usage detected: {memory_usage:.1f}%",
+                    "alert_data": {"memory_usage": memory_usage, "threshold": self.alert_thresholds["memory_usage"]}
                 })
             
             # Check disk usage
-            disk = psutil.disk_usage('/')
-            if disk.percent > self.alert_thresholds["disk_usage"]:
+            disk_usage = snapshot["disk_usage"]
+            if disk_usage > self.metric_threshold(agent_id, "high_disk_usage", "disk_usage"):
                 alerts.append({
                     "alert_type": "high_disk_usage",
-                    "alert_level": "warning" if disk.percent < 98 else "critical",
-                    "alert_message": f"High disk usage detected: {disk.percent:.1f}%",
-                    "alert_data": {"disk_usage": disk.percent, "threshold": self.alert_thresholds["disk_usage"]}
+                    "alert_level": "warning" if disk_usage < 98 else "critical",
+                    "alert_message": f"High disk usage detected: {disk_usage:.1f}%",
+                    "alert_data": {"disk_usage": disk_usage, "threshold": self.alert_thresholds["disk_usage"]}
                 })
             
             # Check system uptime
-            uptime = time.time() - psutil.boot_time()
+            uptime = snapshot["uptime"]
             if uptime < self.alert_thresholds["uptime"]:
                 alerts.append({
                     "alert_type": "low_uptime",
@@ -144,22 +551,16 @@ class MonitoringAlerts:
         
         return alerts
     
-    def check_agent_status(self, agent_id):
+    def check_agent_status(self, agent_id, snapshot=None):
         """Check agent status and generate alerts"""
         alerts = []
+        snapshot = snapshot or self.collect_snapshot()
         
         try:
             # Check if agent log files exist and are recent
-            log_files = [
-                f"logs/agent_work.log",
-                f"logs/agent_error.log",
-                f"logs/agent_report.log"
-            ]
-            
-            for log_file in log_files:
-                if os.path.exists(log_file):
+            for log_file, file_age in snapshot["log_files"].items():
+                if file_age is not None:
                     # Check if log file is recent (within last hour)
-                    file_age = time.time() - os.path.getmtime(log_file)
                     if file_age > 3600:  # 1 hour
                         alerts.append({
                             "alert_type": "stale_log_file",
@@ -176,7 +577,7 @@ class MonitoringAlerts:
                     })
             
             # Check agent-specific processes
-            agent_processes = self.check_agent_processes(agent_id)
+            agent_processes = self.check_agent_processes(agent_id, snapshot)
             if not agent_processes:
                 alerts.append({
                     "alert_type": "no_agent_processes",
@@ -195,21 +596,19 @@ class MonitoringAlerts:
         
         return alerts
     
-    def check_agent_processes(self, agent_id):
+    def check_agent_processes(self, agent_id, snapshot=None):
         """Check if agent processes are running"""
         try:
             # Look for Python processes related to the agent
-            processes = list(psutil.process_iter(['pid', 'name', 'cmdline']))
-            agent_processes = []
+            snapshot = snapshot or self.collect_snapshot()
+            if "processes" in snapshot["errors"]:
+                raise RuntimeError(snapshot["errors"]["processes"])
             
-            for proc in processes:
-                try:
-                    if proc.info['name'] == 'python3':
-                        cmdline = ' '.join(proc.info['cmdline'])
-                        if agent_id in cmdline or 'zombiecoder' in cmdline:
-                            agent_processes.append(proc.info)
-                except:
-                    continue
+            agent_processes = []
+            for proc in snapshot["python_processes"]:
+                cmdline = proc["cmdline_text"]
+                if agent_id in cmdline or 'zombiecoder' in cmdline:
+                    agent_processes.append({key: proc[key] for key in ('pid', 'name', 'cmdline')})
             
             return agent_processes
             
@@ -217,42 +616,28 @@ class MonitoringAlerts:
             print(f"Error checking processes for agent {agent_id}: {str(e)}")
             return []
     
-    def check_service_health(self, agent_id):
+    def check_service_health(self, agent_id, snapshot=None):
         """Check service health and generate alerts"""
         alerts = []
+        snapshot = snapshot or self.collect_snapshot()
         
         try:
             # Check key services
-            services_to_check = [
-                "ollama",
-                "systemd-resolved",
-                "networking"
-            ]
-            
-            for service in services_to_check:
-                try:
-                    result = subprocess.run([
-                        "systemctl", "is-active", service
-                    ], capture_output=True, text=True, timeout=5)
-                    
-                    if result.returncode != 0:
-                        alerts.append({
-                            "alert_type": "service_down",
-                            "alert_level": "critical",
-                            "alert_message": f"Service {service} is not active",
-                            "alert_data": {"service": service, "status": result.stdout.strip()}
-                        })
-                
-                except subprocess.TimeoutExpired:
+            for service, probe in snapshot["services"].items():
+                if probe["state"] == "inactive":
+                    alerts.append({
+                        "alert_type": "service_down",
+                        "alert_level": "critical",
+                        "alert_message": f"Service {service} is not active",
+                        "alert_data": {"service": service, "status": probe["status"]}
+                    })
+                elif probe["state"] == "timeout":
                     alerts.append({
                         "alert_type": "service_check_timeout",
                         "alert_level": "warning",
                         "alert_message": f"Service {service} check timed out",
                         "alert_data": {"service": service}
                     })
-                except:
-                    # Service might not be managed by systemd
-                    pass
             
         except Exception as e:
             alerts.append({
@@ -265,111 +650,301 @@ class MonitoringAlerts:
         return alerts
     
     def create_alert(self, agent_id, alert_type, alert_level, alert_message, alert_data):
-        """Create a new alert"""
-        alert_id = f"{agent_id}_{alert_type}_{int(time.time())}"
+        """Create a new alert, or count another occurrence of the open incident it belongs to"""
+        fingerprint = self.alert_fingerprint(agent_id, alert_type, alert_level, alert_data)
+        now = datetime.now()
+        settings = self.incident_settings
         
-        conn = sqlite3.connect(self.alerts_database)
+        conn = workspace_db.connect(self.alerts_database)
         cursor = conn.cursor()
         
-        cursor.execute('''
-            INSERT OR REPLACE INTO alerts 
-            (timestamp, alert_id, agent_id, alert_type, alert_level, alert_message, alert_data)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            datetime.now().isoformat(), alert_id, agent_id, alert_type,
-            alert_level, alert_message, json.dumps(alert_data)
-        ))
+        with self.incidents_lock:
+            incident = self.incidents.get(fingerprint)
+            notify = False
+            action = "occurrence"
+            
+            if incident:
+                # Same incident still firing: count it in place
+                alert_id = incident["alert_id"]
+                incident["clean_cycles"] = 0
+                cursor.execute('''
+                    UPDATE alerts SET occurrence_count = occurrence_count + 1, last_seen = ?,
+                           alert_message = ?, alert_data = ?
+                    WHERE alert_id = ?
+                ''', (now.isoformat(), alert_message, json.dumps(alert_data), alert_id))
+                
+                last_notified = incident["last_notified_at"]
+                if incident["status"] == "active" and (
+                    not last_notified or
+                    (now - datetime.fromisoformat(last_notified)).total_seconds() >= settings["renotify_interval"]
+                ):
+                    notify = True
+                    action = "reminder"
+            else:
+                # Resolved recently? Then this is a flap of the same incident, not a new one
+                cursor.execute('''
+                    SELECT alert_id, flap_count FROM alerts
+                    WHERE fingerprint = ? AND status = 'resolved' AND resolved_at >= ?
+                    ORDER BY resolved_at DESC LIMIT 1
+                ''', (fingerprint, (now - timedelta(seconds=settings["flap_window"])).isoformat()))
+                recent = cursor.fetchone()
+                
+                if recent:
+                    alert_id = recent[0]
+                    flap_count = (recent[1] or 0) + 1
+                    status = "flapping" if flap_count >= settings["flap_threshold"] else "active"
+                    cursor.execute('''
+                        UPDATE alerts SET status = ?, resolved_at = NULL, flap_count = ?,
+                               occurrence_count = occurrence_count + 1, last_seen = ?,
+                               alert_message = ?, alert_data = ?
+                        WHERE alert_id = ?
+                    ''', (status, flap_count, now.isoformat(), alert_message, json.dumps(alert_data), alert_id))
+                    
+                    cursor.execute('''
+                        SELECT last_notified_at FROM alerts WHERE alert_id = ?
+                    ''', (alert_id,))
+                    last_notified_at = cursor.fetchone()[0]
+                    
+                    # Notify once when an incident starts flapping, then stay quiet
+                    if status == "flapping" and flap_count == settings["flap_threshold"]:
+                        notify = True
+                        action = "flapping"
+                        alert_message = f"{alert_message} (flapping: reopened {flap_count} times)"
+                    else:
+                        action = "reopened" if status == "active" else "occurrence"
+                else:
+                    alert_id = f"{agent_id}_{alert_type}_{fingerprint[:8]}_{int(now.timestamp())}"
+                    status = "active"
+                    flap_count = 0
+                    last_notified_at = None
+                    cursor.execute('''
+                        INSERT OR REPLACE INTO alerts 
+                        (timestamp, alert_id, agent_id, alert_type, alert_level, alert_message, alert_data,
+                         fingerprint, occurrence_count, first_seen, last_seen, flap_count)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1, ?, ?, 0)
+                    ''', (
+                        now.isoformat(), alert_id, agent_id, alert_type,
+                        alert_level, alert_message, json.dumps(alert_data),
+                        fingerprint, now.isoformat(), now.isoformat()
+                    ))
+                    notify = True
+                    action = "created"
+                
+                incident = self.incidents[fingerprint] = {
+                    "alert_id": alert_id,
+                    "agent_id": agent_id,
+                    "alert_type": alert_type,
+                    "alert_level": alert_level,
+                    "status": status,
+                    "last_notified_at": last_notified_at,
+                    "flap_count": flap_count,
+                    "clean_cycles": 0
+                }
+                
+                cursor.execute('''
+                    INSERT INTO alert_history 
+                    (timestamp, alert_id, action, details, user)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (now.isoformat(), alert_id, action, alert_message, "system"))
+            
+            if notify and self.is_suppressed(cursor, agent_id, alert_type, now):
+                notify = False
+                action = "suppressed"
+            
+            if notify:
+                incident["last_notified_at"] = now.isoformat()
+                cursor.execute('''
+                    UPDATE alerts SET last_notified_at = ? WHERE alert_id = ?
+                ''', (now.isoformat(), alert_id))
         
         conn.commit()
         conn.close()
         
-        # Send notifications
-        self.send_notifications(alert_id, agent_id, alert_type, alert_level, alert_message)
+        if notify:
+            # Send notifications
+            self.send_notifications(alert_id, agent_id, alert_type, alert_level, alert_message)
+        
+        if action in ("created", "reopened", "flapping"):
+            print(f"🚨 Alert {action}: {alert_type} for agent {agent_id} - {alert_message}")
         
-        print(f"🚨 Alert created: {alert_type} for agent {agent_id} - {alert_message}")
+        return alert_id
     
-    def send_notifications(self, alert_id, agent_id, alert_type, alert_level, alert_message):
-        """Send notifications through configured channels"""
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    def clear_incidents(self, firing_fingerprints):
+        """Auto-resolve open incidents that have not fired for clear_cycles consecutive cycles"""
+        now = datetime.now().isoformat()
+        resolved = []
+        
+        with self.incidents_lock:
+            for fingerprint, incident in list(self.incidents.items()):
+                if fingerprint in firing_fingerprints:
+                    continue
+                incident["clean_cycles"] += 1
+                if incident["clean_cycles"] >= self.incident_settings["clear_cycles"]:
+                    resolved.append(incident)
+                    del self.incidents[fingerprint]
+        
+        if not resolved:
+            return 0
+        
+        conn = workspace_db.connect(self.alerts_database)
+        cursor = conn.cursor()
+        
+        cursor.executemany('''
+            UPDATE alerts SET status = 'resolved', resolved_at = ? WHERE alert_id = ?
+        ''', [(now, incident["alert_id"]) for incident in resolved])
+        
+        cursor.executemany('''
+            INSERT INTO alert_history 
+            (timestamp, alert_id, action, details, user)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [(now, incident["alert_id"], "auto_resolved",
+               f"Clear for {self.incident_settings['clear_cycles']} cycles", "system")
+              for incident in resolved])
+        
+        conn.commit()
+        conn.close()
         
-        # Console notification
-        if self.alert_channels["console"]:
-            self.send_console_notification(alert_id, agent_id, alert_type, alert_level, alert_message, timestamp)
+        for incident in resolved:
+            print(f"✅ Alert auto-resolved: {incident['alert_type']} for agent {incident['agent_id']}")
         
-        # Log notification
-        if self.alert_channels["log"]:
-            self.send_log_notification(alert_id, agent_id, alert_type, alert_level, alert_message, timestamp)
+        return len(resolved)
+    
+    def suppress_alerts(self, agent_id=None, alert_type=None, duration=3600, reason=None, user="admin"):
+        """Mute notifications for matching alerts (None matches any) for a time window"""
+        now = datetime.now()
+        ends_at = now + timedelta(seconds=duration)
         
-        # Email notification
-        if self.alert_channels["email"]:
-            self.send_email_notification(alert_id, agent_id, alert_type, alert_level, alert_message, timestamp)
+        conn = workspace_db.connect(self.alerts_database)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT INTO alert_suppressions 
+            (created_at, agent_id, alert_type, starts_at, ends_at, reason, user)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (now.isoformat(), agent_id, alert_type, now.isoformat(), ends_at.isoformat(), reason, user))
+        suppression_id = cursor.lastrowid
+        
+        conn.commit()
+        conn.close()
+        
+        print(f"🔕 Alerts suppressed until {ends_at.strftime('%H:%M:%S')}: agent={agent_id or '*'} type={alert_type or '*'}")
+        return suppression_id
+    
+    def is_suppressed(self, cursor, agent_id, alert_type, now):
+        """Check whether a suppression window covers this alert"""
+        cursor.execute('''
+            SELECT 1 FROM alert_suppressions
+            WHERE starts_at <= ? AND ends_at > ?
+              AND (agent_id IS NULL OR agent_id = ?)
+              AND (alert_type IS NULL OR alert_type = ?)
+            LIMIT 1
+        ''', (now.isoformat(), now.isoformat(), agent_id, alert_type))
+        return cursor.fetchone() is not None
+    
+    def send_notifications(self, alert_id, agent_id, alert_type, alert_level, alert_message):
+        """Queue notifications for configured channels (delivery happens on the dispatcher)"""
+        notification = {
+            "alert_id": alert_id,
+            "agent_id": agent_id,
+            "alert_type": alert_type,
+            "alert_level": alert_level,
+            "alert_message": alert_message,
+            "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
         
-        # Webhook notification
-        if self.alert_channels["webhook"]:
-            self.send_webhook_notification(alert_id, agent_id, alert_type, alert_level, alert_message, timestamp)
+        for channel, enabled in self.alert_channels.items():
+            if enabled:
+                self.dispatcher.enqueue(channel, notification)
     
-    def send_console_notification(self, alert_id, agent_id, alert_type, alert_level, alert_message, timestamp):
+    def send_console_notification(self, notifications):
         """Send console notification"""
-        try:
-            level_emoji = {
-                "info": "ℹ️",
-                "warning": "⚠️",
-                "error": "❌",
-                "critical": "🚨"
-            }
-            
-            emoji = level_emoji.get(alert_level, "📢")
+        level_emoji = {
+            "info": "ℹ️",
+            "warning": "⚠️",
+            "error": "❌",
+            "critical": "🚨"
+        }
+        
+        for notification in notifications:
+            emoji = level_emoji.get(notification["alert_level"], "📢")
             
             print(f"\n{emoji} ALERT {emoji}")
-            print(f"Time: {timestamp}")
-            print(f"Agent: {agent_id}")
-            print(f"Type: {alert_type}")
-            print(f"Level: {alert_level.upper()}")
-            print(f"Message: {alert_message}")
-            print(f"Alert ID: {alert_id}")
+            print(f"Time: {notification['timestamp']}")
+            print(f"Agent: {notification['agent_id']}")
+            print(f"Type: {notification['alert_type']}")
+            print(f"Level: {notification['alert_level'].upper()}")
+            print(f"Message: {notification['alert_message']}")
+            print(f"Alert ID: {notification['alert_id']}")
             print("=" * 50)
-            
-            self.log_notification(alert_id, "console", "success", f"Console notification sent")
-            
-        except Exception as e:
-            self.log_notification(alert_id, "console", "failed", f"Console notification failed: {str(e)}")
     
-    def send_log_notification(self, alert_id, agent_id, alert_type, alert_level, alert_message, timestamp):
+    def send_log_notification(self, notifications):
         """Send log notification"""
-        try:
-            log_entry = f"[{timestamp}] ALERT - Agent: {agent_id}, Type: {alert_type}, Level: {alert_level}, Message: {alert_message}, ID: {alert_id}\n"
-            
-            with open("logs/monitoring_alerts.log", "a") as f:
-                f.write(log_entry)
-            
-            self.log_notification(alert_id, "log", "success", f"Log notification sent")
-            
-        except Exception as e:
-            self.log_notification(alert_id, "log", "failed", f"Log notification failed: {str(e)}")
+        with open("logs/monitoring_alerts.log", "a") as f:
+            for n in notifications:
+                f.write(f"[{n['timestamp']}] ALERT - Agent: {n['agent_id']}, Type: {n['alert_type']}, "
+                        f"Level: {n['alert_level']}, Message: {n['alert_message']}, ID: {n['alert_id']}\n")
     
-    def send_email_notification(self, alert_id, agent_id, alert_type, alert_level, alert_message, timestamp):
-        """Send email notification (placeholder)"""
-        try:
-            # Email configuration would go here
-            # For now, just log the attempt
-            self.log_notification(alert_id, "email", "skipped", "Email notifications disabled")
-            
-        except Exception as e:
-            self.log_notification(alert_id, "email", "failed", f"Email notification failed: {str(e)}")
+    def send_email_notification(self, notifications):
+        """Send email notification (one message per batch)"""
+        settings = self.notification_settings["email"]
+        if not settings["to"]:
+            return ("skipped", "Email notifications not configured (no recipients)")
+        
+        if len(notifications) == 1:
+            n = notifications[0]
+            subject = f"[{n['alert_level'].upper()}] {n['alert_type']} on agent {n['agent_id']}"
+        else:
+            subject = f"ZombieCoder alert digest: {len(notifications)} alerts"
+        
+        body = "\n".join(
+            f"[{n['timestamp']}] {n['alert_level'].upper()} {n['agent_id']} {n['alert_type']}: "
+            f"{n['alert_message']} (ID: {n['alert_id']})"
+            for n in notifications
+        )
+        
+        message = MIMEMultipart()
+        message["From"] = settings["from"]
+        message["To"] = ", ".join(settings["to"])
+        message["Subject"] = subject
+        message.attach(MIMEText(body, "plain", "utf-8"))
+        
+        with smtplib.SMTP(settings["smtp_host"], settings["smtp_port"], timeout=settings["timeout"]) as smtp:
+            if settings["use_tls"]:
+                smtp.starttls()
+            if settings["username"]:
+                smtp.login(settings["username"], settings["password"])
+            smtp.send_message(message)
     
-    def send_webhook_notification(self, alert_id, agent_id, alert_type, alert_level, alert_message, timestamp):
-        """Send webhook notification (placeholder)"""
-        try:
-            # Webhook configuration would go here
-            # For now, just log the attempt
-            self.log_notification(alert_id, "webhook", "skipped", "Webhook notifications disabled")
-            
-        except Exception as e:
-            self.log_notification(alert_id, "webhook", "failed", f"Webhook notification failed: {str(e)}")
+    def send_webhook_notification(self, notifications):
+        """Send webhook notification (one POST per batch)"""
+        settings = self.notification_settings["webhook"]
+        if not settings["url"]:
+            return ("skipped", "Webhook notifications not configured (no URL)")
+        
+        response = requests.post(settings["url"], json={
+            "source": "zombiecoder-monitoring",
+            "digest": len(notifications) > 1,
+            "alerts": notifications
+        }, headers=settings["headers"], timeout=settings["timeout"])
+        response.raise_for_status()
+    
+    def record_deliveries(self, channel, notifications, status, message):
+        """Log the outcome of one delivery attempt for every alert in it"""
+        conn = workspace_db.connect(self.alerts_database)
+        cursor = conn.cursor()
+        
+        cursor.executemany('''
+            INSERT INTO notification_log 
+            (timestamp, alert_id, channel, status, message)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [(datetime.now().isoformat(), n["alert_id"], channel, status, message) for n in notifications])
+        
+        conn.commit()
+        conn.close()
     
     def log_notification(self, alert_id, channel, status, message):
         """Log notification attempt"""
-        conn = sqlite3.connect(self.alerts_database)
+        conn = workspace_db.connect(self.alerts_database)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -383,7 +958,7 @@ class MonitoringAlerts:
     
     def acknowledge_alert(self, alert_id, user="admin"):
         """Acknowledge an alert"""
-        conn = sqlite3.connect(self.alerts_database)
+        conn = workspace_db.connect(self.alerts_database)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -403,7 +978,12 @@ class MonitoringAlerts:
     
     def resolve_alert(self, alert_id, user="admin"):
         """Resolve an alert"""
-        conn = sqlite3.connect(self.alerts_database)
+        with self.incidents_lock:
+            for fingerprint, incident in list(self.incidents.items()):
+                if incident["alert_id"] == alert_id:
+                    del self.incidents[fingerprint]
+        
+        conn = workspace_db.connect(self.alerts_database)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -426,7 +1006,8 @@ class MonitoringAlerts:
         print("🧟 Monitoring Alerts - Starting Alert System")
         print("=" * 50)
         
-        # Start monitoring in background thread
+        # Start notification delivery, then monitoring in background thread
+        self.dispatcher.start()
         monitoring_thread = threading.Thread(target=self.monitoring_loop)
         monitoring_thread.daemon = True
         monitoring_thread.start()
@@ -438,29 +1019,29 @@ class MonitoringAlerts:
         """Main monitoring loop"""
         while True:
             try:
+                cycle_start = time.time()
                 print(f"🔍 Running monitoring cycle... {datetime.now().strftime('%H:%M:%S')}")
                 
+                # One snapshot per cycle, evaluated against every agent's rules
+                snapshot = self.collect_snapshot()
+                
+                firing = set()
                 for agent_id in self.agents:
-                    # Check system health
-                    system_alerts = self.check_system_health(agent_id)
-                    for alert in system_alerts:
-                        self.create_alert(agent_id, alert["alert_type"], alert["alert_level"], 
-                                        alert["alert_message"], alert["alert_data"])
-                    
-                    # Check agent status
-                    agent_alerts = self.check_agent_status(agent_id)
-                    for alert in agent_alerts:
-                        self.create_alert(agent_id, alert["alert_type"], alert["alert_level"], 
-                                        alert["alert_message"], alert["alert_data"])
-                    
-                    # Check service health
-                    service_alerts = self.check_service_health(agent_id)
-                    for alert in service_alerts:
+                    alerts = (self.check_system_health(agent_id, snapshot) +
+                              self.check_agent_status(agent_id, snapshot) +
+                              self.check_service_health(agent_id, snapshot))
+                    for alert in alerts:
+                        firing.add(self.alert_fingerprint(agent_id, alert["alert_type"],
+                                                          alert["alert_level"], alert["alert_data"]))
                         self.create_alert(agent_id, alert["alert_type"], alert["alert_level"], 
                                         alert["alert_message"], alert["alert_data"])
                 
-                # Wait for next cycle
-                time.sleep(self.alert_interval)
+                # Incidents that stopped firing resolve once they stay clear
+                self.clear_incidents(firing)
+                
+                # Wait for next cycle (interval is measured start to start)
+                self.last_cycle_duration = time.time() - cycle_start
+                time.sleep(max(0, self.alert_interval - self.last_cycle_duration))
                 
             except Exception as e:
                 print(f"Monitoring loop error: {str(e)}")
@@ -468,7 +1049,7 @@ class MonitoringAlerts:
     
     def get_alerts_status(self):
         """Get current alerts status"""
-        conn = sqlite3.connect(self.alerts_database)
+        conn = workspace_db.connect(self.alerts_database)
         cursor = conn.cursor()
         
         # Get active alerts count
@@ -479,9 +1060,16 @@ class MonitoringAlerts:
         ''')
         active_alerts = dict(cursor.fetchall())
         
+        # Get flapping incidents count
+        cursor.execute('''
+            SELECT COUNT(*) FROM alerts WHERE status = 'flapping'
+        ''')
+        flapping_alerts = cursor.fetchone()[0]
+        
         # Get recent alerts
         cursor.execute('''
-            SELECT alert_id, agent_id, alert_type, alert_level, alert_message, timestamp
+            SELECT alert_id, agent_id, alert_type, alert_level, alert_message, timestamp,
+                   occurrence_count, last_seen, status
             FROM alerts
             ORDER BY timestamp DESC
             LIMIT 10
@@ -501,8 +1089,11 @@ class MonitoringAlerts:
         return {
             "timestamp": datetime.now().isoformat(),
             "active_alerts": active_alerts,
+            "flapping_alerts": flapping_alerts,
             "recent_alerts": recent_alerts,
             "notification_stats": notification_stats,
+            "last_cycle_duration": self.last_cycle_duration,
+            "notification_queue": self.dispatcher.get_stats(),
             "monitoring_active": True
         }
     
@@ -517,6 +1108,8 @@ class MonitoringAlerts:
             "alert_interval": self.alert_interval,
             "alert_thresholds": self.alert_thresholds,
             "alert_channels": self.alert_channels,
+            "incident_settings": self.incident_settings,
+            "metrics_store": self.metrics_store.get_stats(),
             "alerts_status": status,
             "system_status": "active"
         }
@@ -551,6 +1144,7 @@ def main():
                 active_count = sum(status['active_alerts'].values())
                 print(f"🚨 Monitoring alerts running... Active alerts: {active_count}")
         except KeyboardInterrupt:
+            alerts.dispatcher.stop(timeout=10)
             print("\n👋 Monitoring alerts system stopped by user")
     else:
         print("\n❌ Monitoring alerts system setup failed!")
@@ -6,13 +6,39 @@ Pump/Automation - Automated Performance Tuning
 
 import json
 import time
+import warnings
 import threading
 from datetime import datetime, timedelta
-import sqlite3
 import os
+import sys
 import subprocess
 import psutil
 import requests
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "shared"))
+from metrics_store import MetricsStore
+import workspace_db
+
+# Metrics analysed for anomalies: which way is bad, where the limit is and what fixes it
+ANOMALY_METRICS = {
+    "cpu_usage": {
+        "direction": 1, "threshold": "cpu_usage",
+        "type": "cpu_optimization", "action": "optimize_cpu_usage", "estimated_improvement": 15.0
+    },
+    "memory_usage": {
+        "direction": 1, "threshold": "memory_usage",
+        "type": "memory_optimization", "action": "optimize_memory_usage", "estimated_improvement": 20.0
+    },
+    "disk_usage": {
+        "direction": 1, "threshold": "disk_usage",
+        "type": "disk_cleanup", "action": "cleanup_disk_space", "estimated_improvement": 10.0
+    },
+    "performance_score": {
+        "direction": -1, "limit": 60.0,
+        "type": "general_optimization", "action": "general_optimization", "estimated_improvement": 25.0
+    }
+}
 
 class PerformanceTuner:
     def __init__(self):
@@ -25,11 +51,24 @@ class PerformanceTuner:
             "disk_usage": 90.0,
             "response_time": 2.0
         }
+        self.anomaly_settings = {
+            "history_window": 6 * 3600,  # seconds of history analysed per cycle
+            "step": 60,                  # bucket size in seconds
+            "min_points": 10,            # buckets needed before a series is analysed
+            "ewma_alpha": 0.1,           # smoothing for the EWMA baseline and variance
+            "min_std": 1.0,              # floor for the baseline std, so flat series don't explode z
+            "z_threshold": 3.0,
+            "trend_window": 30,          # buckets used for the rate-of-change fit
+            "forecast_horizon": 3600,    # flag metrics projected to cross their limit within this (seconds)
+            "season": 86400,             # compare with the same time one season ago
+            "seasonal_threshold": 3.0
+        }
+        self.metrics_store = MetricsStore()
         self.setup_database()
         
     def setup_database(self):
         """Setup performance tuner database"""
-        conn = sqlite3.connect(self.tuning_database)
+        conn = workspace_db.connect(self.tuning_database)
         cursor = conn.cursor()
         
         # Create performance metrics table
@@ -95,33 +134,23 @@ class PerformanceTuner:
             # Calculate performance score
             performance_score = self.calculate_performance_score(cpu_usage, memory.percent, disk.percent)
             
-            # Store metrics
-            conn = sqlite3.connect(self.tuning_database)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT INTO performance_metrics 
-                (timestamp, agent_id, cpu_usage, memory_usage, disk_usage, response_time, 
-                 network_usage, active_connections, performance_score)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                datetime.now().isoformat(), agent_id, cpu_usage, memory.percent,
-                disk.percent, 0.0, network.bytes_sent + network.bytes_recv,
-                len(psutil.pids()), performance_score
-            ))
-            
-            conn.commit()
-            conn.close()
-            
-            return {
+            metrics = {
                 "cpu_usage": cpu_usage,
                 "memory_usage": memory.percent,
                 "disk_usage": disk.percent,
                 "response_time": 0.0,
                 "network_usage": network.bytes_sent + network.bytes_recv,
+                "active_connections": len(psutil.pids()),
                 "performance_score": performance_score
             }
             
+            # Store metrics (buffered; flushed to the shared store in batches)
+            self.metrics_store.record_many({
+                f"performance.{agent_id}.{metric}": value for metric, value in metrics.items()
+            })
+            
+            return metrics
+            
         except Exception as e:
             print(f"Error collecting metrics for agent {agent_id}: {str(e)}")
             return None
@@ -137,8 +166,128 @@ class PerformanceTuner:
         overall_score = (cpu_score * 0.4 + memory_score * 0.4 + disk_score * 0.2)
         return round(overall_score, 2)
     
-    def analyze_performance(self, agent_id, metrics):
-        """Analyze performance and generate recommendations"""
+    def detect_anomalies(self, agent_ids=None, now=None):
+        """Windowed anomaly detection over metric history for all agents and metrics at once
+        
+        Every (agent, metric) series becomes a row of one matrix; EWMA baselines,
+        z-scores, trend slopes, time-to-limit and seasonal deviations are computed
+        for all rows together. Returns {agent_id: [recommendation, ...]} ranked by score.
+        """
+        settings = self.anomaly_settings
+        agent_ids = agent_ids or self.agents
+        now = time.time() if now is None else now
+        step = settings["step"]
+        
+        pairs = [(agent_id, metric) for agent_id in agent_ids for metric in ANOMALY_METRICS]
+        series = [f"performance.{agent_id}.{metric}" for agent_id, metric in pairs]
+        _, history = self.metrics_store.query_aligned(series, now - settings["history_window"], now, step)
+        
+        # Only analyse series with enough data; fill gaps with the last observed value
+        observed = ~np.isnan(history)
+        enough = observed.sum(axis=1) >= settings["min_points"]
+        if not enough.any():
+            return {}
+        history, observed = history[enough], observed[enough]
+        pairs = [pair for pair, keep in zip(pairs, enough) if keep]
+        rows = np.arange(len(pairs))[:, None]
+        
+        last_seen = np.maximum.accumulate(np.where(observed, np.arange(history.shape[1]), 0), axis=1)
+        filled = history[rows, last_seen]
+        first_seen = history[rows[:, 0], observed.argmax(axis=1)]
+        filled = np.where(np.isnan(filled), first_seen[:, None], filled)
+        latest = filled[:, -1]
+        
+        # EWMA baseline and variance up to (not including) the latest bucket
+        alpha = settings["ewma_alpha"]
+        mean = filled[:, 0].copy()
+        variance = np.zeros(len(pairs))
+        for column in filled[:, 1:-1].T:
+            diff = column - mean
+            mean += alpha * diff
+            variance = (1 - alpha) * (variance + alpha * diff * diff)
+        std = np.maximum(np.sqrt(variance), settings["min_std"])
+        
+        direction = np.array([ANOMALY_METRICS[metric]["direction"] for _, metric in pairs], dtype=float)
+        limits = np.array([
+            self.performance_thresholds[ANOMALY_METRICS[metric]["threshold"]]
+            if "threshold" in ANOMALY_METRICS[metric] else ANOMALY_METRICS[metric]["limit"]
+            for _, metric in pairs
+        ])
+        
+        # z-score of the latest bucket, signed so positive means "worse"
+        z_scores = direction * (latest - mean) / std
+        
+        # Rate of change: least-squares slope over the trend window (units per second)
+        window = filled[:, -min(settings["trend_window"], filled.shape[1]):]
+        x = np.arange(window.shape[1]) * step
+        x = x - x.mean()
+        slope = (window - window.mean(axis=1, keepdims=True)) @ x / max((x @ x), 1e-9)
+        
+        # Time until the limit is crossed at the current rate (0 when already past it)
+        headroom = direction * (limits - latest)
+        approach = direction * slope
+        with np.errstate(divide="ignore", invalid="ignore"):
+            time_to_limit = np.where(headroom <= 0, 0.0,
+                                     np.where(approach > 0, headroom / approach, np.inf))
+        
+        # Seasonal comparison: recent window vs the same window one season ago
+        season_start = now - settings["season"] - window.shape[1] * step
+        _, seasonal = self.metrics_store.query_aligned(series, season_start, season_start + window.shape[1] * step, step)
+        seasonal = seasonal[enough]
+        with np.errstate(invalid="ignore"), warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN rows: no data a season ago
+            seasonal_mean = np.nanmean(seasonal, axis=1)
+            seasonal_std = np.sqrt(np.nanvar(seasonal, axis=1) + std ** 2)
+            seasonal_deviation = np.nan_to_num(direction * (window.mean(axis=1) - seasonal_mean) / seasonal_std)
+        
+        # Score every signal so that >= 1 means "fires", then rank by the strongest
+        horizon = settings["forecast_horizon"]
+        signal_scores = np.vstack([
+            np.where(headroom <= 0, 2.0 + np.abs(headroom) / np.maximum(np.abs(limits), 1.0), 0.0),
+            np.where(time_to_limit < horizon, 1.0 + (1.0 - time_to_limit / horizon), 0.0),
+            np.maximum(z_scores, 0.0) / settings["z_threshold"],
+            np.maximum(seasonal_deviation, 0.0) / settings["seasonal_threshold"]
+        ])
+        scores = signal_scores.max(axis=0)
+        
+        anomalies = {}
+        for index in np.argsort(-scores):
+            if scores[index] < 1.0:
+                break
+            agent_id, metric = pairs[index]
+            profile = ANOMALY_METRICS[metric]
+            
+            signals = []
+            if headroom[index] <= 0:
+                signals.append(f"past limit {limits[index]:.1f}")
+            elif time_to_limit[index] < horizon:
+                signals.append(f"reaches {limits[index]:.1f} in ~{time_to_limit[index] / 60:.0f} min "
+                               f"({slope[index] * 3600:+.1f}/h)")
+            if z_scores[index] >= settings["z_threshold"]:
+                signals.append(f"{z_scores[index]:.1f}σ from baseline {mean[index]:.1f}")
+            if seasonal_deviation[index] >= settings["seasonal_threshold"]:
+                signals.append(f"{seasonal_deviation[index]:.1f}σ from this time yesterday ({seasonal_mean[index]:.1f})")
+            
+            leak = metric == "memory_usage" and signal_scores[1, index] >= 1.0 and headroom[index] > 0
+            anomalies.setdefault(agent_id, []).append({
+                "type": "memory_leak_suspected" if leak else profile["type"],
+                "description": f"{metric} at {latest[index]:.1f}: " + "; ".join(signals),
+                "priority": "high" if scores[index] >= 1.5 else "medium",
+                "estimated_improvement": profile["estimated_improvement"],
+                "action": profile["action"],
+                "score": round(float(scores[index]), 3),
+                "metric": metric
+            })
+        
+        return anomalies
+    
+    def analyze_performance(self, agent_id, metrics, anomalies=None):
+        """Analyze performance and generate recommendations ranked by score
+        
+        Combines fixed thresholds on the current sample with windowed anomaly
+        detection over history (pass anomalies from detect_anomalies() to reuse
+        a detection run across agents).
+        """
         recommendations = []
         
         # CPU analysis
@@ -148,7 +297,8 @@ class PerformanceTuner:
                 "description": f"High CPU usage detected: {metrics['cpu_usage']:.1f}%",
                 "priority": "high",
                 "estimated_improvement": 15.0,
-                "action": "optimize_cpu_usage"
+                "action": "optimize_cpu_usage",
+                "score": 2.0
             })
         
         # Memory analysis
@@ -158,7 +308,8 @@ class PerformanceTuner:
                 "description": f"High memory usage detected: {metrics['memory_usage']:.1f}%",
                 "priority": "high",
                 "estimated_improvement": 20.0,
-                "action": "optimize_memory_usage"
+                "action": "optimize_memory_usage",
+                "score": 2.0
             })
         
         # Disk analysis
@@ -168,7 +319,8 @@ class PerformanceTuner:
                 "description": f"High disk usage detected: {metrics['disk_usage']:.1f}%",
                 "priority": "medium",
                 "estimated_improvement": 10.0,
-                "action": "cleanup_disk_space"
+                "action": "cleanup_disk_space",
+                "score": 2.0
             })
         
         # Performance score analysis
@@ -178,10 +330,20 @@ class PerformanceTuner:
                 "description": f"Low performance score: {metrics['performance_score']:.1f}",
                 "priority": "high",
                 "estimated_improvement": 25.0,
-                "action": "general_optimization"
+                "action": "general_optimization",
+                "score": 2.0
             })
         
-        return recommendations
+        # History-based findings; keep the stronger one when both point at the same action
+        if anomalies is None:
+            anomalies = self.detect_anomalies([agent_id])
+        by_action = {rec["action"]: rec for rec in recommendations}
+        for rec in anomalies.get(agent_id, []) if isinstance(anomalies, dict) else anomalies:
+            current = by_action.get(rec["action"])
+            if not current or rec["score"] > current["score"]:
+                by_action[rec["action"]] = rec
+        
+        return sorted(by_action.values(), key=lambda rec: rec["score"], reverse=True)
     
     def apply_optimization(self, agent_id, recommendation):
         """Apply optimization based on recommendation"""
@@ -191,7 +353,7 @@ class PerformanceTuner:
         print(f"🔧 Applying optimization for agent {agent_id}: {action_description}")
         
         # Store tuning action
-        conn = sqlite3.connect(self.tuning_database)
+        conn = workspace_db.connect(self.tuning_database)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -353,7 +515,7 @@ class PerformanceTuner:
     
     def update_tuning_action(self, agent_id, action_type, status, result):
         """Update tuning action status"""
-        conn = sqlite3.connect(self.tuning_database)
+        conn = workspace_db.connect(self.tuning_database)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -371,7 +533,7 @@ class PerformanceTuner:
     
     def store_recommendations(self, agent_id, recommendations):
         """Store optimization recommendations"""
-        conn = sqlite3.connect(self.tuning_database)
+        conn = workspace_db.connect(self.tuning_database)
         cursor = conn.cursor()
         
         for rec in recommendations:
@@ -407,13 +569,16 @@ class PerformanceTuner:
             try:
                 print(f"🔍 Running performance tuning cycle... {datetime.now().strftime('%H:%M:%S')}")
                 
-                for agent_id in self.agents:
-                    # Collect metrics
-                    metrics = self.collect_performance_metrics(agent_id)
-                    
+                # Collect metrics
+                agent_metrics = {agent_id: self.collect_performance_metrics(agent_id) for agent_id in self.agents}
+                
+                # One detection pass over the history of every agent and metric
+                anomalies = self.detect_anomalies()
+                
+                for agent_id, metrics in agent_metrics.items():
                     if metrics:
                         # Analyze performance
-                        recommendations = self.analyze_performance(agent_id, metrics)
+                        recommendations = self.analyze_performance(agent_id, metrics, anomalies)
                         
                         if recommendations:
                             print(f"   📊 Found {len(recommendations)} recommendations for agent {agent_id}")
@@ -421,7 +586,7 @@ class PerformanceTuner:
                             # Store recommendations
                             self.store_recommendations(agent_id, recommendations)
                             
-                            # Apply high priority optimizations
+                            # Apply high priority optimizations, strongest first
                             for rec in recommendations:
                                 if rec["priority"] == "high":
                                     self.apply_optimization(agent_id, rec)
@@ -435,35 +600,16 @@ class PerformanceTuner:
     
     def get_performance_status(self):
         """Get current performance status"""
-        conn = sqlite3.connect(self.tuning_database)
+        conn = workspace_db.connect(self.tuning_database)
         cursor = conn.cursor()
         
         # Get latest metrics for each agent
         agent_metrics = {}
         for agent_id in self.agents:
-            cursor.execute('''
-                SELECT cpu_usage, memory_usage, disk_usage, performance_score
-                FROM performance_metrics
-                WHERE agent_id = ?
-                ORDER BY timestamp DESC
-                LIMIT 1
-            ''', (agent_id,))
-            
-            result = cursor.fetchone()
-            if result:
-                agent_metrics[agent_id] = {
-                    "cpu_usage": result[0],
-                    "memory_usage": result[1],
-                    "disk_usage": result[2],
-                    "performance_score": result[3]
-                }
-            else:
-                agent_metrics[agent_id] = {
-                    "cpu_usage": 0,
-                    "memory_usage": 0,
-                    "disk_usage": 0,
-                    "performance_score": 0
-                }
+            agent_metrics[agent_id] = {
+                metric: self.metrics_store.latest(f"performance.{agent_id}.{metric}") or 0
+                for metric in ("cpu_usage", "memory_usage", "disk_usage", "performance_score")
+            }
         
         # Get pending recommendations
         cursor.execute('''
@@ -493,6 +639,7 @@ class PerformanceTuner:
             "tuning_interval": self.tuning_interval,
             "performance_thresholds": self.performance_thresholds,
             "tuner_status": status,
+            "metrics_store": self.metrics_store.get_stats(),
             "system_status": "active"
         }
         
@@ -4,27 +4,64 @@ Task Scheduler System
 Pump/Automation - Automated Task Scheduling for All Agents
 """
 
+import re
 import json
 import time
+import heapq
+import random
 import threading
-import schedule
+import concurrent.futures
 from datetime import datetime, timedelta
-import sqlite3
 import os
 import subprocess
 import requests
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "shared"))
+import workspace_db
+
+# Recurring frequencies: "hourly", "daily", or "every_<n>_<minutes|hours|days>"
+FREQUENCY_ALIASES = {"hourly": "every_1_hours", "daily": "every_1_days"}
+FREQUENCY_PATTERN = re.compile(r"every_(\d+)_(minutes|hours|days)")
+FREQUENCY_UNITS = {"minutes": 60, "hours": 3600, "days": 86400}
 
 class TaskScheduler:
-    def __init__(self):
+    def __init__(self, max_workers=4, catchup_policy="run_once"):
         self.scheduler_database = "task_scheduler.db"
         self.agents = ["programming", "bestpractices", "verifier", "conversational", "ops"]
         self.scheduled_tasks = {}
         self.running_tasks = {}
+        self.pending_runs = {}  # task_id -> runs queued behind the running one ("run_all" only)
+        
+        # Timer heap of (due_ts, seq, task_id, slot_ts); entries whose slot no longer
+        # matches scheduled_tasks[task_id]["slot"] are stale and dropped when popped
+        self.timer_heap = []
+        self.timer_seq = 0
+        self.condition = threading.Condition()
+        self.stopping = False
+        self.scheduler_thread = None
+        self.max_workers = max_workers
+        self.executor = None
+        
+        # Missed runs after downtime: "run_once" (one catch-up run), "run_all"
+        # (every missed run, up to max_catchup_runs) or "skip" (wait for the next slot)
+        self.catchup_policy = catchup_policy
+        self.max_catchup_runs = 10
+        
+        # Random delay added to each run so tasks sharing a slot do not stampede
+        self.jitter_ratio = 0.05
+        self.max_jitter = 60
+        
+        # Task state and execution logs are written in one batch every flush_interval
+        self.flush_interval = 5
+        self.pending_updates = {}
+        self.pending_logs = []
+        self.pending_lock = threading.Lock()
         self.setup_database()
         
     def setup_database(self):
         """Setup task scheduler database"""
-        conn = sqlite3.connect(self.scheduler_database)
+        conn = workspace_db.connect(self.scheduler_database)
         cursor = conn.cursor()
         
         # Create scheduled tasks table
@@ -64,7 +101,7 @@ class TaskScheduler:
     
     def schedule_task(self, task_id, agent_id, task_name, task_type, schedule_time, task_data, frequency=None):
         """Schedule a new task"""
-        conn = sqlite3.connect(self.scheduler_database)
+        conn = workspace_db.connect(self.scheduler_database)
         cursor = conn.cursor()
         
         # Calculate next run time
@@ -86,52 +123,82 @@ class TaskScheduler:
         conn.close()
         
         # Add to scheduler
-        self.add_to_scheduler(task_id, agent_id, task_name, task_type, task_data, frequency)
+        self.add_to_scheduler(task_id, agent_id, task_name, task_type, task_data, frequency,
+                              next_run if frequency else schedule_time)
         
         print(f"✅ Task scheduled: {task_name} for agent {agent_id}")
     
-    def add_to_scheduler(self, task_id, agent_id, task_name, task_type, task_data, frequency):
-        """Add task to Python scheduler"""
-        if frequency == "daily":
-            schedule.every().day.at(task_data.get('time', '09:00')).do(
-                self.execute_task, task_id, agent_id, task_name, task_type, task_data
-            )
-        elif frequency == "hourly":
-            schedule.every().hour.do(
-                self.execute_task, task_id, agent_id, task_name, task_type, task_data
-            )
-        elif frequency == "every_5_minutes":
-            schedule.every(5).minutes.do(
-                self.execute_task, task_id, agent_id, task_name, task_type, task_data
-            )
-        elif frequency == "every_10_minutes":
-            schedule.every(10).minutes.do(
-                self.execute_task, task_id, agent_id, task_name, task_type, task_data
-            )
+    def frequency_interval(self, frequency):
+        """Interval in seconds for a recurring frequency (None for one-time tasks)"""
+        if not frequency:
+            return None
+        match = FREQUENCY_PATTERN.fullmatch(FREQUENCY_ALIASES.get(frequency, frequency))
+        if not match:
+            return None
+        return int(match.group(1)) * FREQUENCY_UNITS[match.group(2)]
+    
+    def add_to_scheduler(self, task_id, agent_id, task_name, task_type, task_data, frequency, next_run=None):
+        """Add task to the timer heap"""
+        interval = self.frequency_interval(frequency)
+        now = time.time()
+        
+        if next_run:
+            slot = datetime.fromisoformat(next_run).timestamp()
+        elif interval:
+            slot = now + interval
         else:
-            # One-time task
-            schedule_time = datetime.fromisoformat(task_data.get('schedule_time', datetime.now().isoformat()))
-            if schedule_time <= datetime.now():
-                # Execute immediately
-                self.execute_task(task_id, agent_id, task_name, task_type, task_data)
-            else:
-                # Schedule for later
-                schedule.every().day.at(schedule_time.strftime('%H:%M')).do(
-                    self.execute_task, task_id, agent_id, task_name, task_type, task_data
-                )
+            slot = datetime.fromisoformat(task_data.get('schedule_time', datetime.now().isoformat())).timestamp()
+        
+        # Daily tasks run at their configured wall-clock time
+        if interval and interval % 86400 == 0 and task_data.get('time'):
+            hour, minute = map(int, task_data['time'].split(':'))
+            at = datetime.fromtimestamp(slot).replace(hour=hour, minute=minute, second=0, microsecond=0)
+            slot = at.timestamp()
+        
+        if interval and slot <= now:
+            slot = self.catch_up_slot(slot, interval, now)
+        
+        task = {
+            "task_id": task_id,
+            "agent_id": agent_id,
+            "task_name": task_name,
+            "task_type": task_type,
+            "task_data": task_data,
+            "frequency": frequency,
+            "interval": interval,
+            "slot": slot
+        }
+        with self.condition:
+            self.scheduled_tasks[task_id] = task
+            self.push_timer(task)
+            self.condition.notify()
+    
+    def catch_up_slot(self, slot, interval, now):
+        """Apply the catch-up policy to a slot that is already in the past"""
+        missed = int((now - slot) // interval) + 1
+        latest_missed = slot + (missed - 1) * interval
+        
+        if self.catchup_policy == "skip":
+            return latest_missed + interval
+        if self.catchup_policy == "run_all":
+            # Run each missed slot in turn, but never more than max_catchup_runs of them
+            return max(slot, latest_missed - (self.max_catchup_runs - 1) * interval)
+        return latest_missed
+    
+    def push_timer(self, task):
+        """Push a task's current slot onto the heap, with jitter"""
+        jitter = random.uniform(0, min((task["interval"] or 0) * self.jitter_ratio, self.max_jitter))
+        due = max(task["slot"], time.time()) + jitter
+        self.timer_seq += 1
+        heapq.heappush(self.timer_heap, (due, self.timer_seq, task["task_id"], task["slot"]))
     
     def calculate_next_run(self, schedule_time, frequency):
         """Calculate next run time based on frequency"""
         base_time = datetime.fromisoformat(schedule_time)
+        interval = self.frequency_interval(frequency)
         
-        if frequency == "daily":
-            return (base_time + timedelta(days=1)).isoformat()
-        elif frequency == "hourly":
-            return (base_time + timedelta(hours=1)).isoformat()
-        elif frequency == "every_5_minutes":
-            return (base_time + timedelta(minutes=5)).isoformat()
-        elif frequency == "every_10_minutes":
-            return (base_time + timedelta(minutes=10)).isoformat()
+        if interval:
+            return (base_time + timedelta(seconds=interval)).isoformat()
         else:
             return schedule_time
     
@@ -144,7 +211,7 @@ class TaskScheduler:
         
         try:
             # Mark task as running
-            self.update_task_status(task_id, "running")
+            self.queue_task_update(task_id, status="running", last_run=execution_time)
             
             # Execute based on task type
             if task_type == "model_optimization":
@@ -164,25 +231,24 @@ class TaskScheduler:
             duration = time.time() - start_time
             
             # Log successful execution
-            self.log_task_execution(task_id, execution_time, "completed", result, None, duration)
+            self.queue_execution_log(task_id, execution_time, "completed", result, None, duration)
             
-            # Update task status
-            self.update_task_status(task_id, "completed")
+            # Update task status (recurring tasks go back to scheduled)
+            task = self.scheduled_tasks.get(task_id, {})
+            self.queue_task_update(task_id, status="scheduled" if task.get("interval") else "completed")
             
             print(f"✅ Task completed: {task_name} (Duration: {duration:.2f}s)")
             
-            # Schedule next run if recurring
-            self.schedule_next_run(task_id)
-            
         except Exception as e:
             duration = time.time() - start_time
             error_message = str(e)
             
             # Log failed execution
-            self.log_task_execution(task_id, execution_time, "failed", None, error_message, duration)
+            self.queue_execution_log(task_id, execution_time, "failed", None, error_message, duration)
             
-            # Update task status
-            self.update_task_status(task_id, "failed")
+            # Update task status (a failed run does not stop a recurring task)
+            task = self.scheduled_tasks.get(task_id, {})
+            self.queue_task_update(task_id, status="scheduled" if task.get("interval") else "failed")
             
             print(f"❌ Task failed: {task_name} - {error_message}")
     
@@ -345,7 +411,7 @@ class TaskScheduler:
     
     def update_task_status(self, task_id, status):
         """Update task status in database"""
-        conn = sqlite3.connect(self.scheduler_database)
+        conn = workspace_db.connect(self.scheduler_database)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -358,7 +424,7 @@ class TaskScheduler:
     
     def log_task_execution(self, task_id, execution_time, status, result, error_message, duration):
         """Log task execution"""
-        conn = sqlite3.connect(self.scheduler_database)
+        conn = workspace_db.connect(self.scheduler_database)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -373,29 +439,45 @@ class TaskScheduler:
         conn.commit()
         conn.close()
     
-    def schedule_next_run(self, task_id):
-        """Schedule next run for recurring tasks"""
-        conn = sqlite3.connect(self.scheduler_database)
+    def queue_task_update(self, task_id, **fields):
+        """Buffer a scheduled_tasks update for the next batched flush"""
+        with self.pending_lock:
+            self.pending_updates.setdefault(task_id, {}).update(fields)
+    
+    def queue_execution_log(self, task_id, execution_time, status, result, error_message, duration):
+        """Buffer a task_execution_log row for the next batched flush"""
+        with self.pending_lock:
+            self.pending_logs.append((
+                task_id, execution_time, status, json.dumps(result) if result else None,
+                error_message, duration
+            ))
+    
+    def flush_pending_writes(self):
+        """Write buffered task state and execution logs in one transaction"""
+        with self.pending_lock:
+            updates, self.pending_updates = self.pending_updates, {}
+            logs, self.pending_logs = self.pending_logs, []
+        if not updates and not logs:
+            return
+        
+        conn = workspace_db.connect(self.scheduler_database)
         cursor = conn.cursor()
         
-        cursor.execute('''
-            SELECT schedule_frequency, schedule_time FROM scheduled_tasks
-            WHERE task_id = ?
-        ''', (task_id,))
-        
-        result = cursor.fetchone()
-        if result and result[0]:  # If it's a recurring task
-            frequency = result[0]
-            schedule_time = result[1]
-            next_run = self.calculate_next_run(schedule_time, frequency)
-            
-            cursor.execute('''
-                UPDATE scheduled_tasks SET next_run = ?, status = 'scheduled'
+        for task_id, fields in updates.items():
+            columns = sorted(fields)
+            cursor.execute(f'''
+                UPDATE scheduled_tasks SET {', '.join(f"{column} = ?" for column in columns)}
                 WHERE task_id = ?
-            ''', (next_run, task_id))
-            
-            conn.commit()
+            ''', [fields[column] for column in columns] + [task_id])
+        
+        if logs:
+            cursor.executemany('''
+                INSERT INTO task_execution_log 
+                (task_id, execution_time, status, result, error_message, duration)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', logs)
         
+        conn.commit()
         conn.close()
     
     def start_scheduler(self):
@@ -406,33 +488,48 @@ class TaskScheduler:
         # Load existing tasks from database
         self.load_scheduled_tasks()
         
-        # Start scheduler in background thread
-        scheduler_thread = threading.Thread(target=self.run_scheduler)
-        scheduler_thread.daemon = True
-        scheduler_thread.start()
+        # Start scheduler in background thread; tasks run on a bounded pool
+        self.stopping = False
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers,
+                                                              thread_name_prefix="task")
+        self.scheduler_thread = threading.Thread(target=self.run_scheduler)
+        self.scheduler_thread.daemon = True
+        self.scheduler_thread.start()
         
         print("✅ Task scheduler started successfully")
         return True
     
+    def stop_scheduler(self):
+        """Stop the scheduler, wait for running tasks and flush state"""
+        with self.condition:
+            self.stopping = True
+            self.condition.notify()
+        if self.scheduler_thread:
+            self.scheduler_thread.join(timeout=10)
+        if self.executor:
+            self.executor.shutdown(wait=True)
+        self.flush_pending_writes()
+    
     def load_scheduled_tasks(self):
         """Load scheduled tasks from database"""
-        conn = sqlite3.connect(self.scheduler_database)
+        conn = workspace_db.connect(self.scheduler_database)
         cursor = conn.cursor()
         
         cursor.execute('''
             SELECT task_id, agent_id, task_name, task_type, schedule_time, 
-                   schedule_frequency, task_data, status
+                   schedule_frequency, task_data, status, next_run
             FROM scheduled_tasks
             WHERE status IN ('scheduled', 'running')
         ''')
         
         tasks = cursor.fetchall()
         for task in tasks:
-            task_id, agent_id, task_name, task_type, schedule_time, frequency, task_data, status = task
+            task_id, agent_id, task_name, task_type, schedule_time, frequency, task_data, status, next_run = task
             task_data = json.loads(task_data)
             
-            # Add to scheduler
-            self.add_to_scheduler(task_id, agent_id, task_name, task_type, task_data, frequency)
+            # Add to scheduler (missed runs are handled by the catch-up policy)
+            self.add_to_scheduler(task_id, agent_id, task_name, task_type, task_data, frequency,
+                                  next_run or schedule_time)
             
             print(f"   📅 Loaded task: {task_name} for agent {agent_id}")
         
@@ -440,15 +537,98 @@ class TaskScheduler:
         print(f"✅ Loaded {len(tasks)} scheduled tasks")
     
     def run_scheduler(self):
-        """Run the scheduler loop"""
+        """Run the scheduler loop: sleep until the next due task or flush"""
+        next_flush = time.time() + self.flush_interval
         while True:
             try:
-                schedule.run_pending()
-                time.sleep(1)
+                with self.condition:
+                    while not self.stopping:
+                        now = time.time()
+                        next_due = self.timer_heap[0][0] if self.timer_heap else float('inf')
+                        if next_due <= now or next_flush <= now:
+                            break
+                        self.condition.wait(min(next_due, next_flush) - now)
+                    if self.stopping:
+                        return
+                    
+                    due_tasks = []
+                    now = time.time()
+                    while self.timer_heap and self.timer_heap[0][0] <= now:
+                        _, _, task_id, slot = heapq.heappop(self.timer_heap)
+                        task = self.scheduled_tasks.get(task_id)
+                        if task and task["slot"] == slot:
+                            due_tasks.append(task)
+                
+                for task in due_tasks:
+                    self.dispatch_task(task)
+                
+                if time.time() >= next_flush:
+                    self.flush_pending_writes()
+                    next_flush = time.time() + self.flush_interval
+                    
             except Exception as e:
                 print(f"Scheduler error: {str(e)}")
                 time.sleep(5)
     
+    def dispatch_task(self, task):
+        """Submit a due task to the worker pool and schedule its next slot"""
+        task_id = task["task_id"]
+        
+        with self.condition:
+            running = task_id in self.running_tasks
+            if running and self.catchup_policy == "run_all" and task["interval"]:
+                # Missed slots replay back-to-back, so queue them behind the running one
+                self.pending_runs[task_id] = min(self.pending_runs.get(task_id, 0) + 1, self.max_catchup_runs)
+                print(f"⏳ Task still running, queued this run: {task['task_name']}")
+            elif running:
+                print(f"⏭️ Task still running, skipping this run: {task['task_name']}")
+            else:
+                self.running_tasks[task_id] = time.time()
+        if not running:
+            self.submit_run(task)
+        
+        if task["interval"]:
+            now = time.time()
+            next_slot = task["slot"] + task["interval"]
+            if next_slot <= now:
+                next_slot = self.catch_up_slot(next_slot, task["interval"], now)
+            with self.condition:
+                task["slot"] = next_slot
+                self.push_timer(task)
+            self.queue_task_update(task_id, next_run=datetime.fromtimestamp(next_slot).isoformat())
+        else:
+            with self.condition:
+                self.scheduled_tasks.pop(task_id, None)
+    
+    def submit_run(self, task):
+        """Run a task on the worker pool; queued runs start when it finishes"""
+        try:
+            future = self.executor.submit(self.execute_task, task["task_id"], task["agent_id"], task["task_name"],
+                                          task["task_type"], task["task_data"])
+        except RuntimeError:
+            # Pool already shut down (scheduler stopping)
+            with self.condition:
+                self.running_tasks.pop(task["task_id"], None)
+                self.pending_runs.pop(task["task_id"], None)
+            return
+        future.add_done_callback(lambda _: self.finish_run(task))
+    
+    def finish_run(self, task):
+        task_id = task["task_id"]
+        with self.condition:
+            queued = self.pending_runs.get(task_id, 0)
+            if queued and not self.stopping:
+                if queued == 1:
+                    del self.pending_runs[task_id]
+                else:
+                    self.pending_runs[task_id] = queued - 1
+                self.running_tasks[task_id] = time.time()
+            else:
+                self.pending_runs.pop(task_id, None)
+                self.running_tasks.pop(task_id, None)
+                return
+        self.submit_run(task)
+    
     def create_default_tasks(self):
         """Create default scheduled tasks"""
         print("📅 Creating default scheduled tasks...")
@@ -487,7 +667,7 @@ class TaskScheduler:
     
     def get_scheduler_status(self):
         """Get current scheduler status"""
-        conn = sqlite3.connect(self.scheduler_database)
+        conn = workspace_db.connect(self.scheduler_database)
         cursor = conn.cursor()
         
         # Get task counts by status
@@ -507,11 +687,19 @@ class TaskScheduler:
         
         conn.close()
         
+        # Soonest upcoming runs from the timer heap
+        with self.condition:
+            upcoming = sorted(self.scheduled_tasks.values(), key=lambda task: task["slot"])[:5]
+            next_runs = [(task["task_id"], datetime.fromtimestamp(task["slot"]).isoformat()) for task in upcoming]
+        
         return {
             "timestamp": datetime.now().isoformat(),
             "status_counts": status_counts,
             "recent_executions": recent_executions,
-            "scheduler_active": True
+            "next_runs": next_runs,
+            "running_tasks": list(self.running_tasks),
+            "catchup_policy": self.catchup_policy,
+            "scheduler_active": self.scheduler_thread is not None and self.scheduler_thread.is_alive()
         }
     
     def generate_scheduler_report(self):
@@ -8,9 +8,31 @@ import json
 import time
 import requests
 import threading
+import concurrent.futures
 from datetime import datetime
-import sqlite3
 import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "shared"))
+import workspace_db
+
+# Outbox tables: which flag marks a row done and which columns hold its payload
+SYNC_OUTBOXES = {
+    "input": {
+        "table": "input_sync", "flag": "processed", "flag_timestamp": "processed_timestamp",
+        "type_column": "input_type", "data_column": "input_data"
+    },
+    "output": {
+        "table": "output_sync", "flag": "synced", "flag_timestamp": "synced_timestamp",
+        "type_column": "output_type", "data_column": "output_data"
+    }
+}
+
+# Claim/retry bookkeeping added to both outbox tables (ALTERed into older databases)
+OUTBOX_COLUMNS = {
+    "claim_expires": "REAL",       # claimed until (or, after a failure, not retried before)
+    "attempts": "INTEGER DEFAULT 0"
+}
 
 class InputOutputSync:
     def __init__(self):
@@ -18,10 +40,16 @@ class InputOutputSync:
         self.sync_database = "input_output_sync.db"
         self.agents = ["programming", "bestpractices", "verifier", "conversational", "ops"]
         self.sync_interval = 5  # seconds
+        self.batch_size = 500  # rows claimed per batch
+        self.claim_timeout = 120  # seconds before a claimed but unfinished row is claimable again
+        self.sync_workers = 8
+        self.sync_executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.sync_workers,
+                                                                   thread_name_prefix="io-sync")
+        self.local = threading.local()
         
     def create_sync_database(self):
         """Create sync database for input/output synchronization"""
-        conn = sqlite3.connect(self.sync_database)
+        conn = workspace_db.connect(self.sync_database)
         cursor = conn.cursor()
         
         # Create input sync table
@@ -50,6 +78,29 @@ class InputOutputSync:
             )
         ''')
         
+        for outbox in SYNC_OUTBOXES.values():
+            cursor.execute(f"PRAGMA table_info({outbox['table']})")
+            existing_columns = {row[1] for row in cursor.fetchall()}
+            for column, definition in OUTBOX_COLUMNS.items():
+                if column not in existing_columns:
+                    cursor.execute(f"ALTER TABLE {outbox['table']} ADD COLUMN {column} {definition}")
+        
+        # Partial indexes cover only pending rows, so claims stay cheap however large the history gets
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_input_sync_pending ON input_sync (id)
+            WHERE processed = FALSE
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_output_sync_pending ON output_sync (id)
+            WHERE synced = FALSE
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_input_sync_agent ON input_sync (agent_id, processed)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_output_sync_agent ON output_sync (agent_id, synced)
+        ''')
+        
         # Create sync status table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS sync_status (
@@ -67,11 +118,35 @@ class InputOutputSync:
         conn.close()
         print("✅ Input/Output sync database created successfully")
     
+    def get_sync_connection(self):
+        """Open a connection to the sync database"""
+        return workspace_db.connect(self.sync_database)
+    
+    def get_session(self):
+        """HTTP session for the current thread (keeps connections to the main server alive)"""
+        session = getattr(self.local, "session", None)
+        if session is None:
+            session = self.local.session = requests.Session()
+        return session
+    
+    def post_sync(self, direction, agent_id, data_type, data):
+        """Send one input/output record to the main server"""
+        response = self.get_session().post(f"{self.main_server_url}/sync/{direction}", 
+                                           json={
+                                               "agent_id": agent_id,
+                                               f"{direction}_data": {
+                                                   "type": data_type,
+                                                   "data": data,
+                                                   "timestamp": datetime.now().isoformat()
+                                               }
+                                           }, timeout=5)
+        return response.status_code == 200
+    
     def sync_input(self, agent_id, input_type, input_data):
         """Sync input data from agent"""
         try:
             # Store in local database
-            conn = sqlite3.connect(self.sync_database)
+            conn = workspace_db.connect(self.sync_database)
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -83,17 +158,7 @@ class InputOutputSync:
             conn.close()
             
             # Sync with main server
-            response = requests.post(f"{self.main_server_url}/sync/input", 
-                                   json={
-                                       "agent_id": agent_id,
-                                       "input_data": {
-                                           "type": input_type,
-                                           "data": input_data,
-                                           "timestamp": datetime.now().isoformat()
-                                       }
-                                   }, timeout=5)
-            
-            if response.status_code == 200:
+            if self.post_sync("input", agent_id, input_type, input_data):
                 print(f"✅ Input synced for agent {agent_id}")
                 return True
             else:
@@ -108,32 +173,28 @@ class InputOutputSync:
         """Sync output data from agent"""
         try:
             # Store in local database
-            conn = sqlite3.connect(self.sync_database)
+            conn = workspace_db.connect(self.sync_database)
             cursor = conn.cursor()
             
             cursor.execute('''
                 INSERT INTO output_sync (timestamp, agent_id, output_type, output_data)
                 VALUES (?, ?, ?, ?)
             ''', (datetime.now().isoformat(), agent_id, output_type, json.dumps(output_data)))
+            output_id = cursor.lastrowid
             
             conn.commit()
-            conn.close()
             
-            # Sync with main server
-            response = requests.post(f"{self.main_server_url}/sync/output", 
-                                   json={
-                                       "agent_id": agent_id,
-                                       "output_data": {
-                                           "type": output_type,
-                                           "data": output_data,
-                                           "timestamp": datetime.now().isoformat()
-                                       }
-                                   }, timeout=5)
-            
-            if response.status_code == 200:
+            # Sync with main server; on failure the row stays pending for process_pending_syncs
+            if self.post_sync("output", agent_id, output_type, output_data):
+                cursor.execute('''
+                    UPDATE output_sync SET synced = TRUE, synced_timestamp = ? WHERE id = ?
+                ''', (datetime.now().isoformat(), output_id))
+                conn.commit()
+                conn.close()
                 print(f"✅ Output synced for agent {agent_id}")
                 return True
             else:
+                conn.close()
                 print(f"❌ Failed to sync output for agent {agent_id}")
                 return False
                 
@@ -143,7 +204,7 @@ class InputOutputSync:
     
     def get_sync_status(self, agent_id):
         """Get sync status for specific agent"""
-        conn = sqlite3.connect(self.sync_database)
+        conn = workspace_db.connect(self.sync_database)
         cursor = conn.cursor()
         
         # Get input count
@@ -182,46 +243,93 @@ class InputOutputSync:
         return status
     
     def process_pending_syncs(self):
-        """Process pending sync operations"""
-        conn = sqlite3.connect(self.sync_database)
-        cursor = conn.cursor()
+        """Drain pending inputs and outputs in claimed batches"""
+        conn = self.get_sync_connection()
+        totals = {}
         
-        # Process pending inputs
-        cursor.execute('''
-            SELECT id, agent_id, input_type, input_data FROM input_sync 
-            WHERE processed = FALSE
-        ''')
-        pending_inputs = cursor.fetchall()
+        try:
+            for direction, handler in (("input", self.process_input_row), ("output", self.send_output_row)):
+                done_count = failed_count = 0
+                while True:
+                    batch = self.claim_batch(conn, direction)
+                    if not batch:
+                        break
+                    
+                    # Claimed rows are handled in parallel; results are committed per batch
+                    results = list(self.sync_executor.map(handler, batch))
+                    done = [row[0] for row, ok in zip(batch, results) if ok]
+                    failed = [row[0] for row, ok in zip(batch, results) if not ok]
+                    self.complete_batch(conn, direction, done, failed)
+                    
+                    done_count += len(done)
+                    failed_count += len(failed)
+                    if len(batch) < self.batch_size:
+                        break
+                
+                totals[direction] = {"done": done_count, "failed": failed_count}
+        finally:
+            conn.close()
+        
+        return totals
+    
+    def claim_batch(self, conn, direction):
+        """Claim up to batch_size pending rows, oldest first"""
+        outbox = SYNC_OUTBOXES[direction]
+        now = time.time()
         
-        for input_id, agent_id, input_type, input_data in pending_inputs:
-            # Process input
-            processed = self.process_input(agent_id, input_type, json.loads(input_data))
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(f'''
+                SELECT id, agent_id, {outbox['type_column']}, {outbox['data_column']}
+                FROM {outbox['table']}
+                WHERE {outbox['flag']} = FALSE AND (claim_expires IS NULL OR claim_expires < ?)
+                ORDER BY id LIMIT ?
+            ''', (now, self.batch_size)).fetchall()
             
-            if processed:
-                cursor.execute('''
-                    UPDATE input_sync SET processed = TRUE, processed_timestamp = ?
-                    WHERE id = ?
-                ''', (datetime.now().isoformat(), input_id))
+            conn.executemany(f'''
+                UPDATE {outbox['table']} SET claim_expires = ? WHERE id = ?
+            ''', [(now + self.claim_timeout, row[0]) for row in rows])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
         
-        # Process pending outputs
-        cursor.execute('''
-            SELECT id, agent_id, output_type, output_data FROM output_sync 
-            WHERE synced = FALSE
-        ''')
-        pending_outputs = cursor.fetchall()
+        return rows
+    
+    def complete_batch(self, conn, direction, done_ids, failed_ids):
+        """Mark finished rows done and push failed ones back with a growing delay"""
+        outbox = SYNC_OUTBOXES[direction]
+        now = time.time()
         
-        for output_id, agent_id, output_type, output_data in pending_outputs:
-            # Sync output
-            synced = self.sync_output(agent_id, output_type, json.loads(output_data))
-            
-            if synced:
-                cursor.execute('''
-                    UPDATE output_sync SET synced = TRUE, synced_timestamp = ?
-                    WHERE id = ?
-                ''', (datetime.now().isoformat(), output_id))
+        conn.executemany(f'''
+            UPDATE {outbox['table']}
+            SET {outbox['flag']} = TRUE, {outbox['flag_timestamp']} = ?, claim_expires = NULL
+            WHERE id = ?
+        ''', [(datetime.now().isoformat(), row_id) for row_id in done_ids])
+        
+        conn.executemany(f'''
+            UPDATE {outbox['table']}
+            SET attempts = attempts + 1,
+                claim_expires = ? + MIN(300, ? * (1 << MIN(attempts, 6)))
+            WHERE id = ?
+        ''', [(now, self.sync_interval, row_id) for row_id in failed_ids])
         
         conn.commit()
-        conn.close()
+    
+    def process_input_row(self, row):
+        _, agent_id, input_type, input_data = row
+        try:
+            return self.process_input(agent_id, input_type, json.loads(input_data))
+        except Exception as e:
+            print(f"❌ Input processing error for agent {agent_id}: {str(e)}")
+            return False
+    
+    def send_output_row(self, row):
+        _, agent_id, output_type, output_data = row
+        try:
+            return self.post_sync("output", agent_id, output_type, json.loads(output_data))
+        except Exception:
+            return False
     
     def process_input(self, agent_id, input_type, input_data):
         """Process input data"""
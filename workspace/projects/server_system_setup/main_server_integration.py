@@ -6,12 +6,16 @@ Server System Setup - Main Server & Workstation Integration
 
 import json
 import time
+import gzip
 import requests
 import threading
 from datetime import datetime
 from flask import Flask, request, jsonify
-import sqlite3
 import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "shared"))
+import workspace_db
 
 class MainServerIntegration:
     def __init__(self):
@@ -113,10 +117,34 @@ class MainServerIntegration:
                 "message": f"Workstation updated for agent {agent_id}",
                 "timestamp": datetime.now().isoformat()
             })
+        
+        @self.app.route('/workstation/sync', methods=['POST'])
+        def sync_workstation_batch():
+            """Store a batch of workstation events and acknowledge by high-water mark"""
+            try:
+                body = request.get_data()
+                if request.headers.get('Content-Encoding') == 'gzip':
+                    body = gzip.decompress(body)
+                batch = json.loads(body)
+            except (OSError, EOFError, ValueError) as e:
+                return jsonify({"status": "error", "message": f"Invalid batch body: {str(e)}"}), 400
+            
+            error = self.validate_sync_batch(batch)
+            if error:
+                return jsonify({"status": "error", "message": error}), 400
+            
+            stream_id = batch['stream_id']
+            result = self.store_sync_batch(stream_id, batch.get('workstation_id'), batch.get('events', []))
+            
+            return jsonify({
+                "status": "success",
+                **result,
+                "timestamp": datetime.now().isoformat()
+            })
     
     def create_sync_database(self):
         """Create sync database for agent communication"""
-        conn = sqlite3.connect(self.sync_database)
+        conn = workspace_db.connect(self.sync_database)
         cursor = conn.cursor()
         
         # Create sync table
@@ -143,13 +171,25 @@ class MainServerIntegration:
             )
         ''')
         
+        # Highest sequence number stored per workstation sync stream
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sync_streams (
+                stream_id TEXT PRIMARY KEY,
+                workstation_id TEXT,
+                acked_seq INTEGER NOT NULL DEFAULT 0,
+                batches INTEGER DEFAULT 0,
+                events INTEGER DEFAULT 0,
+                last_batch_at TEXT
+            )
+        ''')
+        
         conn.commit()
         conn.close()
         print("✅ Sync database created successfully")
     
     def store_sync_data(self, agent_id, data_type, data_content):
         """Store sync data in database"""
-        conn = sqlite3.connect(self.sync_database)
+        conn = workspace_db.connect(self.sync_database)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -162,7 +202,7 @@ class MainServerIntegration:
     
     def process_workstation_update(self, agent_id, workstation_data):
         """Process workstation update"""
-        conn = sqlite3.connect(self.sync_database)
+        conn = workspace_db.connect(self.sync_database)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -173,6 +213,104 @@ class MainServerIntegration:
         conn.commit()
         conn.close()
     
+    def validate_sync_batch(self, batch):
+        """Check a workstation batch before storing it; returns an error message or None"""
+        if not isinstance(batch, dict):
+            return "Batch must be a JSON object"
+        if not batch.get('stream_id') or not isinstance(batch['stream_id'], str):
+            return "stream_id is required"
+        events = batch.get('events', [])
+        if not isinstance(events, list):
+            return "events must be a list"
+        for position, event in enumerate(events):
+            if not isinstance(event, dict):
+                return f"Event {position} must be an object"
+            if not isinstance(event.get('seq'), int) or isinstance(event['seq'], bool) or event['seq'] < 1:
+                return f"Event {position} needs a positive integer seq"
+            for field in ('timestamp', 'agent_id'):
+                if not isinstance(event.get(field), str) or not event[field]:
+                    return f"Event {position} needs a {field}"
+            if 'data' not in event:
+                return f"Event {position} needs data"
+        return None
+    
+    def store_sync_batch(self, stream_id, workstation_id, events):
+        """Store a workstation batch in one transaction, skipping events at or below the high-water mark"""
+        conn = workspace_db.connect(self.sync_database)
+        cursor = conn.cursor()
+        
+        try:
+            # Retried batches may overlap ones already stored; the read and the write share one lock
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("SELECT acked_seq FROM sync_streams WHERE stream_id = ?", (stream_id,))
+            row = cursor.fetchone()
+            acked_seq = row[0] if row else 0
+            
+            new_events = sorted((event for event in events if event["seq"] > acked_seq),
+                                key=lambda event: event["seq"])
+            sync_rows = []
+            update_rows = []
+            for event in new_events:
+                event_type = event.get("event_type", "workstation_update")
+                if event_type in ("input", "output"):
+                    sync_rows.append((event["timestamp"], event["agent_id"], event_type, json.dumps(event["data"])))
+                else:
+                    update_rows.append((event["timestamp"], event["agent_id"], event_type, json.dumps(event["data"])))
+            
+            cursor.executemany('''
+                INSERT INTO sync_data (timestamp, agent_id, data_type, data_content)
+                VALUES (?, ?, ?, ?)
+            ''', sync_rows)
+            cursor.executemany('''
+                INSERT INTO workstation_updates (timestamp, agent_id, update_type, update_data)
+                VALUES (?, ?, ?, ?)
+            ''', update_rows)
+            
+            if new_events:
+                acked_seq = new_events[-1]["seq"]
+            cursor.execute('''
+                INSERT INTO sync_streams (stream_id, workstation_id, acked_seq, batches, events, last_batch_at)
+                VALUES (?, ?, ?, 1, ?, ?)
+                ON CONFLICT(stream_id) DO UPDATE SET
+                    workstation_id = excluded.workstation_id,
+                    acked_seq = excluded.acked_seq,
+                    batches = batches + 1,
+                    events = events + excluded.events,
+                    last_batch_at = excluded.last_batch_at
+            ''', (stream_id, workstation_id, acked_seq, len(new_events), datetime.now().isoformat()))
+            
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        
+        return {
+            "acked_seq": acked_seq,
+            "accepted": len(new_events),
+            "duplicates": len(events) - len(new_events)
+        }
+    
+    def get_sync_streams(self):
+        """High-water mark and volume per workstation sync stream"""
+        conn = workspace_db.connect(self.sync_database)
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT stream_id, workstation_id, acked_seq, batches, events, last_batch_at
+            FROM sync_streams ORDER BY last_batch_at DESC
+        ''')
+        streams = [{
+            "stream_id": stream_id,
+            "workstation_id": workstation_id,
+            "acked_seq": acked_seq,
+            "batches": batches,
+            "events": events,
+            "last_batch_at": last_batch_at
+        } for stream_id, workstation_id, acked_seq, batches, events, last_batch_at in cursor.fetchall()]
+        conn.close()
+        return streams
+    
     def start_server(self):
         """Start the main server"""
         print("🧟 Main Server Integration - Starting Server")
@@ -220,6 +358,7 @@ class MainServerIntegration:
             "office_port": self.office_port,
             "agents": self.agents,
             "sync_database": self.sync_database,
+            "sync_streams": self.get_sync_streams(),
             "integration_status": "active"
         }
         
@@ -6,23 +6,233 @@ Server System Setup - Terminal & Chat Integration
 
 import json
 import time
+import signal
+import asyncio
 import requests
 import threading
+import concurrent.futures
 from datetime import datetime
 import os
-import subprocess
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "shared"))
+import workspace_db
+
+# Columns added to terminal_commands for executor results (ALTERed into older databases)
+COMMAND_COLUMNS = {
+    "return_code": "INTEGER",
+    "started_at": "TEXT",
+    "completed_at": "TEXT",
+    "duration": "REAL"
+}
+
+class CommandExecutor:
+    """Run shell commands as asyncio subprocesses on a loop in its own thread
+    
+    At most `concurrency` commands run at once; the rest wait their turn
+    without holding a thread. stdout and stderr are read as they arrive and
+    passed line by line to the command's on_output callback. A command can be
+    cancelled by id; on timeout or cancellation its whole process group is
+    killed. on_complete receives the result on a worker thread, so it may
+    block (e.g. to write to the database).
+    """
+    
+    def __init__(self, on_complete=None, concurrency=4, timeout=30, max_output=1024 * 1024, read_size=4096):
+        self.on_complete = on_complete
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.max_output = max_output
+        self.read_size = read_size
+        
+        self.loop = None
+        self.thread = None
+        self.semaphore = None
+        self.tasks = {}
+        self.start_lock = threading.Lock()
+        self.stats = {"submitted": 0, "completed": 0, "failed": 0, "timeout": 0, "cancelled": 0}
+    
+    def start(self):
+        """Start the executor loop (safe to call more than once)"""
+        with self.start_lock:
+            if self.thread and self.thread.is_alive():
+                return
+            self.loop = asyncio.new_event_loop()
+            self.semaphore = asyncio.Semaphore(self.concurrency)
+            self.thread = threading.Thread(target=self.loop.run_forever, name="command-executor")
+            self.thread.daemon = True
+            self.thread.start()
+    
+    def submit(self, command_id, command, agent_id=None, on_output=None, timeout=None, cwd=None):
+        """Schedule a command (thread-safe); returns a concurrent.futures.Future with its result"""
+        self.start()
+        self.stats["submitted"] += 1
+        future = concurrent.futures.Future()
+        
+        def schedule():
+            task = self.loop.create_task(self.run(command_id, command, agent_id, on_output,
+                                                  timeout or self.timeout, cwd))
+            self.tasks[command_id] = task
+            task.add_done_callback(lambda done: self.finish(command_id, done, future))
+        
+        self.loop.call_soon_threadsafe(schedule)
+        return future
+    
+    def finish(self, command_id, task, future):
+        self.tasks.pop(command_id, None)
+        if task.cancelled():
+            # Cancelled while still waiting for a slot: nothing was started
+            result = self.make_result(command_id, "cancelled", "", "", -1, None, 0.0)
+            self.stats["cancelled"] += 1
+            self.loop.run_in_executor(None, self.complete, command_id, result, future)
+        elif task.exception():
+            # The command could not be started (bad working directory, too many processes, ...)
+            result = self.make_result(command_id, "error", "", str(task.exception()), -1, None, 0.0)
+            self.stats["failed"] += 1
+            self.loop.run_in_executor(None, self.complete, command_id, result, future)
+        else:
+            self.loop.run_in_executor(None, self.complete, command_id, task.result(), future)
+    
+    def complete(self, command_id, result, future):
+        """Record the result (executor thread), then resolve the caller's future"""
+        try:
+            if self.on_complete:
+                self.on_complete(command_id, result)
+        finally:
+            future.set_result(result)
+    
+    async def run(self, command_id, command, agent_id, on_output, timeout, cwd):
+        async with self.semaphore:
+            started_at = datetime.now().isoformat()
+            start_time = time.time()
+            # A new session puts the shell and its children in one process group we can kill
+            process = await asyncio.create_subprocess_shell(
+                command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+                cwd=cwd, start_new_session=True)
+            outputs = {"stdout": [], "stderr": []}
+            readers = asyncio.gather(
+                self.read_stream(process.stdout, "stdout", outputs, command_id, agent_id, on_output),
+                self.read_stream(process.stderr, "stderr", outputs, command_id, agent_id, on_output))
+            
+            try:
+                return_code = await asyncio.wait_for(self.wait_process(process, readers), timeout)
+                status = "success"
+                self.stats["completed"] += 1
+            except asyncio.TimeoutError:
+                self.kill(process)
+                return_code = await process.wait()
+                status = "timeout"
+                self.stats["timeout"] += 1
+            except asyncio.CancelledError:
+                self.kill(process)
+                return_code = await process.wait()
+                status = "cancelled"
+                self.stats["cancelled"] += 1
+            finally:
+                readers.cancel()
+                await asyncio.gather(readers, return_exceptions=True)
+            
+            stdout = "".join(outputs["stdout"])
+            stderr = "".join(outputs["stderr"])
+            if status == "timeout":
+                stderr += f"Command execution exceeded {timeout} seconds"
+            return self.make_result(command_id, status, stdout, stderr, return_code, started_at,
+                                    time.time() - start_time)
+    
+    async def wait_process(self, process, readers):
+        # Shielded so a timeout leaves the readers running until the killed process closes its pipes
+        await asyncio.shield(readers)
+        return await process.wait()
+    
+    async def read_stream(self, stream, name, outputs, command_id, agent_id, on_output):
+        """Collect a pipe (up to max_output) and pass each complete line to on_output"""
+        collected = 0
+        partial = ""
+        while True:
+            chunk = await stream.read(self.read_size)
+            if not chunk:
+                break
+            text = chunk.decode("utf-8", errors="replace")
+            if collected < self.max_output:
+                outputs[name].append(text[:self.max_output - collected])
+            collected += len(text)
+            
+            if on_output:
+                lines = (partial + text).split("\n")
+                partial = lines.pop()
+                for line in lines:
+                    self.emit(on_output, command_id, agent_id, name, line)
+        if on_output and partial:
+            self.emit(on_output, command_id, agent_id, name, partial)
+        if collected > self.max_output:
+            outputs[name].append(f"\n[output truncated, {collected - self.max_output} more characters]")
+    
+    def emit(self, on_output, command_id, agent_id, stream_name, line):
+        try:
+            on_output(command_id, agent_id, stream_name, line)
+        except Exception as e:
+            print(f"❌ Output callback error for command {command_id}: {str(e)}")
+    
+    def kill(self, process):
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    
+    def make_result(self, command_id, status, stdout, stderr, return_code, started_at, duration):
+        return {
+            "command_id": command_id,
+            "status": status,
+            "result": stdout,
+            "error": stderr,
+            "return_code": return_code,
+            "started_at": started_at,
+            "completed_at": datetime.now().isoformat(),
+            "duration": round(duration, 3)
+        }
+    
+    def cancel(self, command_id):
+        """Cancel a queued or running command (thread-safe); returns False if it is not active"""
+        if not self.loop or command_id not in self.tasks:
+            return False
+        self.loop.call_soon_threadsafe(lambda: self.tasks[command_id].cancel() if command_id in self.tasks else None)
+        return True
+    
+    def running(self):
+        return sorted(self.tasks)
+    
+    def stop(self, timeout=10):
+        """Cancel whatever is still running and stop the loop"""
+        if not self.thread or not self.thread.is_alive():
+            return
+        
+        async def cancel_tasks():
+            tasks = list(self.tasks.values())
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        
+        asyncio.run_coroutine_threadsafe(cancel_tasks(), self.loop).result(timeout)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout)
+        self.loop.close()
+    
+    def get_stats(self):
+        return dict(self.stats, running=len(self.tasks))
 
 class TerminalChatIntegration:
     def __init__(self):
         self.chat_database = "terminal_chat.db"
         self.agents = ["programming", "bestpractices", "verifier", "conversational", "ops"]
         self.chat_history = []
+        self.command_timeout = 30  # seconds
+        self.command_concurrency = 4
+        self.command_executor = CommandExecutor(on_complete=self.record_command_result,
+                                                concurrency=self.command_concurrency,
+                                                timeout=self.command_timeout)
         
     def create_chat_database(self):
         """Create chat database for terminal integration"""
-        import sqlite3
-        
-        conn = sqlite3.connect(self.chat_database)
+        conn = workspace_db.connect(self.chat_database)
         cursor = conn.cursor()
         
         # Create chat messages table
@@ -49,16 +259,20 @@ class TerminalChatIntegration:
             )
         ''')
         
+        cursor.execute("PRAGMA table_info(terminal_commands)")
+        existing_columns = {row[1] for row in cursor.fetchall()}
+        for column, definition in COMMAND_COLUMNS.items():
+            if column not in existing_columns:
+                cursor.execute(f"ALTER TABLE terminal_commands ADD COLUMN {column} {definition}")
+        
         conn.commit()
         conn.close()
         print("✅ Terminal chat database created successfully")
     
     def process_chat_message(self, sender, message):
         """Process chat message"""
-        import sqlite3
-        
         # Store message in database
-        conn = sqlite3.connect(self.chat_database)
+        conn = workspace_db.connect(self.chat_database)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -73,7 +287,7 @@ class TerminalChatIntegration:
         response = self.generate_chat_response(message, sender)
         
         # Store response
-        conn = sqlite3.connect(self.chat_database)
+        conn = workspace_db.connect(self.chat_database)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -106,52 +320,46 @@ class TerminalChatIntegration:
         else:
             return f"I understand your message: '{message}'. How else can I assist you?"
     
-    def process_terminal_command(self, agent_id, command):
-        """Process terminal command"""
-        import sqlite3
-        
-        # Store command in database
-        conn = sqlite3.connect(self.chat_database)
+    def submit_terminal_command(self, agent_id, command, on_output=None, timeout=None):
+        """Queue a terminal command; returns its command id and a future with the result"""
+        conn = workspace_db.connect(self.chat_database)
         cursor = conn.cursor()
         
         cursor.execute('''
             INSERT INTO terminal_commands (timestamp, agent_id, command, status)
             VALUES (?, ?, ?, ?)
         ''', (datetime.now().isoformat(), agent_id, command, "processing"))
+        command_id = cursor.lastrowid
         
         conn.commit()
         conn.close()
         
-        # Execute command
+        future = self.command_executor.submit(command_id, command, agent_id, on_output, timeout)
+        return command_id, future
+    
+    def record_command_result(self, command_id, result):
+        """Store a finished command's output and exit status"""
+        status = "completed" if result["status"] == "success" else result["status"]
+        
+        conn = workspace_db.connect(self.chat_database)
+        conn.execute('''
+            UPDATE terminal_commands
+            SET result = ?, status = ?, return_code = ?, started_at = ?, completed_at = ?, duration = ?
+            WHERE id = ?
+        ''', (result["result"] + result["error"], status, result["return_code"], result["started_at"],
+              result["completed_at"], result["duration"], command_id))
+        conn.commit()
+        conn.close()
+    
+    def cancel_terminal_command(self, command_id):
+        """Cancel a queued or running terminal command"""
+        return self.command_executor.cancel(command_id)
+    
+    def process_terminal_command(self, agent_id, command, on_output=None):
+        """Process terminal command and wait for its result"""
         try:
-            result = subprocess.run(command, shell=True, capture_output=True, text=True, timeout=30)
-            
-            # Update command result
-            conn = sqlite3.connect(self.chat_database)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                UPDATE terminal_commands SET result = ?, status = ?
-                WHERE agent_id = ? AND command = ? AND status = 'processing'
-            ''', (result.stdout + result.stderr, "completed", agent_id, command))
-            
-            conn.commit()
-            conn.close()
-            
-            return {
-                "status": "success",
-                "result": result.stdout,
-                "error": result.stderr,
-                "return_code": result.returncode
-            }
-            
-        except subprocess.TimeoutExpired:
-            return {
-                "status": "timeout",
-                "result": "Command timed out",
-                "error": "Command execution exceeded 30 seconds",
-                "return_code": -1
-            }
+            command_id, future = self.submit_terminal_command(agent_id, command, on_output)
+            return future.result()
         except Exception as e:
             return {
                 "status": "error",
@@ -160,11 +368,18 @@ class TerminalChatIntegration:
                 "return_code": -1
             }
     
+    def print_command_output(self, command_id, agent_id, stream_name, line):
+        """Stream command output into the chat interface"""
+        marker = "!" if stream_name == "stderr" else " "
+        print(f"  [#{command_id} {agent_id}]{marker} {line}")
+    
+    def print_command_result(self, future):
+        result = future.result()
+        print(f"  [#{result['command_id']}] {result['status']} (exit {result['return_code']}, {result['duration']}s)")
+    
     def get_chat_history(self, limit=10):
         """Get recent chat history"""
-        import sqlite3
-        
-        conn = sqlite3.connect(self.chat_database)
+        conn = workspace_db.connect(self.chat_database)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -181,9 +396,7 @@ class TerminalChatIntegration:
     
     def get_terminal_history(self, agent_id=None, limit=10):
         """Get terminal command history"""
-        import sqlite3
-        
-        conn = sqlite3.connect(self.chat_database)
+        conn = workspace_db.connect(self.chat_database)
         cursor = conn.cursor()
         
         if agent_id:
@@ -212,6 +425,7 @@ class TerminalChatIntegration:
         print("🧟 Terminal Chat Integration - Starting Chat Interface")
         print("=" * 60)
         print("Type 'help' for available commands, 'exit' to quit")
+        print("Prefix a shell command with '!' to run it; 'jobs' lists running commands, 'cancel <id>' stops one")
         print("=" * 60)
         
         while True:
@@ -233,6 +447,21 @@ class TerminalChatIntegration:
                         print(f"  [{timestamp}] {agent_id}: {command} ({status})")
                 elif user_input.lower() == 'agents':
                     print(f"\n🤖 Active Agents: {', '.join(self.agents)}")
+                elif user_input.startswith('!'):
+                    # Commands run in the background; output streams in while the chat stays usable
+                    command_id, future = self.submit_terminal_command("user", user_input[1:].strip(),
+                                                                      on_output=self.print_command_output)
+                    future.add_done_callback(self.print_command_result)
+                    print(f"🖥️ Started command #{command_id}")
+                elif user_input.lower().startswith('cancel '):
+                    command_id = user_input.split(None, 1)[1].lstrip('#')
+                    if command_id.isdigit() and self.cancel_terminal_command(int(command_id)):
+                        print(f"🛑 Cancelling command #{command_id}")
+                    else:
+                        print(f"No running command #{command_id}")
+                elif user_input.lower() == 'jobs':
+                    running = self.command_executor.running()
+                    print(f"\n⚙️ Running commands: {', '.join(f'#{command_id}' for command_id in running) or 'none'}")
                 else:
                     response = self.process_chat_message("user", user_input)
                     print(f"🤖 System: {response}")
@@ -242,6 +471,8 @@ class TerminalChatIntegration:
                 break
             except Exception as e:
                 print(f"Error: {str(e)}")
+        
+        self.command_executor.stop()
     
     def test_integration(self):
         """Test terminal chat integration"""
@@ -269,8 +500,10 @@ class TerminalChatIntegration:
             "pwd"
         ]
         
-        for command in test_commands:
-            result = self.process_terminal_command("test_agent", command)
+        # Submitted together; they run concurrently up to the executor's limit
+        submitted = [(command, self.submit_terminal_command("test_agent", command)[1]) for command in test_commands]
+        for command, future in submitted:
+            result = future.result()
             print(f"   '{command}' -> {result['status']}")
         
         print("✅ Integration test completed")
@@ -282,6 +515,7 @@ class TerminalChatIntegration:
             "chat_database": self.chat_database,
             "agents": self.agents,
             "integration_status": "active",
+            "command_executor": self.command_executor.get_stats(),
             "features": [
                 "chat_processing",
                 "terminal_command_execution",
@@ -6,12 +6,19 @@ Server System Setup - Workstation & Office Station Integration
 
 import json
 import time
+import gzip
+import uuid
+import random
+import socket
 import requests
 import threading
 from datetime import datetime
 from flask import Flask, request, jsonify
-import sqlite3
 import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "shared"))
+import workspace_db
 
 class WorkstationIntegration:
     def __init__(self):
@@ -21,6 +28,33 @@ class WorkstationIntegration:
         self.main_server_url = "http://localhost:12345"
         self.workstation_data = {}
         self.office_data = {}
+        self.workstation_id = f"{socket.gethostname()}:{self.workstation_port}"
+        
+        # Events are buffered in a local outbox and shipped to the main server in batches
+        self.sync_database = "workstation_sync.db"
+        self.sync_interval = 15
+        self.sync_batch_size = 500
+        self.sync_max_batches = 20
+        self.sync_timeout = (5, 30)
+        self.sync_retry_delay = 5
+        self.sync_max_retry_delay = 300
+        self.sync_wakeup = threading.Event()
+        self.sync_stop = threading.Event()
+        self.sync_thread = None
+        self.sync_session = requests.Session()
+        self.sync_queued = 0
+        self.sync_stats = {
+            "batches_sent": 0,
+            "events_sent": 0,
+            "duplicates": 0,
+            "failures": 0,
+            "consecutive_failures": 0,
+            "bytes_sent": 0,
+            "acked_seq": 0,
+            "last_sync": None,
+            "last_error": None
+        }
+        self.setup_sync_database()
         self.setup_routes()
         
     def setup_routes(self):
@@ -33,7 +67,8 @@ class WorkstationIntegration:
                 "status": "online",
                 "timestamp": datetime.now().isoformat(),
                 "workstation_data": self.workstation_data,
-                "office_data": self.office_data
+                "office_data": self.office_data,
+                "sync": self.get_sync_status()
             })
         
         @self.app.route('/workstation/update', methods=['POST'])
@@ -101,20 +136,171 @@ class WorkstationIntegration:
                 "timestamp": datetime.now().isoformat()
             })
     
-    def sync_with_main_server(self, agent_id, data):
-        """Sync data with main server"""
+    def setup_sync_database(self):
+        """Setup the local sync outbox"""
+        conn = workspace_db.connect(self.sync_database)
+        cursor = conn.cursor()
+        
+        # AUTOINCREMENT keeps sequence numbers increasing after acknowledged rows are deleted
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sync_outbox (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT NOT NULL,
+                agent_id TEXT NOT NULL,
+                event_type TEXT NOT NULL,
+                event_data TEXT NOT NULL
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sync_state (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            )
+        ''')
+        
+        # A fresh outbox restarts its sequence at 1, so it gets a new stream id on the server
+        cursor.execute("INSERT OR IGNORE INTO sync_state (key, value) VALUES ('stream_id', ?)",
+                       (f"{self.workstation_id}/{uuid.uuid4().hex[:12]}",))
+        cursor.execute("SELECT value FROM sync_state WHERE key = 'stream_id'")
+        self.sync_stream_id = cursor.fetchone()[0]
+        
+        conn.commit()
+        conn.close()
+    
+    def sync_with_main_server(self, agent_id, data, event_type="workstation_update"):
+        """Queue an event for the next batch to the main server"""
+        conn = workspace_db.connect(self.sync_database)
+        conn.execute('''
+            INSERT INTO sync_outbox (timestamp, agent_id, event_type, event_data)
+            VALUES (?, ?, ?, ?)
+        ''', (datetime.now().isoformat(), agent_id, event_type, json.dumps(data)))
+        conn.commit()
+        conn.close()
+        
+        # A full batch is sent right away instead of waiting for the interval
+        self.sync_queued += 1
+        if self.sync_queued >= self.sync_batch_size:
+            self.sync_queued = 0
+            self.sync_wakeup.set()
+    
+    def send_sync_batch(self):
+        """Send the oldest unacknowledged events; returns how many are still pending"""
+        conn = workspace_db.connect(self.sync_database)
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT seq, timestamp, agent_id, event_type, event_data FROM sync_outbox
+            ORDER BY seq LIMIT ?
+        ''', (self.sync_batch_size,))
+        rows = cursor.fetchall()
+        conn.close()
+        
+        if not rows:
+            return 0
+        
+        batch = {
+            "stream_id": self.sync_stream_id,
+            "workstation_id": self.workstation_id,
+            "first_seq": rows[0][0],
+            "last_seq": rows[-1][0],
+            "events": [{
+                "seq": seq,
+                "timestamp": timestamp,
+                "agent_id": agent_id,
+                "event_type": event_type,
+                "data": json.loads(event_data)
+            } for seq, timestamp, agent_id, event_type, event_data in rows]
+        }
+        body = gzip.compress(json.dumps(batch).encode("utf-8"), compresslevel=6)
+        
+        response = self.sync_session.post(f"{self.main_server_url}/workstation/sync", data=body,
+                                          headers={"Content-Type": "application/json",
+                                                   "Content-Encoding": "gzip"},
+                                          timeout=self.sync_timeout)
+        response.raise_for_status()
+        result = response.json()
+        acked_seq = int(result["acked_seq"])
+        
+        # Everything up to the server's high-water mark is stored there (including earlier
+        # batches whose acknowledgement was lost), so it can leave the outbox
+        conn = workspace_db.connect(self.sync_database)
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM sync_outbox WHERE seq <= ?", (acked_seq,))
+        cursor.execute("SELECT COUNT(*) FROM sync_outbox")
+        pending = cursor.fetchone()[0]
+        conn.commit()
+        conn.close()
+        
+        self.sync_stats["batches_sent"] += 1
+        self.sync_stats["events_sent"] += result.get("accepted", 0)
+        self.sync_stats["duplicates"] += result.get("duplicates", 0)
+        self.sync_stats["bytes_sent"] += len(body)
+        self.sync_stats["acked_seq"] = acked_seq
+        self.sync_stats["last_sync"] = datetime.now().isoformat()
+        
+        if acked_seq < batch["last_seq"]:
+            raise RuntimeError(f"Server acknowledged up to {acked_seq}, batch ended at {batch['last_seq']}")
+        return pending
+    
+    def flush_sync_outbox(self):
+        """Send pending events in batches; returns False if the main server could not be reached"""
         try:
-            response = requests.post(f"{self.main_server_url}/workstation/update", 
-                                   json={
-                                       "agent_id": agent_id,
-                                       "workstation_data": data
-                                   }, timeout=5)
-            if response.status_code == 200:
-                print(f"✅ Synced data for agent {agent_id}")
-            else:
-                print(f"❌ Failed to sync data for agent {agent_id}")
+            for _ in range(self.sync_max_batches):
+                if self.send_sync_batch() == 0:
+                    break
+            self.sync_stats["consecutive_failures"] = 0
+            return True
         except Exception as e:
-            print(f"❌ Sync error for agent {agent_id}: {str(e)}")
+            self.sync_stats["failures"] += 1
+            self.sync_stats["consecutive_failures"] += 1
+            self.sync_stats["last_error"] = str(e)
+            print(f"❌ Sync error: {str(e)}")
+            return False
+    
+    def sync_loop(self):
+        """Ship the outbox every interval (or when a batch fills), backing off while the server is unreachable"""
+        while not self.sync_stop.is_set():
+            self.sync_wakeup.wait(self.sync_interval)
+            self.sync_wakeup.clear()
+            if self.sync_stop.is_set():
+                break
+            
+            if not self.flush_sync_outbox():
+                # Events stay in the outbox; resume from the oldest unacknowledged one after the delay
+                failures = self.sync_stats["consecutive_failures"]
+                delay = min(self.sync_max_retry_delay, self.sync_retry_delay * 2 ** (failures - 1))
+                self.sync_stop.wait(delay * random.uniform(0.5, 1.0))
+    
+    def start_sync(self):
+        """Start the background sync thread"""
+        if self.sync_thread and self.sync_thread.is_alive():
+            return
+        self.sync_stop.clear()
+        self.sync_thread = threading.Thread(target=self.sync_loop, daemon=True)
+        self.sync_thread.start()
+    
+    def stop_sync(self, timeout=10):
+        """Stop the sync thread and try to send what is left"""
+        self.sync_stop.set()
+        self.sync_wakeup.set()
+        if self.sync_thread:
+            self.sync_thread.join(timeout)
+        self.flush_sync_outbox()
+    
+    def get_sync_status(self):
+        """Outbox backlog and delivery statistics"""
+        conn = workspace_db.connect(self.sync_database)
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*), MIN(timestamp) FROM sync_outbox")
+        pending, oldest = cursor.fetchone()
+        conn.close()
+        
+        return {
+            "stream_id": self.sync_stream_id,
+            "pending_events": pending,
+            "oldest_pending": oldest,
+            **self.sync_stats
+        }
     
     def process_chat_message(self, message, sender):
         """Process chat message and generate response"""
@@ -156,6 +342,9 @@ class WorkstationIntegration:
         workstation_thread.daemon = True
         workstation_thread.start()
         
+        # Start batched sync with the main server
+        self.start_sync()
+        
         print(f"✅ Workstation started on port {self.workstation_port}")
         print(f"✅ Office station started on port {self.office_port}")
         print("✅ Workstation integration ready")
@@ -190,6 +379,7 @@ class WorkstationIntegration:
             "main_server_url": self.main_server_url,
             "workstation_data": self.workstation_data,
             "office_data": self.office_data,
+            "sync_status": self.get_sync_status(),
             "integration_status": "active"
         }
         
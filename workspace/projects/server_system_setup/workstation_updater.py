@@ -9,17 +9,22 @@ import time
 import requests
 from datetime import datetime
 import os
-import sqlite3
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "shared"))
+from metrics_store import MetricsStore
+import workspace_db
 
 class WorkstationUpdater:
     def __init__(self):
         self.workstation_database = "workstation_updates.db"
         self.agents = ["programming", "bestpractices", "verifier", "conversational", "ops"]
         self.update_interval = 10  # seconds
+        self.metrics_store = MetricsStore()
         
     def create_workstation_database(self):
         """Create workstation database for updates"""
-        conn = sqlite3.connect(self.workstation_database)
+        conn = workspace_db.connect(self.workstation_database)
         cursor = conn.cursor()
         
         # Create workstation updates table
@@ -47,26 +52,13 @@ class WorkstationUpdater:
             )
         ''')
         
-        # Create workstation metrics table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS workstation_metrics (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TEXT NOT NULL,
-                cpu_usage REAL,
-                memory_usage REAL,
-                disk_usage REAL,
-                network_usage REAL,
-                active_agents INTEGER
-            )
-        ''')
-        
         conn.commit()
         conn.close()
         print("✅ Workstation database created successfully")
     
     def update_agent_status(self, agent_id, status, performance_metrics=None):
         """Update agent status in workstation"""
-        conn = sqlite3.connect(self.workstation_database)
+        conn = workspace_db.connect(self.workstation_database)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -87,7 +79,7 @@ class WorkstationUpdater:
     
     def process_workstation_update(self, agent_id, update_type, update_data):
         """Process workstation update from agent"""
-        conn = sqlite3.connect(self.workstation_database)
+        conn = workspace_db.connect(self.workstation_database)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -141,6 +133,13 @@ class WorkstationUpdater:
         """Handle performance update"""
         print(f"📊 Performance update from agent {agent_id}")
         
+        # Numeric readings go to the shared metrics store
+        self.metrics_store.record_many({
+            f"workstation.{agent_id}.{key}": value
+            for key, value in update_data.items()
+            if isinstance(value, (int, float)) and not isinstance(value, bool)
+        })
+        
         # Update agent status
         self.update_agent_status(agent_id, "performance_updated", update_data)
     
@@ -154,7 +153,7 @@ class WorkstationUpdater:
     
     def get_workstation_status(self):
         """Get current workstation status"""
-        conn = sqlite3.connect(self.workstation_database)
+        conn = workspace_db.connect(self.workstation_database)
         cursor = conn.cursor()
         
         # Get latest agent statuses
@@ -182,34 +181,14 @@ class WorkstationUpdater:
                     "performance_metrics": None
                 }
         
-        # Get latest workstation metrics
-        cursor.execute('''
-            SELECT cpu_usage, memory_usage, disk_usage, network_usage, active_agents
-            FROM workstation_metrics
-            ORDER BY timestamp DESC
-            LIMIT 1
-        ''')
-        
-        metrics_result = cursor.fetchone()
-        if metrics_result:
-            workstation_metrics = {
-                "cpu_usage": metrics_result[0],
-                "memory_usage": metrics_result[1],
-                "disk_usage": metrics_result[2],
-                "network_usage": metrics_result[3],
-                "active_agents": metrics_result[4]
-            }
-        else:
-            workstation_metrics = {
-                "cpu_usage": 0,
-                "memory_usage": 0,
-                "disk_usage": 0,
-                "network_usage": 0,
-                "active_agents": 0
-            }
-        
         conn.close()
         
+        # Get latest workstation metrics
+        workstation_metrics = {
+            metric: self.metrics_store.latest(f"workstation.host.{metric}") or 0
+            for metric in ("cpu_usage", "memory_usage", "disk_usage", "network_usage", "active_agents")
+        }
+        
         return {
             "timestamp": datetime.now().isoformat(),
             "agent_statuses": agent_statuses,
@@ -243,23 +222,10 @@ class WorkstationUpdater:
             }
             
             # Store metrics
-            conn = sqlite3.connect(self.workstation_database)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT INTO workstation_metrics (timestamp, cpu_usage, memory_usage, disk_usage, network_usage, active_agents)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (
-                datetime.now().isoformat(),
-                metrics["cpu_usage"],
-                metrics["memory_usage"],
-                metrics["disk_usage"],
-                metrics["network_usage"],
-                metrics["active_agents"]
-            ))
-            
-            conn.commit()
-            conn.close()
+            self.metrics_store.record_many({
+                f"workstation.host.{metric}": value for metric, value in metrics.items()
+            })
+            self.metrics_store.flush()
             
             return metrics
             
@@ -269,7 +235,7 @@ class WorkstationUpdater:
     
     def get_agent_status(self, agent_id):
         """Get current status of specific agent"""
-        conn = sqlite3.connect(self.workstation_database)
+        conn = workspace_db.connect(self.workstation_database)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+Metrics Store
+Shared compact time-series store for workspace performance metrics
+
+Samples are kept in three tiers: raw points, 1 minute rollups and 1 hour
+rollups. Each tier is stored as columnar chunks (one SQLite row per series
+and time span, columns packed as zlib-compressed NumPy arrays), so a range
+query reads a handful of rows instead of thousands. Raw points are rolled
+up as they are flushed and every tier has its own retention, which keeps
+disk use bounded by series count rather than by uptime.
+
+Each series should be written by a single process; readers can be anywhere.
+"""
+
+import os
+import time
+import atexit
+import zlib
+import sqlite3
+import threading
+import numpy as np
+
+import workspace_db
+
+RAW = 0
+MINUTE = 60
+HOUR = 3600
+RESOLUTIONS = (RAW, MINUTE, HOUR)
+
+# Time span covered by one chunk row per tier (seconds)
+CHUNK_SPANS = {
+    RAW: 3600,
+    MINUTE: 86400,
+    HOUR: 30 * 86400
+}
+
+# How long each tier is kept (seconds)
+DEFAULT_RETENTION = {
+    RAW: 2 * 86400,
+    MINUTE: 30 * 86400,
+    HOUR: 365 * 86400
+}
+
+# Widest query range served from each tier when resolution="auto"
+AUTO_RESOLUTION_SPANS = {
+    RAW: 2 * 3600,
+    MINUTE: 3 * 86400,
+    HOUR: None
+}
+
+# Column name -> on-disk dtype; raw chunks only use offsets and values.
+# Values are float64: cumulative counters (e.g. network bytes, ~1e12) lose
+# their per-sample increments in float32.
+CHUNK_COLUMNS = {
+    "offsets": np.uint32,   # milliseconds since chunk_start
+    "values": np.float64,   # raw value, or bucket mean for rollups
+    "minimums": np.float64,
+    "maximums": np.float64,
+    "counts": np.uint32
+}
+VALUE_COLUMNS = ("values", "minimums", "maximums")
+
+class MetricsStore:
+    def __init__(self, database="metrics_store.db", retention=None, flush_interval=30,
+                 flush_size=1000, prune_interval=3600):
+        self.database = database
+        self.retention = dict(DEFAULT_RETENTION)
+        self.retention.update(retention or {})
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.prune_interval = prune_interval
+
+        self.buffer = {}  # series -> list of (timestamp, value)
+        self.buffered_points = 0
+        self.last_flush = time.time()
+        self.last_prune = 0
+        self.lock = threading.RLock()
+        self.local = threading.local()
+        self.setup_database()
+
+        # Buffered samples are written out on normal interpreter exit
+        atexit.register(self.flush)
+
+    def get_connection(self):
+        """Get this thread's connection"""
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.database, timeout=30, isolation_level=None,
+                                   cached_statements=workspace_db.CACHED_STATEMENTS)
+            workspace_db.tune_connection(conn)
+            self.local.conn = conn
+        return conn
+
+    def setup_database(self):
+        """Setup metrics store database"""
+        conn = self.get_connection()
+
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS metric_chunks (
+                series TEXT NOT NULL,
+                resolution INTEGER NOT NULL,
+                chunk_start INTEGER NOT NULL,
+                point_count INTEGER NOT NULL,
+                offsets BLOB NOT NULL,
+                "values" BLOB NOT NULL,
+                minimums BLOB,
+                maximums BLOB,
+                counts BLOB,
+                PRIMARY KEY (series, resolution, chunk_start)
+            ) WITHOUT ROWID
+        ''')
+
+        # Newest point per series and tier (rollup watermark and series catalog)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS metric_series (
+                series TEXT NOT NULL,
+                resolution INTEGER NOT NULL,
+                first_timestamp REAL NOT NULL,
+                last_timestamp REAL NOT NULL,
+                last_value REAL,
+                PRIMARY KEY (series, resolution)
+            ) WITHOUT ROWID
+        ''')
+
+    def record(self, series, value, timestamp=None):
+        """Buffer one sample"""
+        self.record_many({series: value}, timestamp)
+
+    def record_many(self, samples, timestamp=None):
+        """Buffer samples for several series taken at the same time ({series: value})"""
+        timestamp = time.time() if timestamp is None else timestamp
+        with self.lock:
+            for series, value in samples.items():
+                if value is None:
+                    continue
+                self.buffer.setdefault(series, []).append((timestamp, float(value)))
+                self.buffered_points += 1
+
+            if (self.buffered_points >= self.flush_size or
+                    time.time() - self.last_flush >= self.flush_interval):
+                self.flush()
+
+    def flush(self):
+        """Write buffered samples, roll up completed buckets and apply retention"""
+        with self.lock:
+            buffer, self.buffer = self.buffer, {}
+            self.buffered_points = 0
+            self.last_flush = time.time()
+
+            if buffer:
+                conn = self.get_connection()
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    for series, points in buffer.items():
+                        points = np.array(points, dtype=np.float64)
+                        self.append_points(conn, series, RAW, points[:, 0], {"values": points[:, 1]})
+                        self.downsample(conn, series)
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+
+            if time.time() - self.last_prune >= self.prune_interval:
+                self.prune()
+
+    def append_points(self, conn, series, resolution, timestamps, columns):
+        """Merge points into the chunks of one tier (inside a write transaction)"""
+        span = CHUNK_SPANS[resolution]
+        chunk_starts = (timestamps // span).astype(np.int64) * span
+
+        for chunk_start in np.unique(chunk_starts):
+            mask = chunk_starts == chunk_start
+            offsets = np.round((timestamps[mask] - chunk_start) * 1000)
+            new_columns = {"offsets": offsets}
+            new_columns.update({name: column[mask] for name, column in columns.items()})
+
+            existing = self.read_chunk(conn, series, resolution, int(chunk_start))
+            if existing:
+                merged = {name: np.concatenate([existing[name], new_columns[name]]) for name in new_columns}
+                order = np.argsort(merged["offsets"], kind="stable")
+                merged = {name: column[order] for name, column in merged.items()}
+            else:
+                merged = new_columns
+
+            self.write_chunk(conn, series, resolution, int(chunk_start), merged)
+
+        conn.execute('''
+            INSERT INTO metric_series (series, resolution, first_timestamp, last_timestamp, last_value)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (series, resolution) DO UPDATE SET
+                first_timestamp = MIN(first_timestamp, excluded.first_timestamp),
+                last_timestamp = MAX(last_timestamp, excluded.last_timestamp),
+                last_value = CASE WHEN excluded.last_timestamp >= last_timestamp
+                                  THEN excluded.last_value ELSE last_value END
+        ''', (series, resolution, float(timestamps.min()), float(timestamps.max()),
+              float(columns["values"][np.argmax(timestamps)])))
+
+    def read_chunk(self, conn, series, resolution, chunk_start):
+        row = conn.execute('''
+            SELECT offsets, "values", minimums, maximums, counts FROM metric_chunks
+            WHERE series = ? AND resolution = ? AND chunk_start = ?
+        ''', (series, resolution, chunk_start)).fetchone()
+        return self.decode_chunk(row) if row else None
+
+    def write_chunk(self, conn, series, resolution, chunk_start, columns):
+        packed = {
+            name: zlib.compress(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+            if name in columns else None
+            for name, dtype in CHUNK_COLUMNS.items()
+        }
+        conn.execute('''
+            INSERT OR REPLACE INTO metric_chunks
+            (series, resolution, chunk_start, point_count, offsets, "values", minimums, maximums, counts)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (series, resolution, chunk_start, len(columns["offsets"]), packed["offsets"],
+              packed["values"], packed["minimums"], packed["maximums"], packed["counts"]))
+
+    def decode_chunk(self, row):
+        columns = {}
+        for (name, dtype), blob in zip(CHUNK_COLUMNS.items(), row):
+            if blob is None:
+                continue
+            data = zlib.decompress(blob)
+            # Chunks written before values were widened hold float32 columns
+            if name in VALUE_COLUMNS and len(data) == 4 * len(columns["offsets"]):
+                dtype = np.float32
+            columns[name] = np.frombuffer(data, dtype=dtype)
+        return columns
+
+    def downsample(self, conn, series):
+        """Roll complete buckets up from raw to 1 minute and from 1 minute to 1 hour"""
+        for source, target in ((RAW, MINUTE), (MINUTE, HOUR)):
+            source_row = conn.execute('''
+                SELECT last_timestamp FROM metric_series WHERE series = ? AND resolution = ?
+            ''', (series, source)).fetchone()
+            if not source_row:
+                return
+            target_row = conn.execute('''
+                SELECT last_timestamp FROM metric_series WHERE series = ? AND resolution = ?
+            ''', (series, target)).fetchone()
+
+            # Only buckets older than the one holding the newest source point are complete
+            complete_until = (source_row[0] // target) * target
+            rolled_until = target_row[0] + target if target_row else None
+            if rolled_until is not None and rolled_until >= complete_until:
+                continue
+
+            start = rolled_until if rolled_until is not None else 0
+            data = self.read_range(conn, series, source, start, complete_until)
+            if not len(data["timestamps"]):
+                continue
+
+            rollup = self.aggregate(data, target)
+            self.append_points(conn, series, target, rollup.pop("timestamps"), rollup)
+
+    def aggregate(self, data, resolution):
+        """Combine time-ordered points into resolution-sized buckets (count-weighted means)"""
+        buckets = (data["timestamps"] // resolution) * resolution
+        bucket_starts, first_index = np.unique(buckets, return_index=True)
+        counts = np.add.reduceat(data["counts"], first_index)
+        sums = np.add.reduceat(data["values"] * data["counts"], first_index)
+        return {
+            "timestamps": bucket_starts,
+            "values": sums / counts,
+            "minimums": np.minimum.reduceat(data["minimums"], first_index),
+            "maximums": np.maximum.reduceat(data["maximums"], first_index),
+            "counts": counts
+        }
+
+    def read_range(self, conn, series, resolution, start, end):
+        """Read one tier's points with start <= timestamp < end as float64 columns"""
+        span = CHUNK_SPANS[resolution]
+        rows = conn.execute('''
+            SELECT chunk_start, offsets, "values", minimums, maximums, counts FROM metric_chunks
+            WHERE series = ? AND resolution = ? AND chunk_start > ? AND chunk_start < ?
+            ORDER BY chunk_start
+        ''', (series, resolution, start - span, end)).fetchall()
+
+        parts = {name: [] for name in ("timestamps", "values", "minimums", "maximums", "counts")}
+        for row in rows:
+            chunk = self.decode_chunk(row[1:])
+            timestamps = row[0] + chunk["offsets"] / 1000.0
+            mask = (timestamps >= start) & (timestamps < end)
+            values = chunk["values"][mask].astype(np.float64)
+            parts["timestamps"].append(timestamps[mask])
+            parts["values"].append(values)
+            parts["minimums"].append(chunk["minimums"][mask].astype(np.float64) if "minimums" in chunk else values)
+            parts["maximums"].append(chunk["maximums"][mask].astype(np.float64) if "maximums" in chunk else values)
+            parts["counts"].append(chunk["counts"][mask].astype(np.float64) if "counts" in chunk
+                                   else np.ones(len(values)))
+
+        return {
+            name: np.concatenate(columns) if columns else np.empty(0)
+            for name, columns in parts.items()
+        }
+
+    def choose_resolution(self, start, end):
+        """Finest tier that still holds start and keeps the point count dashboard-sized"""
+        now = time.time()
+        for resolution in RESOLUTIONS:
+            max_span = AUTO_RESOLUTION_SPANS[resolution]
+            if start >= now - self.retention[resolution] and (max_span is None or end - start <= max_span):
+                return resolution
+        return HOUR
+
+    def query(self, series, start=None, end=None, resolution="auto"):
+        """Range query returning NumPy arrays
+
+        Returns {"timestamps", "values", "minimums", "maximums", "counts", "resolution"}.
+        For rollup tiers, values are bucket means and timestamps are bucket starts;
+        the newest, not yet rolled up bucket is aggregated from raw points on the fly.
+        """
+        end = time.time() if end is None else end
+        start = end - 3600 if start is None else start
+        if resolution == "auto":
+            resolution = self.choose_resolution(start, end)
+
+        with self.lock:
+            if series in self.buffer:
+                self.flush()
+
+        conn = self.get_connection()
+        result = self.read_range(conn, series, resolution, start, end)
+
+        if resolution != RAW:
+            row = conn.execute('''
+                SELECT last_timestamp FROM metric_series WHERE series = ? AND resolution = ?
+            ''', (series, resolution)).fetchone()
+            tail_start = max(start, row[0] + resolution) if row else start
+            tail = self.read_range(conn, series, RAW, tail_start, end)
+            if len(tail["timestamps"]):
+                tail = self.aggregate(tail, resolution)
+                result = {name: np.concatenate([result[name], tail[name]]) for name in result}
+
+        result["resolution"] = resolution
+        return result
+
+    def query_many(self, prefix, start=None, end=None, resolution="auto"):
+        """Range query for every series whose name starts with prefix"""
+        return {
+            series: self.query(series, start, end, resolution)
+            for series in self.list_series(prefix)
+        }
+
+    def query_aligned(self, series_list, start, end, step=MINUTE, resolution="auto"):
+        """Mean of each series per step-sized bucket as one (series x buckets) matrix
+
+        Returns (bucket_starts, matrix); buckets without data are NaN.
+        """
+        bucket_count = max(1, int(np.ceil((end - start) / step)))
+        matrix = np.full((len(series_list), bucket_count), np.nan)
+
+        for row, series in enumerate(series_list):
+            data = self.query(series, start, end, resolution)
+            if not len(data["timestamps"]):
+                continue
+            index = np.minimum(((data["timestamps"] - start) // step).astype(np.int64), bucket_count - 1)
+            sums = np.bincount(index, weights=data["values"] * data["counts"], minlength=bucket_count)
+            counts = np.bincount(index, weights=data["counts"], minlength=bucket_count)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                matrix[row] = np.where(counts > 0, sums / counts, np.nan)
+
+        return start + np.arange(bucket_count) * step, matrix
+
+    def latest(self, series):
+        """Newest raw value of a series, or None"""
+        with self.lock:
+            if self.buffer.get(series):
+                return self.buffer[series][-1][1]
+
+        row = self.get_connection().execute('''
+            SELECT last_value FROM metric_series WHERE series = ? AND resolution = ?
+        ''', (series, RAW)).fetchone()
+        return row[0] if row else None
+
+    def list_series(self, prefix=""):
+        """Names of stored series starting with prefix"""
+        with self.lock:
+            buffered = [series for series in self.buffer if series.startswith(prefix)]
+        rows = self.get_connection().execute('''
+            SELECT DISTINCT series FROM metric_series WHERE series >= ? AND series < ?
+        ''', (prefix, prefix + "\uffff")).fetchall()
+        return sorted(set(buffered) | {row[0] for row in rows})
+
+    def prune(self):
+        """Drop chunks that have aged out of their tier's retention"""
+        self.last_prune = time.time()
+        conn = self.get_connection()
+        deleted = 0
+        for resolution in RESOLUTIONS:
+            cutoff = time.time() - self.retention[resolution]
+            cursor = conn.execute('''
+                DELETE FROM metric_chunks WHERE resolution = ? AND chunk_start + ? <= ?
+            ''', (resolution, CHUNK_SPANS[resolution], cutoff))
+            deleted += cursor.rowcount
+            conn.execute('''
+                DELETE FROM metric_series WHERE resolution = ? AND last_timestamp < ?
+            ''', (resolution, cutoff))
+        return deleted
+
+    def get_stats(self):
+        """Chunk and point counts per tier plus database size"""
+        rows = self.get_connection().execute('''
+            SELECT resolution, COUNT(*), SUM(point_count), COUNT(DISTINCT series)
+            FROM metric_chunks GROUP BY resolution
+        ''').fetchall()
+        return {
+            "tiers": {
+                resolution: {"chunks": chunks, "points": points, "series": series}
+                for resolution, chunks, points, series in rows
+            },
+            "buffered_points": self.buffered_points,
+            "database_bytes": os.path.getsize(self.database) if os.path.exists(self.database) else 0
+        }
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Workspace Database Access
+Shared SQLite access layer for the pump_automation and server_system_setup daemons
+
+connect() hands out a handle on a connection that is cached per thread (and
+per process, so forked workers never reuse their parent's connection). The
+cached connection is opened once with tuned pragmas (WAL, synchronous=NORMAL,
+mmap and a larger page cache) and a statement cache, so repeated queries skip
+both the open and the prepare step. Closing the handle returns the connection
+to the cache; an outermost close rolls back anything left uncommitted, which
+keeps the old "open, work, close" semantics of each call.
+
+Write transactions start with BEGIN IMMEDIATE: a writer waits for the lock
+up front (bounded by the busy timeout) instead of failing with "database is
+locked" when upgrading a read transaction while another daemon writes.
+"""
+
+import os
+import sqlite3
+import threading
+
+DEFAULT_BUSY_TIMEOUT = 30
+CACHED_STATEMENTS = 256
+
+PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("mmap_size", 256 * 1024 * 1024),
+    ("cache_size", -16000),  # negative = KiB, roughly 16 MB per connection
+    ("temp_store", "MEMORY"),
+    ("journal_size_limit", 64 * 1024 * 1024)
+)
+
+local = threading.local()
+
+
+def tune_connection(conn, timeout=DEFAULT_BUSY_TIMEOUT):
+    """Apply the shared pragmas and busy timeout to an open connection"""
+    conn.execute(f"PRAGMA busy_timeout={int(timeout * 1000)}")
+    for name, value in PRAGMAS:
+        conn.execute(f"PRAGMA {name}={value}")
+    return conn
+
+
+class CachedConnection:
+    """A thread's cached connection and how many handles are open on it"""
+
+    def __init__(self, database, timeout):
+        self.conn = sqlite3.connect(database, timeout=timeout, isolation_level="IMMEDIATE",
+                                    cached_statements=CACHED_STATEMENTS)
+        tune_connection(self.conn, timeout)
+        self.timeout = timeout
+        self.depth = 0
+        self.opened = 0
+
+
+class ConnectionHandle:
+    """Per-call handle that behaves like sqlite3.Connection; close() releases it"""
+
+    def __init__(self, cached):
+        object.__setattr__(self, "cached", cached)
+        cached.depth += 1
+        cached.opened += 1
+
+    def __getattr__(self, name):
+        cached = object.__getattribute__(self, "cached")
+        if cached is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        return getattr(cached.conn, name)
+
+    def __setattr__(self, name, value):
+        if self.cached is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        setattr(self.cached.conn, name, value)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Same as sqlite3.Connection: commit or roll back, but leave the handle open
+        return self.cached.conn.__exit__(exc_type, exc_value, traceback)
+
+    def close(self):
+        cached = self.cached
+        if cached is None:
+            return
+        object.__setattr__(self, "cached", None)
+        cached.depth -= 1
+        if cached.depth == 0 and cached.conn.in_transaction:
+            cached.conn.rollback()
+
+    # A handle dropped without close() (e.g. on an exception) is released like a garbage-collected connection
+    __del__ = close
+
+
+def thread_connections():
+    """This thread's connections, reset after a fork"""
+    pid = os.getpid()
+    if getattr(local, "pid", None) != pid:
+        # Connections inherited across fork must not be used or closed by the child; keep them referenced
+        if hasattr(local, "connections"):
+            local.inherited = local.connections
+        local.pid = pid
+        local.connections = {}
+    return local.connections
+
+
+def connect(database, timeout=DEFAULT_BUSY_TIMEOUT):
+    """Get a handle on this thread's cached connection to database"""
+    connections = thread_connections()
+    key = os.path.abspath(database)
+    cached = connections.get(key)
+    if cached is None:
+        cached = CachedConnection(database, timeout)
+        connections[key] = cached
+    elif cached.timeout != timeout and cached.depth == 0:
+        cached.conn.execute(f"PRAGMA busy_timeout={int(timeout * 1000)}")
+        cached.timeout = timeout
+    return ConnectionHandle(cached)
+
+
+def close_connections():
+    """Close this thread's cached connections (e.g. before a worker thread exits)"""
+    connections = thread_connections()
+    for cached in connections.values():
+        if cached.depth == 0:
+            cached.conn.close()
+    local.connections = {key: cached for key, cached in connections.items() if cached.depth > 0}
+
+
+def get_stats():
+    """Cached connections of the calling thread"""
+    return {
+        key: {"open_handles": cached.depth, "handles_served": cached.opened, "busy_timeout": cached.timeout}
+        for key, cached in thread_connections().items()
+    }